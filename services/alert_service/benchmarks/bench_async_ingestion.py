@@ -0,0 +1,120 @@
+"""
+Load-test metric ingestion from an event loop: concurrent `POST /metrics/` handlers writing through the
+synchronous Redis client, as the endpoint used to, against the same handlers awaiting the async pool.
+
+A local TCP proxy in front of Redis delays every reply by `--latency` seconds, like a Redis on another host.
+A blocking round trip stalls the whole event loop for that long, so sync throughput stays flat as concurrency
+grows, while awaited round trips overlap.
+
+Run from `services/alert_service`, with Redis listening on `--host`/`--port`:
+
+    python -m benchmarks.bench_async_ingestion --requests 2000 --concurrency 1 8 32 64 --latency 0.002
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+import redis
+import redis.asyncio
+
+from dao.redis.metrics import RedisMetrics
+
+
+def start_latency_proxy(host: str, port: int, latency: float) -> int:
+    """Start a proxy to Redis delaying every reply by `latency` seconds on its own thread; returns its port."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    proxy_port = []
+
+    async def pipe(reader, writer, delay):
+        try:
+            while data := await reader.read(65536):
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(host, port)
+        await asyncio.gather(pipe(client_reader, server_writer, 0), pipe(server_reader, client_writer, latency))
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        proxy_port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return proxy_port[0]
+
+
+def make_batch(request: int, metrics: int) -> list:
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return [
+        {"measurement": "cpu", "tags": {"host": f"server-{(request * metrics + i) % 500}"}, "fields": {"usage": 50.0}, "timestamp": now}
+        for i in range(metrics)
+    ]
+
+
+async def load(redis_metrics: RedisMetrics, use_async: bool, requests: int, concurrency: int, metrics: int) -> float:
+    """Run `requests` ingestion handlers, `concurrency` at a time; returns requests per second."""
+    queue = iter(range(requests))
+
+    async def handler(batch):
+        # The body of `cache_metrics`, before and after the switch to the async pool
+        if use_async:
+            await redis_metrics.store_metrics_in_cache_async(batch)
+        else:
+            redis_metrics.store_metrics_in_cache(batch)
+
+    async def client():
+        for request in queue:
+            await handler(make_batch(request, metrics))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run(args):
+    proxy_port = start_latency_proxy(args.host, args.port, args.latency)
+    sync_client = redis.Redis(host="127.0.0.1", port=proxy_port, password=args.password, decode_responses=True)
+    async_client = redis.asyncio.Redis(
+        connection_pool=redis.asyncio.BlockingConnectionPool(
+            host="127.0.0.1", port=proxy_port, password=args.password, decode_responses=True, max_connections=args.pool_size
+        )
+    )
+    redis_metrics = RedisMetrics(sync_client, async_redis_client=async_client)
+
+    print(f"{args.requests} requests of {args.metrics} metrics, {args.latency * 1000:.1f} ms added per Redis reply")
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12} {'speedup':>8}")
+    for concurrency in args.concurrency:
+        sync_rate = await load(redis_metrics, False, args.requests, concurrency, args.metrics)
+        async_rate = await load(redis_metrics, True, args.requests, concurrency, args.metrics)
+        print(f"{concurrency:>12} {sync_rate:>12.0f} {async_rate:>12.0f} {async_rate / sync_rate:>7.1f}x")
+
+    await async_client.connection_pool.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--metrics", type=int, default=10, help="metrics per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds added to every Redis reply")
+    parser.add_argument("--pool-size", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark EmailNotifier against a local aiosmtpd server, compared to one SMTP session per email.
+
+Run from `services/alert_service`:
+
+    python -m benchmarks.bench_email_notifier --notifications 1000 --recipients 20 --latency 0.005
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from notifiers.email_notifier import EmailNotifier
+from notifiers.smtp_pool import SMTPConnectionPool
+
+
+class SlowHandler:
+    """Accepts every email, answering each SMTP command after `latency` seconds, like a remote server."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.emails = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        await asyncio.sleep(self.latency)
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.emails += 1
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_notifications(count: int, recipients: int):
+    # Alerts firing together send the same message to every recipient of their rules
+    return [(f"user{i % recipients}@example.com", f"Alert {i // recipients}: cpu_usage.usage > 90") for i in range(count)]
+
+
+async def session_per_email(port: int, notifications, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(recipient, text):
+        message = EmailMessage()
+        message["From"], message["To"], message["Subject"] = "alerts@example.com", recipient, text
+        message.set_content(text)
+        async with slots:
+            await aiosmtplib.send(message, hostname="127.0.0.1", port=port, start_tls=False)
+
+    await asyncio.gather(*(send(recipient, text) for recipient, text in notifications))
+
+
+async def pooled(port: int, notifications, pool_size: int):
+    notifier = EmailNotifier(pool=SMTPConnectionPool("127.0.0.1", port, start_tls=False, size=pool_size), sender="alerts@example.com")
+    await asyncio.gather(*(notifier.send(recipient, text) for recipient, text in notifications))
+    await notifier.close()
+    return notifier.pool.opened
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notifications", type=int, default=1000, help="notifications to deliver")
+    parser.add_argument("--recipients", type=int, default=20, help="distinct recipients")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the server takes per command")
+    parser.add_argument("--pool-size", type=int, default=3, help="SMTP sessions of EmailNotifier, and concurrency of the baseline")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    handler = SlowHandler(args.latency)
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        notifications = make_notifications(args.notifications, args.recipients)
+
+        start = time.perf_counter()
+        asyncio.run(session_per_email(controller.port, notifications, args.pool_size))
+        baseline, baseline_emails = time.perf_counter() - start, handler.emails
+
+        handler.emails = 0
+        start = time.perf_counter()
+        sessions = asyncio.run(pooled(controller.port, notifications, args.pool_size))
+        candidate, candidate_emails = time.perf_counter() - start, handler.emails
+    finally:
+        controller.stop()
+
+    print(f"{args.notifications} notifications to {args.recipients} recipients, {args.latency * 1000:.1f} ms per SMTP command")
+    print(f"Session per email: {args.notifications / baseline:8.0f} notifications/s  ({baseline_emails} emails, {baseline_emails} sessions)")
+    print(
+        f"EmailNotifier:     {args.notifications / candidate:8.0f} notifications/s  ({candidate_emails} emails, {sessions} sessions, "
+        f"{baseline / candidate:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
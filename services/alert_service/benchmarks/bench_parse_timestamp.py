@@ -0,0 +1,66 @@
+"""
+Benchmark `RedisMetrics.parse_timestamp` against the `dateutil.parser.isoparse` parsing it used for every timestamp.
+
+Run from `services/alert_service`:
+
+    python -m benchmarks.bench_parse_timestamp --timestamps 100000
+"""
+
+import argparse
+import random
+import timeit
+
+from dateutil import parser as dateutil_parser
+
+from dao.redis.metrics import RedisMetrics
+
+SHAPES = {
+    "Z": "{date}T{time}Z",
+    "Z + micros": "{date}T{time}.{micros:06d}Z",
+    "offset": "{date}T{time}+02:00",
+    "offset + millis": "{date}T{time}.{millis:03d}-05:30",
+}
+
+
+def make_timestamps(shape: str, count: int) -> list:
+    timestamps = []
+    for _ in range(count):
+        date = f"2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        time = f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
+        timestamps.append(shape.format(date=date, time=time, micros=random.randint(0, 999999), millis=random.randint(0, 999)))
+    return timestamps
+
+
+def isoparse(timestamp: str) -> int:
+    # The body of `parse_timestamp` before the fast path
+    dt = dateutil_parser.isoparse(timestamp)
+    if dt.tzinfo is None:
+        raise ValueError(f"Invalid timestamp format (missing timezone): {timestamp}")
+    return int(dt.timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timestamps", type=int, default=100000, help="timestamps parsed per shape")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions, the best one is reported")
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"{args.timestamps} timestamps per shape, ns per timestamp")
+    print(f"{'shape':>16} {'isoparse':>10} {'parse_timestamp':>16} {'speedup':>8}")
+    for name, shape in SHAPES.items():
+        timestamps = make_timestamps(shape, args.timestamps)
+        assert [isoparse(t) for t in timestamps] == [RedisMetrics.parse_timestamp(t) for t in timestamps], f"results differ for {name}"
+
+        baseline = min(timeit.repeat(lambda: [isoparse(t) for t in timestamps], number=1, repeat=args.repeat))
+        candidate = min(timeit.repeat(lambda: [RedisMetrics.parse_timestamp(t) for t in timestamps], number=1, repeat=args.repeat))
+        per_timestamp = 1e9 / args.timestamps
+        print(f"{name:>16} {baseline * per_timestamp:>10.0f} {candidate * per_timestamp:>16.0f} {baseline / candidate:>7.1f}x")
+
+    epochs = [f"{random.randint(1700000000, 1800000000) * 1000}ms" for _ in range(args.timestamps)]
+    epoch = min(timeit.repeat(lambda: [RedisMetrics.parse_timestamp(t) for t in epochs], number=1, repeat=args.repeat))
+    print(f"{'epoch ms':>16} {'-':>10} {epoch * 1e9 / args.timestamps:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
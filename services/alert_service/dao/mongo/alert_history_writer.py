@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+from typing import Callable, List, Tuple
+
+import redis
+from bson import ObjectId, json_util
+from pymongo import errors
+
+from dao.mongo.mongo_alert_history import MongoAlertHistory
+from dao.redis.key_schema import KeySchema
+
+logger = logging.getLogger(__name__)
+
+
+class AlertHistoryWriter:
+    """
+    Buffers alert history events and writes them to MongoDB with unordered `insert_many` batches.
+
+    Events are flushed once `flush_size` events are buffered or the oldest buffered event is
+    `flush_interval` seconds old, and always by `flush()`, which workers call at the end of every task.
+
+    A failed batch is retried up to `max_retries` times with exponential backoff. Events are given
+    their `_id` when buffered, so a retry reports the events a previous attempt already wrote
+    as duplicates, which count as written. Events still failing afterwards are spilled to a Redis
+    list and replayed before the next batch, so a MongoDB outage does not lose history. Written events
+    are mirrored into the `alert_events` time-series collection, which the history API reads, with the
+    same retries; events whose mirror keeps failing are spilled too. Replaying them finds them already
+    in `alert_history` as duplicates, which are not counted as written again, and only mirrors them.
+    The mirror has no unique index, so a retried or replayed mirror write that had landed stores a second
+    copy; copies share the `history_id` that `MongoAlertHistory` queries deduplicate on.
+    """
+
+    FLUSH_SIZE = 500
+    FLUSH_INTERVAL = 5.0  # seconds the oldest event may wait in the buffer
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.2  # seconds before the first retry, doubled for every further one
+    MAX_SPILL = 100_000  # spilled events kept in Redis, the oldest are dropped first
+    DUPLICATE_KEY_ERROR = 11000
+
+    def __init__(
+        self,
+        mongo_alert_history: MongoAlertHistory,
+        redis_client: redis.Redis,
+        key_schema: KeySchema = None,
+        flush_size: int = None,
+        flush_interval: float = None,
+        max_retries: int = None,
+    ):
+        self.mongo_alert_history = mongo_alert_history
+        self.redis_client = redis_client
+        self.key_schema = key_schema or KeySchema()
+        self.flush_size = flush_size or self.FLUSH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else self.FLUSH_INTERVAL
+        self.max_retries = max_retries if max_retries is not None else self.MAX_RETRIES
+
+        self._buffer: List[dict] = []
+        self._oldest: float = None
+        self._lock = threading.Lock()
+
+    def log_alerts(self, log_entries: List[dict]):
+        """
+        Buffer alert events, flushing when the buffer is full or its oldest event is due.
+
+        Args:
+            log_entries (List[dict]): Documents built by `MongoAlertHistory.build_alert_entry`.
+        """
+        if not log_entries:
+            return
+
+        for entry in log_entries:
+            entry.setdefault("_id", ObjectId())
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.extend(log_entries)
+            due = len(self._buffer) >= self.flush_size or time.monotonic() - self._oldest >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every buffered event, replaying spilled events first.
+
+        Returns:
+            int: The number of events written to MongoDB.
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+
+            written, healthy = self._replay_spill()
+            for start in range(0, len(entries), self.flush_size):
+                batch = entries[start : start + self.flush_size]
+                # When even the replay failed, MongoDB is down: spill without waiting for retries
+                failed, _ = self._insert(batch) if healthy else (batch, 0)
+                written += len(batch) - len(failed)
+                failed = self._unwritten(batch, failed + self._mirror(batch, failed))
+                if failed:
+                    self._spill(failed)
+
+        if entries:
+            logger.debug(f"Flushed {written} alert history events ({len(entries)} buffered)")
+        return written
+
+    def _insert(self, entries: List[dict], collection=None, build: Callable[[dict], dict] = None) -> Tuple[List[dict], int]:
+        """
+        Insert a batch, retrying the events that failed. Returns the events that could not be written, and the
+        number of events already written before the first attempt (duplicates of it, as when replaying).
+
+        Args:
+            entries (List[dict]): The alert history documents.
+            collection: The collection to write to, `alert_history` by default.
+            build (Callable[[dict], dict], optional): Builds the document written for an entry, the entry itself by default.
+        """
+        collection = collection if collection is not None else self.mongo_alert_history.collection
+        existing = 0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.RETRY_BACKOFF * 2 ** (attempt - 1))
+            try:
+                collection.insert_many([build(entry) for entry in entries] if build else entries, ordered=False)
+                return [], existing
+            except errors.BulkWriteError as e:
+                # Unordered: only the reported events failed, and duplicates were written by an earlier attempt or flush
+                failed = {error["index"] for error in e.details["writeErrors"] if error["code"] != self.DUPLICATE_KEY_ERROR}
+                if not attempt:
+                    existing = len(e.details["writeErrors"]) - len(failed)
+                entries = [entry for i, entry in enumerate(entries) if i in failed]
+                if not entries:
+                    return [], existing
+                logger.warning(f"Failed to write {len(entries)} alert events to `{collection.name}` (attempt {attempt + 1}): {e}")
+            except errors.PyMongoError as e:
+                logger.warning(f"Failed to write {len(entries)} alert events to `{collection.name}` (attempt {attempt + 1}): {e}")
+        return entries, existing
+
+    def _mirror(self, entries: List[dict], failed: List[dict]) -> List[dict]:
+        """
+        Mirror the events of a batch that were written into the time-series collection.
+        Returns the events that could not be mirrored.
+        """
+        failed_ids = {id(entry) for entry in failed}
+        written = [entry for entry in entries if id(entry) not in failed_ids]
+        if not written:
+            return []
+        return self._insert(written, self.mongo_alert_history.events, MongoAlertHistory.build_event)[0]
+
+    @staticmethod
+    def _unwritten(entries: List[dict], failed: List[dict]) -> List[dict]:
+        """Return the failed events of a batch once each, in batch order."""
+        failed_ids = {id(entry) for entry in failed}
+        return [entry for entry in entries if id(entry) in failed_ids]
+
+    def _spill(self, entries: List[dict]):
+        """Keep events MongoDB rejected in Redis, to be replayed by a later flush."""
+        spill_key = self.key_schema.build_history_spill_key()
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.rpush(spill_key, *[json_util.dumps(entry) for entry in entries])
+            pipeline.ltrim(spill_key, -self.MAX_SPILL, -1)
+            pipeline.execute()
+            logger.error(f"Spilled {len(entries)} alert history events to Redis, MongoDB rejected them")
+        except redis.RedisError as e:
+            logger.error(f"Lost {len(entries)} alert history events, MongoDB and Redis both failed: {e}")
+
+    def _replay_spill(self) -> Tuple[int, bool]:
+        """
+        Write spilled events back to MongoDB, one batch per flush.
+
+        Returns:
+            Tuple[int, bool]: The number of events written to `alert_history`, and False if MongoDB rejected the replayed events.
+        """
+        spill_key = self.key_schema.build_history_spill_key()
+        try:
+            spilled = self.redis_client.lpop(spill_key, self.flush_size)
+        except redis.RedisError as e:
+            logger.error(f"Failed to read spilled alert history events: {e}")
+            return 0, True
+        if not spilled:
+            return 0, True
+
+        entries = [json_util.loads(entry) for entry in spilled]
+        failed, existing = self._insert(entries)
+        written = len(entries) - len(failed) - existing
+        failed = self._unwritten(entries, failed + self._mirror(entries, failed))
+        if failed:
+            # Still failing: put the events back at the head of the list, in their original order
+            try:
+                self.redis_client.lpush(spill_key, *[json_util.dumps(entry) for entry in reversed(failed)])
+            except redis.RedisError as e:
+                logger.error(f"Lost {len(failed)} spilled alert history events: {e}")
+        else:
+            logger.info(f"Replayed {len(entries)} spilled alert history events")
+        return written, not failed
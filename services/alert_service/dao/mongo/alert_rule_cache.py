@@ -0,0 +1,252 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+from pymongo import errors
+
+from models import AlertRuleSchema
+from dao.mongo.mongo_alert_rules import MongoAlertRule
+from dao.redis.key_schema import KeySchema
+from evaluators.shard_ring import ShardRing
+
+logger = logging.getLogger(__name__)
+
+
+class AlertRuleCache:
+    """
+    In-memory cache of validated alert rules for the evaluation worker.
+
+    The cache is loaded once, then kept current in a background thread:
+    - through a MongoDB change stream when the server supports it (replica set / sharded cluster),
+    - otherwise by polling the `updated_at` index for changed rules and scanning the `_id` index
+      to detect deletions.
+
+    Each rule is validated with `AlertRuleSchema` only when it changes, so reading the rules
+    costs neither a MongoDB query nor pydantic validation.
+    """
+
+    POLL_INTERVAL = 15  # seconds between polls when change streams are unavailable
+    POLL_OVERLAP = timedelta(seconds=5)  # re-read window covering clock skew between writers
+
+    def __init__(self, mongo_alert_rules: MongoAlertRule, poll_interval: float = None, key_schema: KeySchema = None):
+        self.mongo_alert_rules = mongo_alert_rules
+        self.poll_interval = poll_interval or self.POLL_INTERVAL
+        self.key_schema = key_schema or KeySchema()
+
+        self._rules: Dict[str, AlertRuleSchema] = {}
+        self._lock = threading.Lock()
+        self._last_updated_at: Optional[datetime] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop_event = threading.Event()
+        self.version = 0  # incremented on every change to the cached rules
+        self._series_index: Dict[str, List[AlertRuleSchema]] = {}
+        self._matcher_index: Dict[tuple, List[AlertRuleSchema]] = {}
+        self._series_index_version = -1
+        self._shards: Dict[int, List[AlertRuleSchema]] = {}
+        self._shards_key = None  # (version, shard ring) the shards were split for
+        self.mode = None  # "change_stream" or "polling" once started
+
+    def get_rules(self) -> List[AlertRuleSchema]:
+        """Return a snapshot of all cached, validated rules."""
+        with self._lock:
+            return list(self._rules.values())
+
+    def get_rules_by_ids(self, rule_ids: List[str]) -> List[AlertRuleSchema]:
+        """Return the cached rules with the given IDs, skipping rules deleted since."""
+        with self._lock:
+            return [self._rules[rule_id] for rule_id in rule_ids if rule_id in self._rules]
+
+    def get_rules_for_series(self, series_keys: List[str]) -> List[AlertRuleSchema]:
+        """
+        Return the rules depending on any of the given series.
+
+        Args:
+            series_keys (List[str]): Series keys as built by `KeySchema.build_redis_metric_key`.
+
+        Returns:
+            List[AlertRuleSchema]: The matching rules, each at most once.
+        """
+        with self._lock:
+            if self._series_index_version != self.version:
+                self._series_index = {}
+                self._matcher_index = {}
+                for rule in self._rules.values():
+                    if rule.tag_matchers:
+                        self._matcher_index.setdefault((rule.metric_name, rule.field_name), []).append(rule)
+                        continue
+                    series_key = self.key_schema.build_redis_metric_key(rule.metric_name, rule.tags, rule.field_name)
+                    self._series_index.setdefault(series_key, []).append(rule)
+                self._series_index_version = self.version
+
+            rules = {}
+            for series_key in series_keys:
+                for rule in self._series_index.get(series_key, ()):
+                    rules[rule.rule_id] = rule
+                # Matcher rules are selected by measurement and field, the evaluator resolves their series
+                if self._matcher_index:
+                    _, _, metric_name, rest = series_key.split(":", 3)
+                    for rule in self._matcher_index.get((metric_name, rest.rsplit(":", 1)[-1]), ()):
+                        rules[rule.rule_id] = rule
+            return list(rules.values())
+
+    def get_rules_in_shard(self, shard_ring: ShardRing, shard: int) -> List[AlertRuleSchema]:
+        """
+        Return the rules assigned to one evaluation shard.
+
+        Args:
+            shard_ring (ShardRing): The ring assigning rules to shards.
+            shard (int): The shard number.
+
+        Returns:
+            List[AlertRuleSchema]: The rules of the shard.
+        """
+        with self._lock:
+            if self._shards_key != (self.version, shard_ring):
+                self._shards = shard_ring.split(list(self._rules.values()))
+                self._shards_key = (self.version, shard_ring)
+            return list(self._shards.get(shard, ()))
+
+    def ensure_started(self):
+        """
+        Load the cache and start the refresh thread if it is not running in this process.
+        Safe to call at the start of every task; threads do not survive a prefork worker fork.
+        """
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        self._pid = os.getpid()
+        self._stop_event.clear()
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="alert-rule-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the refresh thread."""
+        self._stop_event.set()
+
+    def load(self):
+        """Load and validate every rule, replacing the cached rules."""
+        rules = {}
+        last_updated_at = None
+        for document in self.mongo_alert_rules.get_alert_rules():
+            rule = self._validate(document)
+            if rule is not None:
+                rules[rule.rule_id] = rule
+            last_updated_at = self._latest(last_updated_at, document.get("updated_at"))
+
+        with self._lock:
+            self._rules = rules
+            self._last_updated_at = last_updated_at
+            self.version += 1
+
+        logger.info(f"Loaded {len(rules)} alert rules into the rule cache.")
+
+    def apply_change(self, change: dict):
+        """
+        Apply a change stream event to the cache.
+
+        Args:
+            change (dict): The change event as returned by `collection.watch()`.
+        """
+        operation = change.get("operationType")
+        rule_id = str(change.get("documentKey", {}).get("_id"))
+
+        if operation in ("insert", "update", "replace"):
+            document = change.get("fullDocument")
+            if document is None:  # Deleted before the update could be looked up
+                self._remove(rule_id)
+                return
+            self._upsert({**document, "_id": str(document["_id"])})
+        elif operation == "delete":
+            self._remove(rule_id)
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.load()
+
+    def poll(self):
+        """Fetch rules changed since the last poll and drop deleted ones."""
+        since = self._last_updated_at - self.POLL_OVERLAP if self._last_updated_at else None
+        for document in self.mongo_alert_rules.get_alert_rules_updated_since(since):
+            self._upsert(document)
+
+        # Deletions leave no trace in `updated_at`. Compare IDs every poll: counts match when a rule is
+        # deleted and another inserted in the same interval (e.g. a pruning bulk sync)
+        existing_ids = self.mongo_alert_rules.get_alert_rule_ids()
+        with self._lock:
+            removed = [rule_id for rule_id in self._rules if rule_id not in existing_ids]
+            for rule_id in removed:
+                del self._rules[rule_id]
+            if removed:
+                self.version += 1
+
+    def _run(self):
+        """Refresh loop: follow the change stream, fall back to polling if unsupported."""
+        resume_token = None
+        while not self._stop_event.is_set():
+            try:
+                with self.mongo_alert_rules.watch_alert_rules(resume_after=resume_token) as stream:
+                    self.mode = "change_stream"
+                    logger.info("Following alert rule changes through a change stream.")
+                    while not self._stop_event.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            self.apply_change(change)
+                        resume_token = stream.resume_token
+            except errors.OperationFailure as e:
+                # Standalone servers do not support change streams
+                logger.info(f"Change streams unavailable ({e}), polling alert rules every {self.poll_interval}s.")
+                self._poll_forever()
+                return
+            except errors.PyMongoError as e:
+                logger.error(f"Alert rule change stream failed: {e}. Reloading rules.")
+                resume_token = None
+                self._stop_event.wait(self.poll_interval)
+                self._safe_load()
+
+    def _poll_forever(self):
+        self.mode = "polling"
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except errors.PyMongoError as e:
+                logger.error(f"Failed to poll alert rules: {e}")
+
+    def _safe_load(self):
+        try:
+            self.load()
+        except errors.PyMongoError as e:
+            logger.error(f"Failed to reload alert rules: {e}")
+
+    def _upsert(self, document: dict):
+        rule = self._validate(document)
+        rule_id = str(document["_id"])
+        with self._lock:
+            self._last_updated_at = self._latest(self._last_updated_at, document.get("updated_at"))
+            if self._rules.get(rule_id) == rule:  # Re-read without changes
+                return
+            if rule is None:
+                self._rules.pop(rule_id, None)
+            else:
+                self._rules[rule_id] = rule
+            self.version += 1
+
+    def _remove(self, rule_id: str):
+        with self._lock:
+            if self._rules.pop(rule_id, None) is not None:
+                self.version += 1
+
+    def _validate(self, document: dict) -> Optional[AlertRuleSchema]:
+        try:
+            return AlertRuleSchema(**document)
+        except ValidationError as e:
+            logger.error(f"Skipping invalid alert rule {document.get('_id')}: {e.errors()}")
+            return None
+
+    @staticmethod
+    def _latest(current: Optional[datetime], candidate: Optional[datetime]) -> Optional[datetime]:
+        if candidate is None:
+            return current
+        return candidate if current is None or candidate > current else current
@@ -1,6 +1,9 @@
 import logging
-from datetime import datetime
-from pymongo import MongoClient, errors
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING, MongoClient, errors
 
 logger = logging.getLogger(__name__)
 
@@ -8,8 +11,20 @@ logger = logging.getLogger(__name__)
 class MongoAlertHistory:
     """
     Handles storing alert history in MongoDB for long-term tracking.
+
+    Events are written to `alert_history` and mirrored into `alert_events`, a time-series collection
+    whose `meta` field holds the rule ID, metric, field and tags. History queries and reports run as
+    aggregations on `alert_events`, served by compound indexes on `meta.rule_id` and `meta.metric_name`.
+
+    A time-series collection has no unique index, so a mirror write that is retried or replayed after
+    it landed stores the event twice. Every event carries the `_id` of its `alert_history` document as
+    `history_id`, and queries and reports keep one event per `history_id`.
     """
 
+    EVENTS_COLLECTION = "alert_events"
+    EPOCH = datetime(1970, 1, 1)
+    RETENTION_SECONDS = 60 * 60 * 24 * 30
+
     def __init__(self, mongo_client: MongoClient, mongo_db_name: str):
         """
         Initializes the MongoDB alert history handler.
@@ -23,6 +38,7 @@ class MongoAlertHistory:
         self.client = mongo_client
         self.db = self.client[mongo_db_name]
         self.collection = self.db["alert_history"]
+        self.events = self.db[self.EVENTS_COLLECTION]
 
     @classmethod
     def setup_indexes(cls, mongo_client: MongoClient, mongo_db_name: str):
@@ -35,14 +51,52 @@ class MongoAlertHistory:
 
         # Ensure a TTL index on `timestamp` for automatic deletion after 30 days
         try:
-            collection.create_index("timestamp", expireAfterSeconds=60 * 60 * 24 * 30)
+            collection.create_index("timestamp", expireAfterSeconds=cls.RETENTION_SECONDS)
             logger.info("Ensured `timestamp` index exists for alert history.")
         except errors.PyMongoError as e:
             logger.error(f"Failed to create index on `timestamp`: {e}")
 
-    def log_alert(self, rule_id: str, metric_name: str, tags: dict, field_name: str, status: str):
+        # Time-series mirror queried by the history API, backfilled once when created
+        try:
+            if cls.EVENTS_COLLECTION not in db.list_collection_names(filter={"name": cls.EVENTS_COLLECTION}):
+                db.create_collection(
+                    cls.EVENTS_COLLECTION,
+                    timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+                    expireAfterSeconds=cls.RETENTION_SECONDS,
+                )
+                cls.backfill_events(collection, db[cls.EVENTS_COLLECTION])
+            events = db[cls.EVENTS_COLLECTION]
+            events.create_index([("meta.rule_id", 1), ("timestamp", DESCENDING)])
+            events.create_index([("meta.metric_name", 1), ("timestamp", DESCENDING)])
+            logger.info(f"Ensured `{cls.EVENTS_COLLECTION}` time-series collection and indexes exist.")
+        except errors.PyMongoError as e:
+            logger.error(f"Failed to set up the `{cls.EVENTS_COLLECTION}` time-series collection: {e}")
+
+    @classmethod
+    def backfill_events(cls, collection, events, batch_size: int = 1000) -> int:
         """
-        Logs an alert event (triggered/recovered) into MongoDB.
+        Copy the existing alert history into the time-series collection, in batches.
+
+        Returns:
+            int: The number of events copied.
+        """
+        copied, batch = 0, []
+        for entry in collection.find({}).sort("timestamp", 1).batch_size(batch_size):
+            batch.append(cls.build_event(entry))
+            if len(batch) == batch_size:
+                events.insert_many(batch, ordered=False)
+                copied, batch = copied + len(batch), []
+        if batch:
+            events.insert_many(batch, ordered=False)
+            copied += len(batch)
+
+        logger.info(f"Backfilled {copied} alert history events into `{cls.EVENTS_COLLECTION}`.")
+        return copied
+
+    @staticmethod
+    def build_alert_entry(rule_id: str, metric_name: str, tags: dict, field_name: str, status: str) -> dict:
+        """
+        Builds an alert history document.
 
         Args:
             rule_id (str): Unique identifier for the alert rule.
@@ -51,7 +105,7 @@ class MongoAlertHistory:
             field_name (str): The specific field name.
             status (str): "triggered" or "recovered".
         """
-        log_entry = {
+        return {
             "rule_id": rule_id,
             "metric_name": metric_name,
             "tags": tags,
@@ -60,8 +114,251 @@ class MongoAlertHistory:
             "timestamp": datetime.utcnow(),
         }
 
+    @staticmethod
+    def build_event(log_entry: dict) -> dict:
+        """Build the time-series document mirroring an alert history document, keyed by its `_id` as `history_id`."""
+        return {
+            "history_id": log_entry.get("_id"),
+            "timestamp": log_entry["timestamp"],
+            "meta": {
+                "rule_id": log_entry["rule_id"],
+                "metric_name": log_entry["metric_name"],
+                "field_name": log_entry["field_name"],
+                "tags": log_entry["tags"],
+            },
+            "status": log_entry["status"],
+        }
+
+    def log_alert(self, rule_id: str, metric_name: str, tags: dict, field_name: str, status: str):
+        """
+        Logs an alert event (triggered/recovered) into MongoDB.
+
+        Args:
+            rule_id (str): Unique identifier for the alert rule.
+            metric_name (str): The metric name.
+            tags (dict): The tags for the metric.
+            field_name (str): The specific field name.
+            status (str): "triggered" or "recovered".
+        """
+        log_entry = self.build_alert_entry(rule_id, metric_name, tags, field_name, status)
+
         try:
             self.collection.insert_one(log_entry)
             logger.info(f"Logged alert event in MongoDB: {log_entry}")
         except errors.PyMongoError as e:
             logger.error(f"Failed to log alert event in MongoDB: {e}")
+            return
+        self.mirror_events([log_entry])
+
+    def log_alerts(self, log_entries: List[dict]):
+        """
+        Logs a batch of alert events into MongoDB with a single unordered `insert_many`.
+
+        Args:
+            log_entries (List[dict]): Documents built by `build_alert_entry`.
+        """
+        if not log_entries:
+            return
+
+        try:
+            self.collection.insert_many(log_entries, ordered=False)
+            logger.info(f"Logged {len(log_entries)} alert events in MongoDB")
+        except errors.PyMongoError as e:
+            logger.error(f"Failed to log {len(log_entries)} alert events in MongoDB: {e}")
+            return
+        self.mirror_events(log_entries)
+
+    def mirror_events(self, log_entries: List[dict]):
+        """
+        Mirror written alert history documents into the time-series collection.
+
+        Args:
+            log_entries (List[dict]): Documents already written to `alert_history`.
+        """
+        if not log_entries:
+            return
+
+        try:
+            self.events.insert_many([self.build_event(entry) for entry in log_entries], ordered=False)
+        except errors.PyMongoError as e:
+            logger.error(f"Failed to mirror {len(log_entries)} alert events into `{self.EVENTS_COLLECTION}`: {e}")
+
+    @staticmethod
+    def build_event_filter(
+        rule_id: str = None, metric_name: str = None, status: str = None, start: datetime = None, end: datetime = None
+    ) -> dict:
+        """Build the `alert_events` filter shared by history queries and reports."""
+        query = {}
+        if rule_id:
+            query["meta.rule_id"] = rule_id
+        if metric_name:
+            query["meta.metric_name"] = metric_name
+        if status:
+            query["status"] = status
+        if start or end:
+            query["timestamp"] = {}
+            if start:
+                query["timestamp"]["$gte"] = start
+            if end:
+                query["timestamp"]["$lt"] = end
+        return query
+
+    def get_events(self, query: dict, limit: int, cursor: Optional[str] = None) -> dict:
+        """
+        Return one page of alert events, newest first.
+
+        Pages are keyed on `(timestamp, history_id)`, so paging stays cheap however deep it goes, and the
+        copies of an event left by retried mirror writes sort next to each other and are returned once.
+
+        Args:
+            query (dict): A filter built by `build_event_filter`.
+            limit (int): The page size.
+            cursor (str, optional): The `next_cursor` of the previous page.
+
+        Returns:
+            dict: `events` and the `next_cursor` of the following page, None on the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        after = {}
+        if cursor:
+            timestamp, history_id = self.decode_cursor(cursor)
+            query = {"$and": [query, {"timestamp": {"$lte": timestamp}}]}
+            after = {"$or": [{"timestamp": {"$lt": timestamp}}, {"timestamp": timestamp, "history_id": {"$lt": history_id}}]}
+
+        # Duplicates are rare, so a page is read with a limit doubled only until it holds enough distinct events
+        fetch = limit + 1
+        while True:
+            pipeline = [
+                {"$match": query},
+                {"$addFields": {"history_id": {"$ifNull": ["$history_id", "$_id"]}}},  # events mirrored before `history_id`
+                {"$match": after},
+                {"$sort": {"timestamp": -1, "history_id": -1}},
+                {"$limit": fetch},
+            ]
+            documents = list(self.events.aggregate(pipeline))
+            events = []
+            for event in documents:
+                if not events or events[-1]["history_id"] != event["history_id"]:
+                    events.append(event)
+            if len(events) > limit or len(documents) < fetch:
+                break
+            fetch *= 2
+
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            last = events[-1]
+            next_cursor = f"{(last['timestamp'].replace(tzinfo=None) - self.EPOCH) // timedelta(milliseconds=1)}_{last['history_id']}"
+
+        return {
+            "events": [
+                {"id": str(event["history_id"]), "timestamp": event["timestamp"], "status": event["status"], **event["meta"]}
+                for event in events
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    @classmethod
+    def decode_cursor(cls, cursor: str):
+        """Split a page cursor into its UTC timestamp and `history_id`."""
+        try:
+            millis, event_id = cursor.split("_", 1)
+            return cls.EPOCH + timedelta(milliseconds=int(millis)), ObjectId(event_id)
+        except (ValueError, InvalidId) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    def get_report(self, query: dict, top: int = 10) -> dict:
+        """
+        Aggregate firing counts, mean time to recovery and the noisiest rules, server-side.
+
+        Copies of an event are dropped first. Every `triggered` event is then paired with the next event of
+        the same series; when that is a `recovered` event, the time between them counts towards the mean
+        time to recovery.
+
+        Args:
+            query (dict): A filter built by `build_event_filter`.
+            top (int): The number of noisiest rules to return.
+
+        Returns:
+            dict: `totals` over every rule and the `noisiest` rules by firing count.
+        """
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": {"$ifNull": ["$history_id", "$_id"]}, "event": {"$first": "$$ROOT"}}},
+            {"$replaceWith": "$event"},
+            {
+                "$setWindowFields": {
+                    "partitionBy": {"rule_id": "$meta.rule_id", "tags": "$meta.tags"},
+                    "sortBy": {"timestamp": 1},
+                    "output": {
+                        "next_status": {"$shift": {"output": "$status", "by": 1}},
+                        "next_timestamp": {"$shift": {"output": "$timestamp", "by": 1}},
+                    },
+                }
+            },
+            {"$match": {"status": "triggered"}},
+            {
+                "$group": {
+                    "_id": "$meta.rule_id",
+                    "metric_name": {"$first": "$meta.metric_name"},
+                    "field_name": {"$first": "$meta.field_name"},
+                    "firing_count": {"$sum": 1},
+                    "recovered_count": {"$sum": {"$cond": [{"$eq": ["$next_status", "recovered"]}, 1, 0]}},
+                    "recovery_ms": {
+                        "$sum": {
+                            "$cond": [{"$eq": ["$next_status", "recovered"]}, {"$subtract": ["$next_timestamp", "$timestamp"]}, 0]
+                        }
+                    },
+                    "last_fired": {"$max": "$timestamp"},
+                }
+            },
+            {
+                "$facet": {
+                    "totals": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "rules": {"$sum": 1},
+                                "firing_count": {"$sum": "$firing_count"},
+                                "recovered_count": {"$sum": "$recovered_count"},
+                                "recovery_ms": {"$sum": "$recovery_ms"},
+                            }
+                        },
+                        {"$project": {"_id": 0, "rules": 1, "firing_count": 1, "recovered_count": 1, "mttr_seconds": self._mttr_seconds()}},
+                    ],
+                    "noisiest": [
+                        {"$sort": {"firing_count": -1, "_id": 1}},
+                        {"$limit": top},
+                        {
+                            "$project": {
+                                "_id": 0,
+                                "rule_id": "$_id",
+                                "metric_name": 1,
+                                "field_name": 1,
+                                "firing_count": 1,
+                                "recovered_count": 1,
+                                "mttr_seconds": self._mttr_seconds(),
+                                "last_fired": 1,
+                            }
+                        },
+                    ],
+                }
+            },
+        ]
+        result = next(self.events.aggregate(pipeline), {"totals": [], "noisiest": []})
+
+        totals = result["totals"][0] if result["totals"] else {"rules": 0, "firing_count": 0, "recovered_count": 0, "mttr_seconds": None}
+        return {"totals": totals, "noisiest": result["noisiest"]}
+
+    @staticmethod
+    def _mttr_seconds() -> dict:
+        """Aggregation expression of the mean time to recovery in seconds, null without recoveries."""
+        return {
+            "$cond": [
+                {"$gt": ["$recovered_count", 0]},
+                {"$round": [{"$divide": ["$recovery_ms", {"$multiply": ["$recovered_count", 1000]}]}, 1]},
+                None,
+            ]
+        }
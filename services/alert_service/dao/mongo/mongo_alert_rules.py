@@ -1,7 +1,9 @@
+import json
 import logging
 from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
 from bson import ObjectId, errors
-from pymongo import MongoClient
+from pymongo import DeleteOne, MongoClient, UpdateOne, errors as pymongo_errors
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,35 @@ class MongoAlertRule:
         self.db = self.client[mongo_db_name]
         self.collection = self.db["alert_rules"]
 
+    @classmethod
+    def setup_indexes(cls, mongo_client: MongoClient, mongo_db_name: str):
+        """
+        Ensures the `updated_at` index used to poll for changed rules, the `metric_name` index used by listings
+        and the unique `external_id` index used by bulk syncs exist.
+        This function should only be called once at application startup.
+        """
+        collection = mongo_client[mongo_db_name]["alert_rules"]
+
+        try:
+            collection.create_index("updated_at")
+            logger.info("Ensured `updated_at` index exists for alert rules.")
+        except pymongo_errors.PyMongoError as e:
+            logger.error(f"Failed to create index on `updated_at`: {e}")
+
+        # Listing filtered by metric pages on `_id` within the metric
+        try:
+            collection.create_index([("metric_name", 1), ("_id", 1)])
+            logger.info("Ensured `metric_name` index exists for alert rules.")
+        except pymongo_errors.PyMongoError as e:
+            logger.error(f"Failed to create index on `metric_name`: {e}")
+
+        # Rules managed as code are matched on their external ID; rules created without one are not indexed
+        try:
+            collection.create_index("external_id", unique=True, partialFilterExpression={"external_id": {"$type": "string"}})
+            logger.info("Ensured unique `external_id` index exists for alert rules.")
+        except pymongo_errors.PyMongoError as e:
+            logger.error(f"Failed to create index on `external_id`: {e}")
+
     def get_alert_rule_by_id(self, rule_id: str):
         """Retrieve an alert rule by its ID."""
         try:
@@ -39,7 +70,76 @@ class MongoAlertRule:
 
     def get_alert_rules(self):
         """Retrieve all alert rules from the database."""
-        return [{**rule, "_id": str(rule["_id"])} for rule in self.collection.find({})]
+        return [self._with_str_id(rule) for rule in self.collection.find({})]
+
+    def list_alert_rules(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        metric_name: Optional[str] = None,
+        tags: Optional[dict] = None,
+        status: Optional[str] = None,
+    ) -> dict:
+        """
+        Return one page of alert rules, oldest first.
+
+        Pages are keyed on `_id`, so paging stays cheap however deep it goes.
+
+        Args:
+            limit (int): The page size.
+            cursor (str, optional): The `next_cursor` of the previous page.
+            fields (List[str], optional): The fields to return, besides `_id`; all of them if not given.
+            metric_name, status (str, optional): Exact match filters.
+            tags (dict, optional): Tag values every returned rule must have.
+
+        Returns:
+            dict: `alert_rules` and the `next_cursor` of the following page, None on the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        query = {f"tags.{tag}": value for tag, value in (tags or {}).items()}
+        if metric_name is not None:
+            query["metric_name"] = metric_name
+        if status is not None:
+            query["status"] = status
+        if cursor:
+            try:
+                query["_id"] = {"$gt": ObjectId(cursor)}
+            except errors.InvalidId as e:
+                raise ValueError(f"Invalid cursor: {cursor}") from e
+
+        projection = dict.fromkeys(fields, 1) if fields else None
+        rules = [self._with_str_id(rule) for rule in self.collection.find(query, projection).sort("_id", 1).limit(limit + 1)]
+
+        next_cursor = None
+        if len(rules) > limit:
+            rules = rules[:limit]
+            next_cursor = rules[-1]["_id"]
+
+        return {"alert_rules": rules, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _with_str_id(rule: dict) -> dict:
+        rule["_id"] = str(rule["_id"])
+        return rule
+
+    def get_alert_rules_updated_since(self, updated_at: datetime):
+        """Retrieve alert rules created or updated at or after `updated_at`, oldest change first."""
+        query = {"updated_at": {"$gte": updated_at}} if updated_at else {}
+        return [self._with_str_id(rule) for rule in self.collection.find(query).sort("updated_at", 1)]
+
+    def get_alert_rule_ids(self):
+        """Retrieve the IDs of all alert rules, read from the `_id` index without fetching the documents."""
+        return {str(rule["_id"]) for rule in self.collection.find({}, {"_id": 1}).hint([("_id", 1)])}
+
+    def watch_alert_rules(self, resume_after: dict = None):
+        """
+        Open a change stream on the alert rules collection.
+        Requires a replica set or sharded cluster; raises `OperationFailure` on a standalone server.
+        """
+        return self.collection.watch(full_document="updateLookup", resume_after=resume_after, max_await_time_ms=1000)
 
     def delete_alert_rule(self, rule_id: str):
         """Delete an alert rule by its ID."""
@@ -57,8 +157,9 @@ class MongoAlertRule:
         unit_multipliers = {"seconds": 1, "minutes": 60, "hours": 3600}
         return value * unit_multipliers.get(unit, 1)  # Default to seconds if invalid unit
 
-    def create_alert_rule(
-        self,
+    @classmethod
+    def build_rule(
+        cls,
         metric_name,
         tags,
         field_name,
@@ -71,34 +172,147 @@ class MongoAlertRule:
         recovery_time_unit=None,
         notification_channels=None,
         recipients=None,
-    ):
+        aggregation=None,
+        tag_matchers=None,
+        group_by=None,
+        external_id=None,
+    ) -> dict:
         """
-        Creates an alert rule and inserts it into the alert_rules collection.
+        Build the stored fields of an alert rule, without its timestamps and status.
         """
         if notification_channels is None:
             notification_channels = ["telegram"]
         if recipients is None:
             recipients = {}
 
-        duration_seconds = self.convert_to_seconds(duration_value, duration_unit)
-
         recovery_seconds = None
         if use_recovery_alert and recovery_time_value and recovery_time_unit:
-            recovery_seconds = self.convert_to_seconds(recovery_time_value, recovery_time_unit)
+            recovery_seconds = cls.convert_to_seconds(recovery_time_value, recovery_time_unit)
 
-        rule = {
+        return {
             "metric_name": metric_name,
             "tags": tags,
             "field_name": field_name,
             "threshold": threshold,
-            "duration": duration_seconds,
+            "duration": cls.convert_to_seconds(duration_value, duration_unit),
             "comparison": comparison,
             "notification_channels": notification_channels,
             "recipients": recipients,
             "use_recovery_alert": use_recovery_alert,
             "recovery_time": recovery_seconds,
-            "created_at": datetime.now(timezone.utc),
-            "status": "active",
+            "aggregation": aggregation,
+            "tag_matchers": tag_matchers,
+            "group_by": group_by,
+            "external_id": external_id,
         }
 
+    def create_alert_rule(self, **fields):
+        """
+        Creates an alert rule and inserts it into the alert_rules collection.
+        Takes the fields of `build_rule`; raises `DuplicateKeyError` if another rule has the same `external_id`.
+        """
+        now = datetime.now(timezone.utc)
+        rule = {**self.build_rule(**fields), "created_at": now, "updated_at": now, "status": "active"}
         return self.collection.insert_one(rule).inserted_id
+
+    def sync_alert_rules(self, rules: Dict[str, dict], prune: bool = False) -> Dict[str, dict]:
+        """
+        Apply a set of rules keyed by their `external_id` with one unordered `bulk_write`.
+
+        Rules are compared to the stored ones first: missing rules are upserted, changed ones updated, and
+        unchanged ones left alone so their `updated_at` (and the rule cache) is not churned. A key that is the
+        `_id` of a rule without an external ID, as exported by `export_alert_rules`, matches that rule, which
+        then takes the key as its external ID.
+
+        Args:
+            rules (Dict[str, dict]): Rules built by `build_rule`, by external ID.
+            prune (bool): Also delete the stored rules with an external ID not in `rules`.
+
+        Returns:
+            Dict[str, dict]: By external ID, the `status` ("created", "updated", "unchanged", "deleted" or
+            "failed"), the `rule_id`, and the `error` of failed writes.
+        """
+        query = {"external_id": {"$type": "string"}} if prune else {"external_id": {"$in": list(rules)}}
+        unmanaged_ids = [ObjectId(key) for key in rules if ObjectId.is_valid(key)]
+        if unmanaged_ids:
+            query = {"$or": [query, {"_id": {"$in": unmanaged_ids}, "external_id": None}]}
+        existing = {
+            stored.get("external_id") or str(stored["_id"]): stored
+            for stored in self.collection.find(query, {"created_at": 0, "updated_at": 0, "status": 0})
+        }
+        now = datetime.now(timezone.utc)
+
+        operations, keys, results = [], [], {}
+        for key, rule in rules.items():
+            stored = existing.get(key)
+            if stored is None:
+                update = {"$set": {**rule, "updated_at": now}, "$setOnInsert": {"created_at": now, "status": "active"}}
+                operations.append(UpdateOne({"external_id": key}, update, upsert=True))
+                results[key] = {"status": "created", "rule_id": None}
+            elif any(stored.get(field) != value for field, value in rule.items()):
+                operations.append(UpdateOne({"_id": stored["_id"]}, {"$set": {**rule, "updated_at": now}}))
+                results[key] = {"status": "updated", "rule_id": str(stored["_id"])}
+            else:
+                results[key] = {"status": "unchanged", "rule_id": str(stored["_id"])}
+                continue
+            keys.append(key)
+
+        if prune:
+            for key, stored in existing.items():
+                if key not in rules:
+                    operations.append(DeleteOne({"_id": stored["_id"]}))
+                    results[key] = {"status": "deleted", "rule_id": str(stored["_id"])}
+                    keys.append(key)
+
+        if not operations:
+            return results
+
+        try:
+            upserted = self.collection.bulk_write(operations, ordered=False).upserted_ids
+        except pymongo_errors.BulkWriteError as e:
+            upserted = {upsert["index"]: upsert["_id"] for upsert in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                results[keys[error["index"]]] = {**results[keys[error["index"]]], "status": "failed", "error": error.get("errmsg")}
+        for index, rule_id in upserted.items():
+            results[keys[index]]["rule_id"] = str(rule_id)
+
+        logger.info(f"Synced {len(rules)} alert rules with {len(operations)} writes.")
+        return results
+
+    def export_alert_rules(self, batch_size: int = 500) -> Iterator[str]:
+        """
+        Stream every alert rule as NDJSON, one `AlertRuleCreate` object per line, so an export can be
+        posted back to `/alerts/bulk` unchanged. Durations are exported in seconds, and rules without
+        an external ID are exported with their `_id` as one.
+        """
+        lines = []
+        for stored in self.collection.find({}, {"created_at": 0, "updated_at": 0, "status": 0}).batch_size(batch_size):
+            lines.append(json.dumps(self.to_rule_create(stored)) + "\n")
+            if len(lines) >= batch_size:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+    @staticmethod
+    def to_rule_create(stored: dict) -> dict:
+        """Convert a stored rule back to the fields of `AlertRuleCreate`, with its `_id` as the fallback external ID."""
+        recovery_time = stored.get("recovery_time")
+        return {
+            "external_id": stored.get("external_id") or str(stored["_id"]),
+            "metric_name": stored["metric_name"],
+            "tags": stored.get("tags") or {},
+            "field_name": stored["field_name"],
+            "threshold": stored["threshold"],
+            "duration_value": stored["duration"],
+            "duration_unit": "seconds",
+            "comparison": stored["comparison"],
+            "notification_channels": stored.get("notification_channels"),
+            "recipients": stored.get("recipients") or {},
+            "use_recovery_alert": stored.get("use_recovery_alert", False),
+            "recovery_time_value": recovery_time,
+            "recovery_time_unit": "seconds" if recovery_time is not None else None,
+            "aggregation": stored.get("aggregation"),
+            "tag_matchers": stored.get("tag_matchers"),
+            "group_by": stored.get("group_by"),
+        }
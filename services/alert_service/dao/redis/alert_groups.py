@@ -0,0 +1,193 @@
+import json
+import logging
+from typing import Dict, List, Optional
+
+from dao.redis.base import RedisDaoBase
+from dao.redis.notification_queue import RedisNotificationQueue
+from models import AlertRuleSchema
+
+logger = logging.getLogger(__name__)
+
+
+class RedisAlertGroups(RedisDaoBase):
+    """
+    Groups alert state changes by labels and notifies every group with one digest, Alertmanager-style.
+
+    Labels of an alert are its `rule_id`, `metric_name`, `field_name` and tags; alerts with the same
+    values for the `group_by` labels share a group. Every group is a hash of its alerts by state ID,
+    and its next notification time is its score in the due set:
+        - `group_wait` after the first alert of a new group, so alerts firing together are sent together,
+        - then every `group_interval`, if the group changed since its last digest,
+        - and every `repeat_interval` while alerts keep firing without changes.
+    Resolved alerts are dropped once a digest reported them; a group without firing alerts is deleted.
+    """
+
+    GROUP_WAIT = 30
+    GROUP_INTERVAL = 300
+    REPEAT_INTERVAL = 4 * 3600
+    MAX_DIGEST_ALERTS = 50  # alerts listed per status in one digest, the rest are counted
+
+    # Checks a group is due, takes the alerts to report and reschedules the group, atomically.
+    # Returns the alerts to report, or nothing when there is nothing new and no repeat is due.
+    FLUSH_SCRIPT = """
+    local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+    if not score or tonumber(score) > tonumber(ARGV[2]) then
+        return {}
+    end
+
+    local now = tonumber(ARGV[2])
+    local fields = redis.call('HGETALL', KEYS[1])
+    local changed = redis.call('HEXISTS', KEYS[1], '__changed__') == 1
+    local last_sent = tonumber(redis.call('HGET', KEYS[1], '__last_sent__') or '0')
+    local alerts, resolved, firing = {}, {}, 0
+    for i = 1, #fields, 2 do
+        local name = fields[i]
+        if string.sub(name, 1, 2) ~= '__' then
+            table.insert(alerts, fields[i + 1])
+            if cjson.decode(fields[i + 1]).status == 'recovered' then
+                table.insert(resolved, name)
+            else
+                firing = firing + 1
+            end
+        end
+    end
+
+    local send = changed or (firing > 0 and now - last_sent >= tonumber(ARGV[4]))
+    if send then
+        for _, name in ipairs(resolved) do
+            redis.call('HDEL', KEYS[1], name)
+        end
+        redis.call('HDEL', KEYS[1], '__changed__')
+        redis.call('HSET', KEYS[1], '__last_sent__', ARGV[2])
+    end
+
+    if firing > 0 then
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), ARGV[1])
+    else
+        redis.call('DEL', KEYS[1])
+        redis.call('ZREM', KEYS[2], ARGV[1])
+    end
+
+    if send then
+        return alerts
+    end
+    return {}
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        key_schema=None,
+        group_by: List[str] = None,
+        group_wait: int = None,
+        group_interval: int = None,
+        repeat_interval: int = None,
+        **kwargs,
+    ):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self.group_by = group_by if group_by is not None else ["metric_name"]
+        self.group_wait = group_wait if group_wait is not None else self.GROUP_WAIT
+        self.group_interval = group_interval or self.GROUP_INTERVAL
+        self.repeat_interval = repeat_interval or self.REPEAT_INTERVAL
+        self._flush = self.redis_client.register_script(self.FLUSH_SCRIPT)
+
+    def group_key(self, rule: AlertRuleSchema) -> str:
+        """Return the group of a rule: its values of the rule's `group_by` labels, or of the default ones."""
+        labels = {"rule_id": rule.rule_id, "metric_name": rule.metric_name, "field_name": rule.field_name, **rule.tags}
+        group_by = rule.group_by if rule.group_by is not None else self.group_by
+        return ",".join(f"{label}={labels.get(label, '')}" for label in sorted(group_by))
+
+    def queue_alert(self, pipeline, rule: AlertRuleSchema, state_id: str, status: str, message: str, notify: bool, current_time: int):
+        """
+        Queue adding a state change to its group, on a pipeline shared with other commands.
+
+        Args:
+            pipeline: The Redis pipeline to queue the commands on.
+            rule (AlertRuleSchema): The rule whose state changed.
+            state_id (str): The ID the alert state of the rule (and series) is kept under.
+            status (str): "triggered" or "recovered".
+            message (str): The line describing the change in a digest.
+            notify (bool): False for a recovery the rule does not want to be notified of.
+            current_time (int): The evaluation time.
+        """
+        group_key = self.group_key(rule)
+        alert = {
+            "rule_id": rule.rule_id,
+            "status": status,
+            "message": message,
+            "notify": notify,
+            "channels": rule.notification_channels,
+            "recipients": rule.recipients,
+            "at": current_time,
+        }
+        group_hash_key = self.key_schema.build_alert_group_key(group_key)
+        pipeline.hset(group_hash_key, mapping={state_id: json.dumps(alert), "__changed__": 1})
+        pipeline.zadd(self.key_schema.build_alert_groups_due_key(), {group_key: current_time + self.group_wait}, nx=True)
+
+    def flush_due(self, notification_queue: RedisNotificationQueue, current_time: int) -> int:
+        """
+        Send one digest per due group and recipient.
+
+        Args:
+            notification_queue (RedisNotificationQueue): The queue digests are sent through.
+            current_time (int): The current time.
+
+        Returns:
+            int: The number of digests queued.
+        """
+        due_key = self.key_schema.build_alert_groups_due_key()
+        group_keys = self.redis_client.zrangebyscore(due_key, "-inf", current_time)
+
+        notifications = []
+        for group_key in group_keys:
+            group_hash_key = self.key_schema.build_alert_group_key(group_key)
+            alerts = self._flush(keys=[group_hash_key, due_key], args=[group_key, current_time, self.group_interval, self.repeat_interval])
+            if alerts:
+                notifications.extend(self.build_digests(group_key, [json.loads(alert) for alert in alerts], current_time))
+
+        if notifications:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            notification_queue.queue_notifications(pipeline, notifications)
+            pipeline.execute()
+            logger.info(f"Queued {len(notifications)} digests for {len(group_keys)} due alert groups")
+        return len(notifications)
+
+    def build_digests(self, group_key: str, alerts: List[dict], current_time: int) -> List[dict]:
+        """Build one digest notification per channel and recipient of the alerts of a group."""
+        targets: Dict[tuple, List[dict]] = {}
+        for alert in alerts:
+            if not alert["notify"]:
+                continue
+            for channel in alert["channels"]:
+                for recipient in alert["recipients"].get(channel) or [None]:
+                    targets.setdefault((channel, recipient), []).append(alert)
+
+        digests = []
+        for (channel, recipient), target_alerts in targets.items():
+            message = self.format_digest(group_key, target_alerts)
+            if message is None:
+                continue
+            digests.extend(
+                RedisNotificationQueue.build_notifications(
+                    group_key, "digest", message, [channel], {channel: [recipient]} if recipient else {}, created_at=current_time
+                )
+            )
+        return digests
+
+    def format_digest(self, group_key: str, alerts: List[dict]) -> Optional[str]:
+        """Format the firing and resolved alerts of a group as one message, None if there are none."""
+        firing = sorted((alert for alert in alerts if alert["status"] == "triggered"), key=lambda alert: alert["at"])
+        resolved = sorted((alert for alert in alerts if alert["status"] == "recovered"), key=lambda alert: alert["at"])
+        if not firing and not resolved:
+            return None
+
+        sections = []
+        for title, section_alerts in ((f"🚨 FIRING: {len(firing)}", firing), (f"✅ RESOLVED: {len(resolved)}", resolved)):
+            if not section_alerts:
+                continue
+            lines = [f"- {alert['message'].replace(chr(10), ' | ')}" for alert in section_alerts[: self.MAX_DIGEST_ALERTS]]
+            if len(section_alerts) > self.MAX_DIGEST_ALERTS:
+                lines.append(f"... and {len(section_alerts) - self.MAX_DIGEST_ALERTS} more")
+            sections.append("\n".join([title, *lines]))
+
+        return f"[{group_key or 'all alerts'}]\n" + "\n\n".join(sections)
@@ -1,4 +1,7 @@
 import logging
+from typing import List, Tuple
+
+from redis.client import NEVER_DECODE
 
 from dao.redis.base import RedisDaoBase
 
@@ -7,57 +10,152 @@ logger = logging.getLogger(__name__)
 
 class RedisAlertState(RedisDaoBase):
     """
-    Handles storing and retrieving alert and recovery states from Redis.
+    Handles alert state transitions and window states in Redis.
+
+    Every rule (or matched series) has an alert state machine in a hash, absent while the rule is ok:
+
+        ok -> pending -> firing -> recovering -> ok
+
+    - `pending`: the condition is met by the newest samples, but not yet for the whole duration,
+    - `firing`: the condition held for the whole duration; entering it is the "triggered" transition,
+    - `recovering`: the condition stopped holding; after `recovery_time` seconds the rule is ok again, the
+      "recovered" transition. A rule firing again before that goes back to `firing` without a new trigger.
+
+    Transitions are taken by one Lua script for a whole batch of rules, so a batch costs one round trip and
+    two workers evaluating the same rule cannot both trigger it.
+    """
+
+    OK, PENDING, FIRING, RECOVERING = "ok", "pending", "firing", "recovering"
+
+    # KEYS: the state hashes. ARGV: the current time, then per key: breaching, triggered, recovery hold, TTL.
+    # Returns the transition taken per key, "" for none.
+    TRANSITION_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local transitions = {}
+    for i, key in ipairs(KEYS) do
+        local arg = 1 + (i - 1) * 4
+        local breaching = ARGV[arg + 1] == '1'
+        local triggered = ARGV[arg + 2] == '1'
+        local hold = tonumber(ARGV[arg + 3])
+        local ttl = tonumber(ARGV[arg + 4])
+
+        local state = redis.call('HGET', key, 'state') or 'ok'
+        local since = tonumber(redis.call('HGET', key, 'since') or now)
+        local next_state, transition = state, ''
+        if state == 'ok' or state == 'pending' then
+            if triggered then
+                next_state, transition = 'firing', 'triggered'
+            elseif breaching and state == 'ok' then
+                next_state, transition = 'pending', 'pending'
+            elseif not breaching and state == 'pending' then
+                next_state, transition = 'ok', 'cleared'
+            end
+        elseif state == 'firing' then
+            if not triggered then
+                if hold > 0 then
+                    next_state, transition = 'recovering', 'recovering'
+                else
+                    next_state, transition = 'ok', 'recovered'
+                end
+            end
+        elseif state == 'recovering' then
+            if triggered then
+                next_state, transition = 'firing', 'resumed'
+            elseif now - since >= hold then
+                next_state, transition = 'ok', 'recovered'
+            end
+        end
+
+        if next_state == 'ok' then
+            redis.call('DEL', key)
+        else
+            if next_state ~= state then
+                redis.call('HSET', key, 'state', next_state, 'since', now)
+            end
+            redis.call('EXPIRE', key, ttl)
+        end
+        transitions[i] = transition
+    end
+    return transitions
     """
 
-    def set_alert_state(self, rule_id: str, duration_value: int):
+    def __init__(self, redis_client, key_schema=None, **kwargs):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self._transition = self.redis_client.register_script(self.TRANSITION_SCRIPT)
+
+    def get_alert_state(self, state_id: str) -> str:
         """
-        Mark an alert as triggered in Redis with a per-rule expiry.
+        Get the state of a rule's alert.
 
         Args:
-            rule_id (str): The unique identifier for the alert rule.
-            duration_value (int): Expiry time in seconds based on rule duration.
+            state_id (str): The ID the alert state is kept under, usually the rule ID.
+
+        Returns:
+            str: "ok", "pending", "firing" or "recovering".
         """
-        expiry = max(duration_value * 60, 60)  # Ensure at least 60 seconds
-        key = self.key_schema.build_alert_state_key(rule_id)
-        self.redis_client.setex(key, expiry, "triggered")
-        logger.info(f"Set alert state: {key} (expires in {expiry}s)")
+        return self.redis_client.hget(self.key_schema.build_alert_fsm_key(state_id), "state") or self.OK
 
-    def set_recovery_state(self, rule_id: str, recovery_time_value: int):
+    def queue_get_alert_state(self, pipeline, state_id: str):
         """
-        Mark an alert as recovered in Redis with a per-rule expiry.
+        Queue an alert state read on a pipeline shared with other commands.
+        The queued `HGET` returns the state, or `None` while the rule is ok.
 
         Args:
-            rule_id (str): The unique identifier for the alert rule.
-            recovery_time_value (int): Expiry time in seconds based on recovery time.
+            pipeline: The Redis pipeline to queue the command on.
+            state_id (str): The ID the alert state is kept under, usually the rule ID.
+        """
+        pipeline.hget(self.key_schema.build_alert_fsm_key(state_id), "state")
+
+    def transition(self, state_id: str, breaching: bool, triggered: bool, current_time: int, recovery_hold: int = 0, ttl: int = 3600) -> str:
         """
-        expiry = max(recovery_time_value * 60, 60)  # Ensure at least 60 seconds
-        key = self.key_schema.build_recovery_state_key(rule_id)
-        self.redis_client.setex(key, expiry, "recovered")
-        logger.info(f"Set recovery state: {key} (expires in {expiry}s)")
+        Take the transition of one rule's alert, see `transition_many`.
 
-    def get_alert_state(self, rule_id: str) -> bool:
+        Returns:
+            str: The transition taken, "" for none.
         """
-        Check if an alert is already triggered.
+        return self.transition_many([(state_id, breaching, triggered, recovery_hold, ttl)], current_time)[0]
+
+    def transition_many(self, changes: List[Tuple[str, bool, bool, int, int]], current_time: int) -> List[str]:
+        """
+        Take the transitions of many rules' alerts atomically, in one round trip.
 
         Args:
-            rule_id (str): The unique identifier for the alert rule.
+            changes (List[Tuple[str, bool, bool, int, int]]): Per rule, the state ID, whether the newest samples
+                meet the condition, whether it held for the rule duration, the seconds it must stop holding
+                before recovering, and the seconds the state outlives its last evaluation.
+            current_time (int): The evaluation time.
 
         Returns:
-            bool: True if alert is active, False otherwise.
+            List[str]: Per rule, "pending", "triggered", "cleared" (pending -> ok), "recovering",
+            "resumed" (recovering -> firing), "recovered", or "" if the state did not change.
         """
-        key = self.key_schema.build_alert_state_key(rule_id)
-        return self.redis_client.exists(key) > 0
+        if not changes:
+            return []
+        keys, args = [], [current_time]
+        for state_id, breaching, triggered, recovery_hold, ttl in changes:
+            keys.append(self.key_schema.build_alert_fsm_key(state_id))
+            args.extend([int(breaching), int(triggered), recovery_hold or 0, max(int(ttl), 1)])
+        return self._transition(keys=keys, args=args)
 
-    def get_recovery_state(self, rule_id: str) -> bool:
+    def queue_get_window_state(self, pipeline, rule_id: str):
         """
-        Check if a recovery alert has already been sent.
+        Queue the read of a rule's packed window state (see `WindowState`) on a pipeline.
+        The queued `GET` returns raw bytes, or `None` if the rule has no state yet.
 
         Args:
+            pipeline: The Redis pipeline to queue the command on.
             rule_id (str): The unique identifier for the alert rule.
+        """
+        pipeline.execute_command("GET", self.key_schema.build_window_state_key(rule_id), **{NEVER_DECODE: []})
 
-        Returns:
-            bool: True if recovery is active, False otherwise.
+    def queue_set_window_state(self, pipeline, rule_id: str, data: bytes, expiry: int):
+        """
+        Queue storing a rule's packed window state on a pipeline.
+
+        Args:
+            pipeline: The Redis pipeline to queue the command on.
+            rule_id (str): The unique identifier for the alert rule.
+            data (bytes): The packed window state.
+            expiry (int): Expiry time in seconds; an expired state is rebuilt from the full window.
         """
-        key = self.key_schema.build_recovery_state_key(rule_id)
-        return self.redis_client.exists(key) > 0
+        pipeline.setex(self.key_schema.build_window_state_key(rule_id), expiry, data)
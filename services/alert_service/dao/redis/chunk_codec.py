@@ -0,0 +1,130 @@
+import struct
+import zlib
+from typing import Iterable, List, Tuple
+
+
+class ChunkCodec:
+    """
+    Binary encoding of metric samples stored in fixed-duration Redis chunks.
+
+    A chunk holds the samples of one series whose timestamps fall into
+    `[chunk_start, chunk_start + chunk_seconds)`. Samples are appended as raw records:
+
+        uint16 offset (seconds since chunk_start) | float64 value      -> 10 bytes
+
+    A sealed chunk may be compacted into a compressed block. Records appended after the
+    compaction (late samples) simply follow the block:
+
+        b"\\xff\\xff" | uint32 count | uint32 payload_len | payload | raw records...
+
+    The payload is the zlib-compressed concatenation of the delta-encoded offsets (uint16)
+    and the XOR-ed bit patterns of consecutive values (uint64), which turns steady series
+    into long runs of zero bytes.
+    """
+
+    RECORD = struct.Struct("<Hd")
+    HEADER = struct.Struct("<2sII")
+    MAGIC = b"\xff\xff"
+    MAX_CHUNK_SECONDS = 0xFFFF  # offsets must stay below the magic prefix
+
+    @staticmethod
+    def chunk_start(timestamp: int, chunk_seconds: int) -> int:
+        """Return the start of the chunk containing `timestamp`."""
+        return timestamp - timestamp % chunk_seconds
+
+    @staticmethod
+    def chunk_starts(min_time: int, max_time: int, chunk_seconds: int) -> List[int]:
+        """Return the starts of every chunk overlapping `[min_time, max_time]`."""
+        first = ChunkCodec.chunk_start(min_time, chunk_seconds)
+        return list(range(first, max_time + 1, chunk_seconds))
+
+    @staticmethod
+    def pack(chunk_start: int, samples: Iterable[Tuple[int, float]]) -> bytes:
+        """Pack `(timestamp, value)` samples of one chunk into raw records."""
+        pack = ChunkCodec.RECORD.pack
+        return b"".join(pack(timestamp - chunk_start, value) for timestamp, value in samples)
+
+    @staticmethod
+    def is_compressed(data: bytes) -> bool:
+        """Check whether a chunk starts with a compressed block."""
+        return data[:2] == ChunkCodec.MAGIC
+
+    @staticmethod
+    def sample_count(data: bytes, length: int = None) -> int:
+        """
+        Return the number of samples in a chunk without decoding it.
+
+        Only the first `HEADER.size` bytes are read: pass the start of a chunk (`GETRANGE`) with
+        its `length` (`STRLEN`) to count the samples without fetching the whole chunk.
+        """
+        length = len(data) if length is None else length
+        if not ChunkCodec.is_compressed(data):
+            return length // ChunkCodec.RECORD.size
+        _, count, payload_len = ChunkCodec.HEADER.unpack_from(data)
+        return count + (length - ChunkCodec.HEADER.size - payload_len) // ChunkCodec.RECORD.size
+
+    @staticmethod
+    def unpack(chunk_start: int, data: bytes) -> List[Tuple[int, float]]:
+        """
+        Decode a chunk into `(timestamp, value)` samples in storage order.
+
+        Args:
+            chunk_start (int): Start of the chunk, used to restore absolute timestamps.
+            data (bytes): The chunk as stored in Redis.
+
+        Returns:
+            List[Tuple[int, float]]: The decoded samples.
+        """
+        if not data:
+            return []
+
+        samples = []
+        raw = data
+        if ChunkCodec.is_compressed(data):
+            _, count, payload_len = ChunkCodec.HEADER.unpack_from(data)
+            payload = zlib.decompress(data[ChunkCodec.HEADER.size : ChunkCodec.HEADER.size + payload_len])
+            samples = ChunkCodec._decode_block(chunk_start, count, payload)
+            raw = data[ChunkCodec.HEADER.size + payload_len :]
+
+        # Ignore a truncated trailing record rather than failing the whole chunk
+        raw = raw[: len(raw) - len(raw) % ChunkCodec.RECORD.size]
+        samples.extend((chunk_start + offset, value) for offset, value in ChunkCodec.RECORD.iter_unpack(raw))
+        return samples
+
+    @staticmethod
+    def compress(chunk_start: int, data: bytes) -> bytes:
+        """
+        Compact a chunk into a single compressed block.
+
+        Args:
+            chunk_start (int): Start of the chunk.
+            data (bytes): The chunk as stored in Redis, raw or already partially compressed.
+
+        Returns:
+            bytes: The compressed chunk.
+        """
+        samples = sorted(ChunkCodec.unpack(chunk_start, data))
+        offsets = [timestamp - chunk_start for timestamp, _ in samples]
+        bits = [struct.unpack("<Q", struct.pack("<d", value))[0] for _, value in samples]
+
+        offset_deltas = [offset - previous for offset, previous in zip(offsets, [0] + offsets[:-1])]
+        value_xors = [value ^ previous for value, previous in zip(bits, [0] + bits[:-1])]
+
+        count = len(samples)
+        payload = zlib.compress(struct.pack(f"<{count}H{count}Q", *offset_deltas, *value_xors))
+        return ChunkCodec.HEADER.pack(ChunkCodec.MAGIC, count, len(payload)) + payload
+
+    @staticmethod
+    def _decode_block(chunk_start: int, count: int, payload: bytes) -> List[Tuple[int, float]]:
+        """Decode the payload of a compressed block."""
+        unpacked = struct.unpack(f"<{count}H{count}Q", payload)
+        offset_deltas, value_xors = unpacked[:count], unpacked[count:]
+
+        samples = []
+        offset = 0
+        bits = 0
+        for delta, xor in zip(offset_deltas, value_xors):
+            offset += delta
+            bits ^= xor
+            samples.append((chunk_start + offset, struct.unpack("<d", struct.pack("<Q", bits))[0]))
+        return samples
@@ -0,0 +1,162 @@
+import json
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class ChunkSummary:
+    """
+    Mergeable summary of the samples of one chunk (or of any set of chunks).
+
+    Holds the count, sum, minimum and maximum, the first and last samples by timestamp, and a
+    logarithmic quantile sketch: every value is counted in the bucket `ceil(log_gamma(|v|))`, so
+    any quantile is estimated within `RELATIVE_ACCURACY` of the true value. Merging two summaries
+    adds the counts of their buckets, so windowed aggregations never need the raw samples of
+    the chunks they cover.
+
+    Stored in Redis as JSON next to the chunk, merged atomically by `MERGE_SCRIPT`.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+
+    MERGE_SCRIPT = """
+    local add = cjson.decode(ARGV[1])
+    local current = redis.call('GET', KEYS[1])
+    if current then
+        local summary = cjson.decode(current)
+        summary.count = summary.count + add.count
+        summary.sum = summary.sum + add.sum
+        if add.min < summary.min then summary.min = add.min end
+        if add.max > summary.max then summary.max = add.max end
+        if add.first_ts < summary.first_ts then
+            summary.first_ts = add.first_ts
+            summary.first = add.first
+        end
+        if add.last_ts >= summary.last_ts then
+            summary.last_ts = add.last_ts
+            summary.last = add.last
+        end
+        for bucket, count in pairs(add.buckets) do
+            summary.buckets[bucket] = (summary.buckets[bucket] or 0) + count
+        end
+        add = summary
+    end
+    redis.call('SET', KEYS[1], cjson.encode(add))
+    redis.call('EXPIREAT', KEYS[1], ARGV[2])
+    return add.count
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.first_ts = math.inf
+        self.first: Optional[float] = None
+        self.last_ts = -math.inf
+        self.last: Optional[float] = None
+        self.buckets: Dict[str, int] = {}
+
+    @classmethod
+    def from_samples(cls, samples: Iterable[Tuple[int, float]]) -> "ChunkSummary":
+        """Summarize `(timestamp, value)` samples, skipping NaN and infinite values."""
+        summary = cls()
+        for timestamp, value in samples:
+            summary.add(timestamp, value)
+        return summary
+
+    @classmethod
+    def from_json(cls, data) -> "ChunkSummary":
+        """Restore a summary stored by `MERGE_SCRIPT`."""
+        stored = json.loads(data)
+        summary = cls()
+        summary.count, summary.sum = stored["count"], stored["sum"]
+        summary.min, summary.max = stored["min"], stored["max"]
+        summary.first_ts, summary.first = stored["first_ts"], stored["first"]
+        summary.last_ts, summary.last = stored["last_ts"], stored["last"]
+        summary.buckets = {bucket: int(count) for bucket, count in stored["buckets"].items()}
+        return summary
+
+    def to_json(self) -> str:
+        """Serialize a non-empty summary for `MERGE_SCRIPT`."""
+        return json.dumps(
+            {
+                "count": self.count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                "first_ts": self.first_ts,
+                "first": self.first,
+                "last_ts": self.last_ts,
+                "last": self.last,
+                "buckets": self.buckets,
+            }
+        )
+
+    def add(self, timestamp: int, value: float):
+        """Add one sample."""
+        if not math.isfinite(value):
+            return
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if timestamp < self.first_ts:
+            self.first_ts, self.first = timestamp, value
+        if timestamp >= self.last_ts:
+            self.last_ts, self.last = timestamp, value
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other: "ChunkSummary") -> "ChunkSummary":
+        """Merge another summary into this one and return it."""
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.first_ts < self.first_ts:
+            self.first_ts, self.first = other.first_ts, other.first
+        if other.last_ts >= self.last_ts:
+            self.last_ts, self.last = other.last_ts, other.last
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile from the sketch.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, clamped to the exact minimum and maximum; None if the summary is empty.
+        """
+        if not self.count:
+            return None
+
+        rank = round(q * (self.count - 1))  # Nearest rank
+        seen = 0
+        for bucket_value, count in sorted((self._bucket_value(bucket), count) for bucket, count in self.buckets.items()):
+            seen += count
+            if seen > rank:
+                return min(max(bucket_value, self.min), self.max)
+        return self.max
+
+    @staticmethod
+    def _bucket(value: float) -> str:
+        """Return the sketch bucket of a value: `z` for zero, `n{i}` for negative and `{i}` for positive values."""
+        if value == 0:
+            return "z"
+        index = math.ceil(math.log(abs(value)) / ChunkSummary.LOG_GAMMA)
+        return f"n{index}" if value < 0 else str(index)
+
+    @staticmethod
+    def _bucket_value(bucket: str) -> float:
+        """Return the representative value of a sketch bucket, within the relative accuracy of its values."""
+        if bucket == "z":
+            return 0.0
+        index = int(bucket.lstrip("n"))
+        value = 2 * ChunkSummary.GAMMA**index / (ChunkSummary.GAMMA + 1)
+        return -value if bucket.startswith("n") else value
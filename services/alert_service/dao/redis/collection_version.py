@@ -0,0 +1,41 @@
+import time
+import hashlib
+import logging
+
+from dao.redis.base import RedisDaoBase
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCollectionVersion(RedisDaoBase):
+    """
+    Version counters of MongoDB collections, bumped by every write to a collection, so readers can tell
+    a listing is unchanged (and answer `304 Not Modified`) without querying MongoDB.
+
+    A missing counter starts at the current time in milliseconds rather than at 0, so versions handed out
+    before Redis lost the counter are not handed out again for different contents.
+    """
+
+    def get(self, collection: str) -> int:
+        """Return the current version of a collection."""
+        key = self.key_schema.build_collection_version_key(collection)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.set(key, int(time.time() * 1000), nx=True)
+        pipeline.get(key)
+        _, version = pipeline.execute()
+        return int(version)
+
+    def bump(self, collection: str) -> int:
+        """Mark a collection as changed. Returns its new version."""
+        key = self.key_schema.build_collection_version_key(collection)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.set(key, int(time.time() * 1000), nx=True)
+        pipeline.incr(key)
+        _, version = pipeline.execute()
+        return version
+
+    @staticmethod
+    def etag(version: int, *params) -> str:
+        """Build the ETag of a response derived from a collection version and the request parameters."""
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+        return f'W/"{version}-{digest}"'
@@ -0,0 +1,140 @@
+import math
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from dao.redis.base import RedisDaoBase
+
+logger = logging.getLogger(__name__)
+
+
+class RedisEvaluationStats(RedisDaoBase):
+    """
+    Collects evaluation timings and data age in memory and adds them to Redis hashes and sorted sets in one
+    pipeline per flush, so every worker process contributes to the same statistics at little cost.
+
+    - Histograms (cumulative buckets, sum and count per label) of tick durations by task, phase durations
+      (`load`, `fetch`, `evaluate`, `write`), and the age of the newest sample of every evaluated series.
+    - The slowest rules and the stalest series of the current `TOP_WINDOW`, `TOP_N` of each, keeping the
+      highest value per rule or series seen within the window.
+    """
+
+    DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # seconds
+    AGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)  # seconds
+    HISTOGRAMS = {
+        "tick_duration": DURATION_BUCKETS,
+        "phase_duration": DURATION_BUCKETS,
+        "sample_age": AGE_BUCKETS,
+    }
+    TOP_N = 10
+    TOP_WINDOW = 60  # seconds a top-N list covers before the next one starts
+
+    def __init__(self, redis_client, key_schema=None, **kwargs):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self._counts: Dict[str, float] = {}
+        self._top: Dict[str, Dict[str, float]] = {"slow_rules": {}, "stale_series": {}}
+
+    def observe(self, histogram: str, label: str, value: float):
+        """
+        Add a value to a histogram, e.g. `observe("phase_duration", "fetch", 0.012)`.
+
+        Args:
+            histogram (str): One of `HISTOGRAMS`.
+            label (str): The series of the histogram, e.g. the phase name.
+            value (float): The observed value; `math.inf` counts in the `+Inf` bucket only, and not in the sum.
+        """
+        for bound in self.HISTOGRAMS[histogram]:
+            if value <= bound:
+                self._count(f"{histogram}:{label}:{bound}")
+        self._count(f"{histogram}:{label}:+Inf")
+        self._count(f"{histogram}:{label}:count")
+        if value != math.inf:
+            self._count(f"{histogram}:{label}:sum", value)
+
+    def record_rule(self, state_id: str, seconds: float):
+        """Record the evaluation time of one rule, for the slowest rules."""
+        self._keep_max("slow_rules", state_id, seconds)
+
+    def record_sample_age(self, series: str, age: Optional[float]):
+        """Record the age of the newest sample of an evaluated series, None if it has no samples."""
+        age = math.inf if age is None else max(age, 0)
+        self.observe("sample_age", "all", age)
+        self._keep_max("stale_series", series, age)
+
+    def _count(self, field: str, amount: float = 1):
+        self._counts[field] = self._counts.get(field, 0) + amount
+
+    def _keep_max(self, top: str, member: str, value: float):
+        values = self._top[top]
+        if value > values.get(member, -1):
+            values[member] = value
+
+    def flush(self, now: float = None):
+        """Add the values collected since the last flush to Redis; failures are logged and the values dropped."""
+        if not self._counts and not any(self._top.values()):
+            return
+        counts, self._counts = self._counts, {}
+        tops, self._top = self._top, {"slow_rules": {}, "stale_series": {}}
+        window = int((now or time.time()) // self.TOP_WINDOW)
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        stats_key = self.key_schema.build_evaluation_stats_key()
+        for field, amount in counts.items():
+            if field.endswith(":sum"):
+                pipeline.hincrbyfloat(stats_key, field, amount)
+            else:
+                pipeline.hincrby(stats_key, field, int(amount))
+        for top, values in tops.items():
+            if not values:
+                continue
+            # Only this process's top N can make the global top N; infinite ages are kept as a large finite score
+            largest = dict(sorted(values.items(), key=lambda item: item[1], reverse=True)[: self.TOP_N])
+            top_key = self.key_schema.build_evaluation_top_key(top, window)
+            pipeline.zadd(top_key, {member: min(value, 1e12) for member, value in largest.items()}, gt=True)
+            pipeline.zremrangebyrank(top_key, 0, -(self.TOP_N + 1))
+            pipeline.expire(top_key, self.TOP_WINDOW * 2)
+        try:
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Failed to flush evaluation stats: {e}")
+
+    def get_stats(self, now: float = None) -> dict:
+        """
+        Read the histograms, and the slowest rules and stalest series of the latest complete window.
+
+        Returns:
+            dict: `histograms` as {histogram: {label: {"buckets": {le: count}, "sum": float, "count": int}}},
+            `slow_rules` and `stale_series` as lists of (member, value), largest first.
+        """
+        window = int((now or time.time()) // self.TOP_WINDOW)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.hgetall(self.key_schema.build_evaluation_stats_key())
+        for top in ("slow_rules", "stale_series"):
+            for top_window in (window, window - 1):
+                pipeline.zrevrange(self.key_schema.build_evaluation_top_key(top, top_window), 0, self.TOP_N - 1, withscores=True)
+        counts, slow_now, slow_before, stale_now, stale_before = pipeline.execute()
+
+        histograms = {}
+        for field, value in counts.items():
+            histogram, label, bucket = field.rsplit(":", 2)
+            series = histograms.setdefault(histogram, {}).setdefault(label, {"buckets": {}, "sum": 0.0, "count": 0})
+            if bucket == "sum":
+                series["sum"] = float(value)
+            elif bucket == "count":
+                series["count"] = int(value)
+            else:
+                series["buckets"][bucket] = int(value)
+
+        return {
+            "histograms": histograms,
+            "slow_rules": self._merge_windows(slow_before, slow_now),
+            "stale_series": self._merge_windows(stale_before, stale_now),
+        }
+
+    def _merge_windows(self, before: List[Tuple[str, float]], now: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        # The current window may only have seen a few flushes, so the previous one is merged in
+        merged = dict(before)
+        merged.update(now)
+        return sorted(merged.items(), key=lambda item: item[1], reverse=True)[: self.TOP_N]
@@ -23,33 +23,371 @@ class KeySchema:
         return f"moniflow:metrics:{metric_name}:{sorted_tags_str}:{field_name}"
 
     @staticmethod
-    def build_alert_state_key(rule_id: str) -> str:
+    def build_alert_fsm_key(state_id: str) -> str:
         """
-        Construct a Redis key for tracking active alert state.
+        Construct a Redis key for the alert state machine of a rule.
 
         Redis Key Format:
-            moniflow:alert_state:{rule_id}
+            moniflow:alert_fsm:{state_id}
 
         Args:
-            rule_id (str): Unique identifier for the alert rule.
+            state_id (str): The rule ID, qualified by the series tags for rules with tag matchers.
+
+        Returns:
+            str: The Redis key of the hash holding the alert state and when it was entered.
+        """
+        return f"moniflow:alert_fsm:{state_id}"
+
+    @staticmethod
+    def build_series_index_key() -> str:
+        """
+        Construct a Redis key for the set of all cached metric series.
+
+        Redis Key Format:
+            moniflow:series
+
+        Returns:
+            str: The Redis key of the series index set.
+        """
+        return "moniflow:series"
+
+    @staticmethod
+    def build_series_retention_key() -> str:
+        """
+        Construct a Redis key for the hash mapping metric series to their retention in seconds.
+
+        Redis Key Format:
+            moniflow:series_retention
+
+        Returns:
+            str: The Redis key of the series retention hash.
+        """
+        return "moniflow:series_retention"
+
+    @staticmethod
+    def build_metric_chunk_key(series_key: str, chunk_start: int) -> str:
+        """
+        Construct a Redis key for one fixed-duration chunk of a metric series.
+
+        Redis Key Format:
+            {series_key}:chunk:{chunk_start}
+
+        Args:
+            series_key (str): The series key built by `build_redis_metric_key`.
+            chunk_start (int): Unix timestamp at which the chunk starts.
+
+        Returns:
+            str: The Redis key of the chunk.
+        """
+        return f"{series_key}:chunk:{chunk_start}"
+
+    @staticmethod
+    def build_metric_summary_key(series_key: str, chunk_start: int) -> str:
+        """
+        Construct a Redis key for the summary (count, sum, extremes, quantile sketch) of one chunk.
+
+        Redis Key Format:
+            {series_key}:summary:{chunk_start}
+
+        Args:
+            series_key (str): The series key built by `build_redis_metric_key`.
+            chunk_start (int): Unix timestamp at which the chunk starts.
+
+        Returns:
+            str: The Redis key of the chunk summary.
+        """
+        return f"{series_key}:summary:{chunk_start}"
+
+    @staticmethod
+    def build_dirty_series_key() -> str:
+        """
+        Construct a Redis key for the set of series that received samples since the last evaluation.
+
+        Redis Key Format:
+            moniflow:dirty_series
 
         Returns:
-            str: The Redis key for storing alert state.
+            str: The Redis key of the dirty series set.
         """
-        return f"moniflow:alert_state:{rule_id}"
+        return "moniflow:dirty_series"
+
 
     @staticmethod
-    def build_recovery_state_key(rule_id: str) -> str:
+    def build_window_state_key(rule_id: str) -> str:
         """
-        Construct a Redis key for tracking recovery alert state.
+        Construct a Redis key for the incremental evaluation state of an alert rule.
 
         Redis Key Format:
-            moniflow:recovery_state:{rule_id}
+            moniflow:window_state:{rule_id}
 
         Args:
             rule_id (str): Unique identifier for the alert rule.
 
         Returns:
-            str: The Redis key for storing recovery state.
+            str: The Redis key of the packed window state.
+        """
+        return f"moniflow:window_state:{rule_id}"
+
+    @staticmethod
+    def build_shard_owner_key(shard: int) -> str:
+        """
+        Construct a Redis key for the lease of an alert rule evaluation shard.
+
+        Redis Key Format:
+            moniflow:shard_owner:{shard}
+
+        Args:
+            shard (int): The shard number.
+
+        Returns:
+            str: The Redis key holding the ID of the worker owning the shard.
+        """
+        return f"moniflow:shard_owner:{shard}"
+
+    @staticmethod
+    def build_shard_stats_key() -> str:
+        """
+        Construct a Redis key for the hash of the latest evaluation statistics of every shard.
+
+        Redis Key Format:
+            moniflow:shard_stats
+
+        Returns:
+            str: The Redis key of the shard statistics hash.
+        """
+        return "moniflow:shard_stats"
+
+    @staticmethod
+    def build_tag_index_key(measurement: str, tag: str, value: str) -> str:
+        """
+        Construct a Redis key for the set of series of a measurement having a tag value.
+
+        The pseudo-tag `__field__` indexes series by field name.
+
+        Redis Key Format:
+            moniflow:index:{measurement}:{tag}={value}
+
+        Args:
+            measurement (str): The measurement name.
+            tag (str): The tag name.
+            value (str): The tag value.
+
+        Returns:
+            str: The Redis key of the series set.
+        """
+        return f"moniflow:index:{measurement}:{tag}={value}"
+
+    @staticmethod
+    def build_tag_values_key(measurement: str, tag: str) -> str:
+        """
+        Construct a Redis key for the set of values a tag takes in a measurement.
+
+        Redis Key Format:
+            moniflow:tag_values:{measurement}:{tag}
+
+        Args:
+            measurement (str): The measurement name.
+            tag (str): The tag name.
+
+        Returns:
+            str: The Redis key of the tag value set.
+        """
+        return f"moniflow:tag_values:{measurement}:{tag}"
+
+    @staticmethod
+    def build_series_labels_key() -> str:
+        """
+        Construct a Redis key for the hash mapping every indexed series to its measurement, tags and field.
+
+        Redis Key Format:
+            moniflow:series_labels
+
+        Returns:
+            str: The Redis key of the series labels hash.
+        """
+        return "moniflow:series_labels"
+
+    @staticmethod
+    def build_history_spill_key() -> str:
+        """
+        Construct a Redis key for the list of alert history events that could not be written to MongoDB.
+
+        Redis Key Format:
+            moniflow:history_spill
+
+        Returns:
+            str: The Redis key of the spill list.
+        """
+        return "moniflow:history_spill"
+
+    @staticmethod
+    def build_notification_stream_key() -> str:
+        """
+        Construct a Redis key for the stream of notifications waiting to be dispatched.
+
+        Redis Key Format:
+            moniflow:notifications
+
+        Returns:
+            str: The Redis key of the notification stream.
+        """
+        return "moniflow:notifications"
+
+    @staticmethod
+    def build_notification_retry_key() -> str:
+        """
+        Construct a Redis key for the sorted set of failed notifications, scored by their next attempt time.
+
+        Redis Key Format:
+            moniflow:notifications:retry
+
+        Returns:
+            str: The Redis key of the retry set.
+        """
+        return "moniflow:notifications:retry"
+
+    @staticmethod
+    def build_notification_dead_key() -> str:
+        """
+        Construct a Redis key for the stream of notifications that could not be delivered.
+
+        Redis Key Format:
+            moniflow:notifications:dead
+
+        Returns:
+            str: The Redis key of the dead letter stream.
+        """
+        return "moniflow:notifications:dead"
+
+    @staticmethod
+    def build_notification_stats_key() -> str:
+        """
+        Construct a Redis key for the hash of notification delivery counters and latency histograms.
+
+        Redis Key Format:
+            moniflow:notification_stats
+
+        Returns:
+            str: The Redis key of the notification stats hash.
+        """
+        return "moniflow:notification_stats"
+
+    @staticmethod
+    def build_alert_group_key(group_key: str) -> str:
+        """
+        Construct a Redis key for the hash of the alerts of a notification group.
+
+        Redis Key Format:
+            moniflow:alert_group:{group_key}
+
+        Args:
+            group_key (str): The group's values of its `group_by` labels, e.g. "host=web-1,metric_name=cpu_usage".
+
+        Returns:
+            str: The Redis key of the group hash.
+        """
+        return f"moniflow:alert_group:{group_key}"
+
+    @staticmethod
+    def build_alert_groups_due_key() -> str:
+        """
+        Construct a Redis key for the sorted set of notification groups, scored by their next notification time.
+
+        Redis Key Format:
+            moniflow:alert_groups:due
+
+        Returns:
+            str: The Redis key of the due set.
+        """
+        return "moniflow:alert_groups:due"
+
+    @staticmethod
+    def build_task_lock_key(name: str) -> str:
+        """
+        Construct a Redis key for the lease lock of a periodic task.
+
+        Redis Key Format:
+            moniflow:task_lock:{name}
+
+        Args:
+            name (str): The task name, e.g. "alert_service.fetch_alert_rules".
+
+        Returns:
+            str: The Redis key holding the fencing token of the running run.
+        """
+        return f"moniflow:task_lock:{name}"
+
+    @staticmethod
+    def build_task_fence_key(name: str) -> str:
+        """
+        Construct a Redis key for the fencing token counter of a periodic task.
+
+        Redis Key Format:
+            moniflow:task_fence:{name}
+
+        Args:
+            name (str): The task name.
+
+        Returns:
+            str: The Redis key of the counter, incremented by every run.
+        """
+        return f"moniflow:task_fence:{name}"
+
+    @staticmethod
+    def build_task_schedule_key() -> str:
+        """
+        Construct a Redis key for the hash of the latest run, schedule lag and run counts of every periodic task.
+
+        Redis Key Format:
+            moniflow:task_schedule
+
+        Returns:
+            str: The Redis key of the schedule hash, with `{name}:{stat}` fields.
+        """
+        return "moniflow:task_schedule"
+
+    @staticmethod
+    def build_evaluation_stats_key() -> str:
+        """
+        Construct a Redis key for the hash of the evaluation histograms.
+
+        Redis Key Format:
+            moniflow:evaluation_stats
+
+        Returns:
+            str: The Redis key of the hash, with `{histogram}:{label}:{bucket}` fields.
+        """
+        return "moniflow:evaluation_stats"
+
+    @staticmethod
+    def build_evaluation_top_key(top: str, window: int) -> str:
+        """
+        Construct a Redis key for a top-N sorted set of one time window, e.g. the slowest rules.
+
+        Redis Key Format:
+            moniflow:evaluation_top:{top}:{window}
+
+        Args:
+            top (str): "slow_rules" or "stale_series".
+            window (int): The number of the window, epoch seconds divided by its length.
+
+        Returns:
+            str: The Redis key of the sorted set.
+        """
+        return f"moniflow:evaluation_top:{top}:{window}"
+
+    @staticmethod
+    def build_collection_version_key(collection: str) -> str:
+        """
+        Construct a Redis key for the version counter of a MongoDB collection, bumped on every write.
+
+        Redis Key Format:
+            moniflow:collection_version:{collection}
+
+        Args:
+            collection (str): The collection name, e.g. "alert_rules".
+
+        Returns:
+            str: The Redis key of the counter.
         """
-        return f"moniflow:recovery_state:{rule_id}"
+        return f"moniflow:collection_version:{collection}"
@@ -1,11 +1,20 @@
+import re
 import time
 import redis
+import redis.asyncio
 import logging
 
+from typing import Callable, Dict, List, Tuple
+from functools import partial
 from datetime import datetime, timezone
 from dateutil import parser
+from redis.client import NEVER_DECODE
 
 from dao.redis.base import RedisDaoBase
+from dao.redis.chunk_codec import ChunkCodec
+from dao.redis.chunk_summary import ChunkSummary
+from dao.redis.series_index import RedisSeriesIndex
+from models import AlertRuleSchema
 from validators.metric_query_validator import MetricQueryValidator
 
 logger = logging.getLogger(__name__)
@@ -14,20 +23,81 @@ logger = logging.getLogger(__name__)
 class RedisMetrics(RedisDaoBase):
     """
     Handles querying stored metrics from Redis.
+
+    Samples of a series are stored in fixed-duration chunks: one Redis string per
+    `chunk_seconds` window, holding packed timestamp/float64 records (see `ChunkCodec`).
+    Writes append to the chunk a sample falls into, reads decode only the chunks overlapping
+    the requested window.
+
+    Every chunk expires once its newest possible sample is older than the series retention,
+    so old samples are trimmed without any extra work. The retention of a series is the
+    longest `duration` of the alert rules referencing it, see `sync_series_retention`.
     """
 
+    # Strict RFC 3339 shapes parsed by `datetime.fromisoformat`, other ISO 8601 timestamps fall back to dateutil
+    RFC3339_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}T(?:[01]\d|2[0-3]):\d{2}:\d{2}(?:\.\d{1,9})?(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)", re.ASCII)
+    EPOCH_PATTERN = re.compile(r"([0-9]{1,19})(s|ms|us|ns)")
+    EPOCH_UNITS = {"s": 1, "ms": 10**3, "us": 10**6, "ns": 10**9}  # epoch timestamp units, per second
+    MAX_EPOCH = 253402300799  # 9999-12-31T23:59:59Z, the latest ISO 8601 timestamp; later ones overflow Redis expiry times
+
+    DEFAULT_RETENTION = 600  # seconds kept for series no rule references
+    RETENTION_GRACE = 60  # extra seconds kept on top of the longest rule duration
+    RETENTION_REFRESH_INTERVAL = 30  # seconds between reloads of the retention hash
+    CHUNK_SECONDS = 600  # duration covered by one chunk
+
+    COMPACT_CHUNK_SCRIPT = """
+    if redis.call('STRLEN', KEYS[1]) ~= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'KEEPTTL')
+    return 1
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        key_schema=None,
+        default_retention: int = None,
+        retention_grace: int = None,
+        chunk_seconds: int = None,
+        async_redis_client: redis.asyncio.Redis = None,
+        **kwargs,
+    ):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self.default_retention = default_retention if default_retention is not None else self.DEFAULT_RETENTION
+        self.retention_grace = retention_grace if retention_grace is not None else self.RETENTION_GRACE
+        self.chunk_seconds = chunk_seconds if chunk_seconds is not None else self.CHUNK_SECONDS
+        if not 0 < self.chunk_seconds <= ChunkCodec.MAX_CHUNK_SECONDS:
+            raise ValueError(f"chunk_seconds must be between 1 and {ChunkCodec.MAX_CHUNK_SECONDS}")
+
+        self._retention: Dict[str, int] = {}
+        self._retention_loaded_at = 0.0
+        self._synced_retention: Dict[str, int] = None
+        self._compact_chunk = self.redis_client.register_script(self.COMPACT_CHUNK_SCRIPT)
+        self._merge_summary = self.redis_client.register_script(ChunkSummary.MERGE_SCRIPT)
+        self.series_index = RedisSeriesIndex(self.redis_client, self.key_schema)
+
+        # Optional asyncio client for callers on an event loop, see `store_metrics_in_cache_async`
+        self.async_redis_client = async_redis_client
+        if async_redis_client is not None:
+            self._merge_summary_async = async_redis_client.register_script(ChunkSummary.MERGE_SCRIPT)
+
     @staticmethod
     def parse_timestamp(timestamp):
         """
-        Convert a strict ISO 8601 timestamp into a UNIX timestamp (seconds).
+        Convert a strict ISO 8601 timestamp, or an epoch timestamp with an explicit unit, into a UNIX timestamp (seconds).
 
         Strict Validation:
         - Requires **explicit timezone information** (e.g., 'Z' or '+02:00').
         - **Rejects** timestamps without a timezone.
         - **Supports** standard ISO 8601 formats, including microseconds.
+        - **Supports** epoch timestamps suffixed with their unit: `s`, `ms`, `us` or `ns`.
+
+        The common RFC 3339 shapes are parsed by `datetime.fromisoformat`, several times faster than
+        `dateutil`, which only parses the other ISO 8601 forms.
 
         Args:
-            timestamp (str | int): The input timestamp (ISO 8601 string or Unix timestamp).
+            timestamp (str | int): The input timestamp (ISO 8601 string, or epoch string with a unit).
 
         Returns:
             int: The converted Unix timestamp.
@@ -42,11 +112,14 @@ class RedisMetrics(RedisDaoBase):
         - "2025-02-26T14:00:00+02:00"  → ✅ Allowed (UTC conversion)
         - "2025-02-26T10:00:00-02:00"  → ✅ Allowed (UTC conversion)
         - "2025-02-26T12:00:00.123456Z" → ✅ Allowed (Microseconds supported)
+        - "1740571200s", "1740571200123ms", "1740571200123456789ns" → ✅ Allowed (Epoch with unit)
 
         Invalid Inputs ❌:
         - "2025-02-26T12:00:00"   → ❌ REJECTED (Missing timezone)
         - "2025-02-26"            → ❌ REJECTED (Date only, no time)
         - "not-a-timestamp"       → ❌ REJECTED (Invalid format)
+        - "1740571200"            → ❌ REJECTED (Epoch without unit)
+        - "9999999999999999999s"  → ❌ REJECTED (Epoch after year 9999)
         - 1234567890              → ❌ REJECTED (Must be a string)
         """
         if isinstance(timestamp, bool):  # Prevent booleans (Python treats True/False as 1/0)
@@ -59,6 +132,16 @@ class RedisMetrics(RedisDaoBase):
             raise ValueError("Invalid timestamp format: must be a non-empty string.")
 
         try:
+            if RedisMetrics.RFC3339_PATTERN.fullmatch(timestamp):
+                return int(datetime.fromisoformat(timestamp).timestamp())
+
+            epoch = RedisMetrics.EPOCH_PATTERN.fullmatch(timestamp)
+            if epoch:
+                seconds = int(epoch.group(1)) // RedisMetrics.EPOCH_UNITS[epoch.group(2)]
+                if seconds > RedisMetrics.MAX_EPOCH:
+                    raise ValueError(f"Invalid timestamp format (out of range): {timestamp}")
+                return seconds
+
             dt = parser.isoparse(timestamp)
 
             # If no timezone info is provided, reject it
@@ -72,19 +155,95 @@ class RedisMetrics(RedisDaoBase):
 
     def store_metric_in_cache(self, metric_data: dict):
         """
-        Store incoming metric in Redis with separate keys per field.
+        Store a single incoming metric in Redis with separate keys per field.
+
+        Args:
+            metric_data (dict): The metric data to store.
+        """
+        self.store_metrics_in_cache([metric_data])
+
+    def store_metrics_in_cache(self, metrics: List[dict]):
+        """
+        Store a batch of incoming metrics in Redis with separate series per field.
 
-        Redis Sorted Set (ZADD) Format:
-            moniflow:metrics:{measurement}:{sorted_tags}:{field_name}
+        Samples are grouped by chunk and appended with one `APPEND` per chunk, and merged into the
+        chunk's summary (see `ChunkSummary`). All commands of the batch are sent in a single
+        non-transactional pipeline, so the whole request costs one Redis round trip. Samples
+        already older than the series retention are dropped. Written series are marked dirty so
+        the rules depending on them are evaluated promptly, and series new to this process are
+        added to the series index (see `RedisSeriesIndex`).
+
+        Redis Chunk Key Format:
+            moniflow:metrics:{measurement}:{sorted_tags}:{field_name}:chunk:{chunk_start}
 
         Example:
-            moniflow:metrics:cpu_usage:group=alpha:host=server-1:usage
-            moniflow:metrics:cpu_usage:group=alpha:host=server-1:temperature
+            moniflow:metrics:cpu_usage:group=alpha,host=server-1:usage:chunk:1740571200
+            moniflow:metrics:cpu_usage:group=alpha,host=server-1:temperature:chunk:1740571200
 
         Args:
-            metric_data (dict): The metric data to store.
+            metrics (List[dict]): The metric data to store.
+        """
+        samples, labels = self._group_samples(metrics)
+        if not samples:
+            return
+
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            merge_summary = partial(self._merge_summary, client=pipeline)
+            stored, indexed = self._queue_store(pipeline, samples, labels, self._get_retention(), merge_summary)
+            pipeline.execute()
+            self.series_index.mark_indexed(indexed)
+
+            logger.debug(f"Stored {stored} samples in {len(samples)} series from {len(metrics)} metrics")
+
+        except redis.RedisError as e:
+            logger.error(f"Redis Error: {e}")
+            raise
+
+    async def store_metrics_in_cache_async(self, metrics: List[dict]):
+        """
+        Store a batch of incoming metrics like `store_metrics_in_cache`, over `async_redis_client`.
+
+        The pipeline round trip (and the occasional retention reload) is awaited instead of blocking,
+        so an event loop keeps serving other requests while Redis answers.
+
+        Args:
+            metrics (List[dict]): The metric data to store.
         """
+        if self.async_redis_client is None:
+            raise RuntimeError("store_metrics_in_cache_async requires an async_redis_client")
+
+        samples, labels = self._group_samples(metrics)
+        if not samples:
+            return
+
         try:
+            retention = await self._get_retention_async()
+            pipeline = self.async_redis_client.pipeline(transaction=False)
+            merges = []
+
+            def merge_summary(keys, args):
+                merges.append(self._merge_summary_async(keys=keys, args=args, client=pipeline))
+
+            stored, indexed = self._queue_store(pipeline, samples, labels, retention, merge_summary)
+            # Awaiting a script call on a pipeline only queues it
+            for merge in merges:
+                await merge
+            await pipeline.execute()
+            self.series_index.mark_indexed(indexed)
+
+            logger.debug(f"Stored {stored} samples in {len(samples)} series from {len(metrics)} metrics")
+
+        except redis.RedisError as e:
+            logger.error(f"Redis Error: {e}")
+            raise
+
+    def _group_samples(self, metrics: List[dict]) -> Tuple[Dict[str, Dict[int, List[Tuple[int, float]]]], Dict[str, Tuple[str, dict, str]]]:
+        """Group the samples of a batch by series and chunk; also returns `(measurement, tags, field_name)` per series."""
+        samples: Dict[str, Dict[int, List[Tuple[int, float]]]] = {}
+        labels: Dict[str, Tuple[str, dict, str]] = {}
+
+        for metric_data in metrics:
             measurement = metric_data.get("measurement")
             tags = metric_data.get("tags", {})
             fields = metric_data.get("fields", {})
@@ -92,18 +251,48 @@ class RedisMetrics(RedisDaoBase):
 
             # Convert timestamp to Unix time
             timestamp = RedisMetrics.parse_timestamp(timestamp)
+            chunk_start = ChunkCodec.chunk_start(timestamp, self.chunk_seconds)
 
-            # Generate Redis key
-            sorted_tags = ":".join(f"{k}={v}" for k, v in sorted(tags.items()))
             for field_name, field_value in fields.items():
-                redis_key = f"moniflow:metrics:{measurement}:{sorted_tags}:{field_name}"
-                self.redis_client.zadd(redis_key, {field_value: timestamp})
-
-                logger.info(f"Stored in Redis: {redis_key} -> {field_value} at {timestamp}")
-
-        except redis.RedisError as e:
-            logger.error(f"Redis Error: {e}")
-            raise
+                series_key = self.key_schema.build_redis_metric_key(measurement, tags, field_name)
+                samples.setdefault(series_key, {}).setdefault(chunk_start, []).append((timestamp, float(field_value)))
+                labels[series_key] = (measurement, tags, field_name)
+
+        return samples, labels
+
+    def _queue_store(
+        self,
+        pipeline,
+        samples: Dict[str, Dict[int, List[Tuple[int, float]]]],
+        labels: Dict[str, Tuple[str, dict, str]],
+        retention: Dict[str, int],
+        merge_summary: Callable[..., None],
+    ) -> Tuple[int, List[str]]:
+        """
+        Queue the writes of grouped samples on a pipeline, sync or async, with `merge_summary(keys=, args=)`
+        queueing a summary merge. Returns the samples queued and the series queued for indexing.
+        """
+        current_time = int(time.time())
+        stored = 0
+        for series_key, chunks in samples.items():
+            series_retention = retention.get(series_key, self.default_retention)
+            for chunk_start, chunk_samples in chunks.items():
+                expire_at = chunk_start + self.chunk_seconds + series_retention
+                if expire_at <= current_time:
+                    continue
+
+                chunk_key = self.key_schema.build_metric_chunk_key(series_key, chunk_start)
+                pipeline.append(chunk_key, ChunkCodec.pack(chunk_start, chunk_samples))
+                pipeline.expireat(chunk_key, expire_at)
+                summary = ChunkSummary.from_samples(chunk_samples)
+                if summary.count:
+                    summary_key = self.key_schema.build_metric_summary_key(series_key, chunk_start)
+                    merge_summary(keys=[summary_key], args=[summary.to_json(), expire_at])
+                stored += len(chunk_samples)
+        pipeline.sadd(self.key_schema.build_series_index_key(), *samples.keys())
+        pipeline.sadd(self.key_schema.build_dirty_series_key(), *samples.keys())
+        indexed = self.series_index.queue_index_series(pipeline, labels)
+        return stored, indexed
 
     def get_metric_values(self, metric_name: str, tags: dict, field_name: str, duration: int):
         """
@@ -113,29 +302,347 @@ class RedisMetrics(RedisDaoBase):
             metric_name (str): Name of the metric.
             tags (dict): Tags associated with the metric.
             field_name (str): Specific field within the metric.
-            duration_value (int): Duration to look back.
-            duration_unit (str): Unit of duration (seconds, minutes, hours).
+            duration (int): Duration to look back in seconds.
 
         Returns:
-            List[float]: A list of metric values within the specified time range.
+            List[float]: A list of metric values within the specified time range, oldest first.
+        """
+        return [value for _, value in self.get_metric_samples(metric_name, tags, field_name, duration)]
+
+    def get_metric_samples(self, metric_name: str, tags: dict, field_name: str, duration: int) -> List[Tuple[int, float]]:
+        """
+        Fetch `(timestamp, value)` samples of a series from the last `duration` seconds.
+
+        Only the chunks overlapping the window are read and decoded.
+
+        Args:
+            metric_name (str): Name of the metric.
+            tags (dict): Tags associated with the metric.
+            field_name (str): Specific field within the metric.
+            duration (int): Duration to look back in seconds.
+
+        Returns:
+            List[Tuple[int, float]]: Samples within the time range, sorted by timestamp.
         """
         MetricQueryValidator.validate(metric_name, tags, field_name, duration)
 
-        redis_key = self.key_schema.build_redis_metric_key(metric_name, tags, field_name)
+        series_key = self.key_schema.build_redis_metric_key(metric_name, tags, field_name)
 
         # Calculate the time range
         current_time = int(time.time())
         min_time = current_time - duration
 
+        chunk_starts = ChunkCodec.chunk_starts(min_time, current_time, self.chunk_seconds)
+        chunk_keys = [self.key_schema.build_metric_chunk_key(series_key, chunk_start) for chunk_start in chunk_starts]
+
         try:
-            # Query Redis
-            values = self.redis_client.zrangebyscore(redis_key, min_time, current_time)
-            return [float(v) for v in values] if values else []
+            # Query Redis, keeping the binary chunks undecoded
+            chunks = self.redis_client.execute_command("MGET", *chunk_keys, **{NEVER_DECODE: []})
 
         except redis.RedisError as e:
-            logger.error(f"Redis error while fetching {redis_key}: {e}")
+            logger.error(f"Redis error while fetching {series_key}: {e}")
             return []
 
+        return self.decode_window(chunk_starts, chunks, min_time, current_time)
+
+    def queue_window_fetch(
+        self, pipeline, metric_name: str, tags: dict, field_name: str, duration: int, current_time: int, since: int = None
+    ) -> Tuple[List[int], int]:
+        """
+        Queue the fetch of a series window on a pipeline shared with other commands.
+
+        The result of the queued `MGET` is decoded with `decode_window(chunk_starts, result, min_time, current_time)`.
+        With `since`, only the chunks holding samples from `since` onwards are fetched.
+
+        Args:
+            pipeline: The Redis pipeline to queue the command on.
+            metric_name (str): Name of the metric.
+            tags (dict): Tags associated with the metric.
+            field_name (str): Specific field within the metric.
+            duration (int): Duration to look back in seconds.
+            current_time (int): End of the window.
+            since (int, optional): Oldest timestamp needed, when newer than the start of the window.
+
+        Returns:
+            Tuple[List[int], int]: The chunk starts fetched and the oldest timestamp to keep.
+        """
+        MetricQueryValidator.validate(metric_name, tags, field_name, duration)
+
+        series_key = self.key_schema.build_redis_metric_key(metric_name, tags, field_name)
+        min_time = current_time - duration if since is None else max(current_time - duration, since)
+        chunk_starts = ChunkCodec.chunk_starts(min_time, current_time, self.chunk_seconds)
+        chunk_keys = [self.key_schema.build_metric_chunk_key(series_key, chunk_start) for chunk_start in chunk_starts]
+
+        pipeline.execute_command("MGET", *chunk_keys, **{NEVER_DECODE: []})
+        return chunk_starts, min_time
+
+    def queue_summary_fetch(
+        self, pipeline, metric_name: str, tags: dict, field_name: str, duration: int, current_time: int
+    ) -> Tuple[List[int], List[int], int]:
+        """
+        Queue the fetch of everything needed to summarize a series window, on a pipeline shared with other commands.
+
+        Chunks lying entirely inside the window are read as summaries; only the chunks the window
+        boundaries cut through are read raw. A one hour window over 10 minute chunks reads at most
+        two raw chunks, however many samples it holds.
+
+        The result of the queued `MGET` is decoded with
+        `decode_summary(raw_starts, result, min_time, current_time)`.
+
+        Args:
+            pipeline: The Redis pipeline to queue the command on.
+            metric_name (str): Name of the metric.
+            tags (dict): Tags associated with the metric.
+            field_name (str): Specific field within the metric.
+            duration (int): Duration to look back in seconds.
+            current_time (int): End of the window.
+
+        Returns:
+            Tuple[List[int], List[int], int]: The chunks read raw, the chunks read as summaries and the start of the window.
+        """
+        MetricQueryValidator.validate(metric_name, tags, field_name, duration)
+
+        series_key = self.key_schema.build_redis_metric_key(metric_name, tags, field_name)
+        min_time = current_time - duration
+        raw_starts, summary_starts = [], []
+        for chunk_start in ChunkCodec.chunk_starts(min_time, current_time, self.chunk_seconds):
+            inside = chunk_start >= min_time and chunk_start + self.chunk_seconds - 1 <= current_time
+            (summary_starts if inside else raw_starts).append(chunk_start)
+
+        keys = [self.key_schema.build_metric_chunk_key(series_key, chunk_start) for chunk_start in raw_starts]
+        keys += [self.key_schema.build_metric_summary_key(series_key, chunk_start) for chunk_start in summary_starts]
+        pipeline.execute_command("MGET", *keys, **{NEVER_DECODE: []})
+        return raw_starts, summary_starts, min_time
+
+    @staticmethod
+    def decode_summary(raw_starts: List[int], values: List[bytes], min_time: int, max_time: int) -> ChunkSummary:
+        """
+        Merge the summaries and boundary samples fetched by `queue_summary_fetch` into one window summary.
+
+        Args:
+            raw_starts (List[int]): Start of every chunk read raw.
+            values (List[bytes]): The fetched raw chunks followed by the summaries, `None` for missing ones.
+            min_time (int): Oldest timestamp to keep.
+            max_time (int): Newest timestamp to keep.
+
+        Returns:
+            ChunkSummary: The summary of the window.
+        """
+        summary = ChunkSummary.from_samples(RedisMetrics.decode_window(raw_starts, values[: len(raw_starts)], min_time, max_time))
+        for data in values[len(raw_starts) :]:
+            if data:
+                summary.merge(ChunkSummary.from_json(data))
+        return summary
+
+    @staticmethod
+    def decode_window(chunk_starts: List[int], chunks: List[bytes], min_time: int, max_time: int) -> List[Tuple[int, float]]:
+        """
+        Decode the chunks of a series and keep the samples within `[min_time, max_time]`.
+
+        Args:
+            chunk_starts (List[int]): Start of every fetched chunk.
+            chunks (List[bytes]): The fetched chunks, `None` for missing ones.
+            min_time (int): Oldest timestamp to keep.
+            max_time (int): Newest timestamp to keep.
+
+        Returns:
+            List[Tuple[int, float]]: Samples within the time range, sorted by timestamp.
+        """
+        samples = []
+        for chunk_start, data in zip(chunk_starts, chunks):
+            if data:
+                samples.extend(sample for sample in ChunkCodec.unpack(chunk_start, data) if min_time <= sample[0] <= max_time)
+        samples.sort(key=lambda sample: sample[0])
+        return samples
+
+    def pop_dirty_series(self) -> List[str]:
+        """
+        Atomically read and clear the series that received samples since the last call.
+
+        Returns:
+            List[str]: The dirty series keys.
+        """
+        dirty_key = self.key_schema.build_dirty_series_key()
+        pipeline = self.redis_client.pipeline()
+        pipeline.smembers(dirty_key)
+        pipeline.delete(dirty_key)
+        dirty_series, _ = pipeline.execute()
+        return sorted(dirty_series)
+
+    def sync_series_retention(self, rules: List[AlertRuleSchema]) -> Dict[str, int]:
+        """
+        Derive the retention of every referenced series from the alert rules and store it in Redis.
+
+        The retention of a series is the longest `duration` of the rules referencing it plus a grace period.
+        The hash is only rewritten when the derived retention changed since the last sync.
+
+        Args:
+            rules (List[AlertRuleSchema]): All valid alert rules.
+
+        Returns:
+            Dict[str, int]: Retention in seconds per series key.
+        """
+        retention: Dict[str, int] = {}
+        for rule in rules:
+            redis_key = self.key_schema.build_redis_metric_key(rule.metric_name, rule.tags, rule.field_name)
+            retention[redis_key] = max(retention.get(redis_key, 0), rule.duration + self.retention_grace)
+
+        if retention == self._synced_retention:
+            return retention
+
+        retention_key = self.key_schema.build_series_retention_key()
+        pipeline = self.redis_client.pipeline()
+        pipeline.delete(retention_key)
+        if retention:
+            pipeline.hset(retention_key, mapping=retention)
+        pipeline.execute()
+
+        self._synced_retention = retention
+        logger.info(f"Synced retention for {len(retention)} series")
+        return retention
+
+    def _get_retention(self) -> Dict[str, int]:
+        """Return the series retention hash, reloading it from Redis at most every `RETENTION_REFRESH_INTERVAL` seconds."""
+        if time.monotonic() - self._retention_loaded_at >= self.RETENTION_REFRESH_INTERVAL:
+            self._set_retention(self.redis_client.hgetall(self.key_schema.build_series_retention_key()))
+        return self._retention
+
+    async def _get_retention_async(self) -> Dict[str, int]:
+        """`_get_retention` over `async_redis_client`."""
+        if time.monotonic() - self._retention_loaded_at >= self.RETENTION_REFRESH_INTERVAL:
+            self._set_retention(await self.async_redis_client.hgetall(self.key_schema.build_series_retention_key()))
+        return self._retention
+
+    def _set_retention(self, raw: Dict[str, str]):
+        self._retention = {key: int(value) for key, value in raw.items()}
+        self._retention_loaded_at = time.monotonic()
+
+    def _series_chunk_keys(self, series_key: str, retention: Dict[str, int], current_time: int) -> List[Tuple[int, str]]:
+        """Return `(chunk_start, chunk_key)` of every chunk of a series that may still exist."""
+        series_retention = retention.get(series_key, self.default_retention)
+        chunk_starts = ChunkCodec.chunk_starts(current_time - series_retention - self.chunk_seconds, current_time, self.chunk_seconds)
+        return [(chunk_start, self.key_schema.build_metric_chunk_key(series_key, chunk_start)) for chunk_start in chunk_starts]
+
+    def get_series_memory_usage(self, series_keys: List[str] = None) -> Dict[str, dict]:
+        """
+        Report sample count and memory usage per cached series.
+
+        Args:
+            series_keys (List[str], optional): Series to report. Defaults to every series in the series index.
+
+        Returns:
+            Dict[str, dict]: `{"chunks": int, "samples": int, "memory_bytes": int, "bytes_per_sample": float}`
+            per series that still holds chunks. Series without chunks are left to `prune_expired_series`.
+        """
+        if series_keys is None:
+            series_keys = sorted(self.redis_client.smembers(self.key_schema.build_series_index_key()))
+
+        retention = self._get_retention()
+        current_time = int(time.time())
+        series_chunks = {series_key: self._series_chunk_keys(series_key, retention, current_time) for series_key in series_keys}
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for chunks in series_chunks.values():
+            for _, chunk_key in chunks:
+                # The header and the length are enough to count the samples, the records stay in Redis
+                pipeline.memory_usage(chunk_key)
+                pipeline.strlen(chunk_key)
+                pipeline.execute_command("GETRANGE", chunk_key, 0, ChunkCodec.HEADER.size - 1, **{NEVER_DECODE: []})
+        results = iter(pipeline.execute())
+
+        report = {}
+        for series_key, chunks in series_chunks.items():
+            stats = {"chunks": 0, "samples": 0, "memory_bytes": 0}
+            for _ in chunks:
+                memory_bytes, length, header = next(results), next(results), next(results)
+                if memory_bytes is None:
+                    continue
+                stats["chunks"] += 1
+                stats["samples"] += ChunkCodec.sample_count(header, length)
+                stats["memory_bytes"] += memory_bytes
+
+            if not stats["chunks"]:
+                continue
+            stats["bytes_per_sample"] = round(stats["memory_bytes"] / stats["samples"], 2) if stats["samples"] else None
+            report[series_key] = stats
+
+        return report
+
+    def prune_expired_series(self, series_keys: List[str] = None) -> int:
+        """
+        Drop series whose chunks all expired from the series set and the tag index, so neither grows
+        with every series ever written and compaction and matchers stop visiting dead series.
+
+        Args:
+            series_keys (List[str], optional): Series to check. Defaults to every series in the series index.
+
+        Returns:
+            int: Number of series removed.
+        """
+        index_key = self.key_schema.build_series_index_key()
+        if series_keys is None:
+            series_keys = sorted(self.redis_client.smembers(index_key))
+        if not series_keys:
+            return 0
+
+        retention = self._get_retention()
+        current_time = int(time.time())
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for series_key in series_keys:
+            pipeline.exists(*[chunk_key for _, chunk_key in self._series_chunk_keys(series_key, retention, current_time)])
+        expired = [series_key for series_key, chunks in zip(series_keys, pipeline.execute()) if not chunks]
+
+        if expired:
+            self.redis_client.srem(index_key, *expired)
+            self.series_index.remove_series(expired)
+            logger.info(f"Removed {len(expired)} expired series from the series index")
+        return len(expired)
+
+    def compact_chunks(self, series_keys: List[str] = None, sealed_chunks: int = 2) -> int:
+        """
+        Compress the most recently sealed chunks of each series.
+
+        A chunk is sealed once the current time moved past its end. Only the last `sealed_chunks`
+        chunks are considered, so running this once per `chunk_seconds` covers every chunk.
+        The compressed chunk only replaces the original if no sample was appended in between.
+
+        Args:
+            series_keys (List[str], optional): Series to compact. Defaults to every series in the series index.
+            sealed_chunks (int): Number of sealed chunks to consider per series.
+
+        Returns:
+            int: Number of chunks compressed.
+        """
+        if series_keys is None:
+            series_keys = sorted(self.redis_client.smembers(self.key_schema.build_series_index_key()))
+
+        current_chunk = ChunkCodec.chunk_start(int(time.time()), self.chunk_seconds)
+        candidates = [
+            (current_chunk - i * self.chunk_seconds, self.key_schema.build_metric_chunk_key(series_key, current_chunk - i * self.chunk_seconds))
+            for series_key in series_keys
+            for i in range(1, sealed_chunks + 1)
+        ]
+        if not candidates:
+            return 0
+
+        chunks = self.redis_client.execute_command("MGET", *[chunk_key for _, chunk_key in candidates], **{NEVER_DECODE: []})
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        queued = 0
+        for (chunk_start, chunk_key), data in zip(candidates, chunks):
+            # Already compacted chunks without late samples are left alone
+            if not data or (ChunkCodec.is_compressed(data) and ChunkCodec.sample_count(data) == ChunkCodec.HEADER.unpack_from(data)[1]):
+                continue
+            self._compact_chunk(keys=[chunk_key], args=[ChunkCodec.compress(chunk_start, data), len(data)], client=pipeline)
+            queued += 1
+
+        if not queued:
+            return 0
+
+        compacted = sum(pipeline.execute())
+        logger.info(f"Compacted {compacted} of {queued} sealed metric chunks")
+        return compacted
+
     @staticmethod
     def _convert_duration_to_seconds(value: int, unit: str) -> int:
         """
@@ -0,0 +1,93 @@
+import json
+import time
+import uuid
+import logging
+from typing import Dict, List
+
+from dao.redis.base import RedisDaoBase
+
+logger = logging.getLogger(__name__)
+
+
+class RedisNotificationQueue(RedisDaoBase):
+    """
+    Producer side of the durable notification queue, a Redis stream read by `NotificationDispatcher`.
+
+    The evaluator queues notifications on its state write pipeline, so a tick never waits on a
+    notification channel. Every entry is one message for one recipient of one channel.
+    """
+
+    GROUP = "dispatchers"
+    MAX_LENGTH = 100_000  # approximate cap of the stream, so a dead dispatcher cannot exhaust Redis memory
+    LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 300)  # seconds, upper bounds of the delivery latency histogram
+
+    def queue_notifications(self, pipeline, notifications: List[dict]):
+        """
+        Queue notifications on a pipeline shared with other commands.
+
+        Args:
+            pipeline: The Redis pipeline to queue the commands on.
+            notifications (List[dict]): Notifications built by `build_notifications`.
+        """
+        stream_key = self.key_schema.build_notification_stream_key()
+        for notification in notifications:
+            pipeline.xadd(stream_key, {"data": json.dumps(notification)}, maxlen=self.MAX_LENGTH, approximate=True)
+
+    @staticmethod
+    def build_notifications(
+        rule_id: str, status: str, message: str, channels: List[str], recipients: Dict[str, List[str]], created_at: float = None
+    ) -> List[dict]:
+        """
+        Build one notification per channel and recipient; a channel without recipients uses its default one.
+
+        Args:
+            rule_id (str): The rule the notification is about.
+            status (str): "triggered" or "recovered".
+            message (str): The text to deliver.
+            channels (List[str]): The rule's notification channels.
+            recipients (Dict[str, List[str]]): The rule's recipients per channel.
+            created_at (float, optional): Epoch seconds of the evaluation, to measure delivery latency. Defaults to now.
+
+        Returns:
+            List[dict]: The notifications to queue.
+        """
+        created_at = created_at or time.time()
+        return [
+            {
+                "id": uuid.uuid4().hex,
+                "rule_id": rule_id,
+                "status": status,
+                "channel": channel,
+                "recipient": recipient,
+                "message": message,
+                "created_at": created_at,
+                "attempt": 0,
+            }
+            for channel in channels
+            for recipient in recipients.get(channel) or [None]
+        ]
+
+    def get_stats(self) -> dict:
+        """
+        Report the queue backlog and the delivery counters and latency histograms of every channel.
+
+        Returns:
+            dict: `queued`, `retrying` and `dead` counts, and per-channel delivery stats.
+        """
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.xlen(self.key_schema.build_notification_stream_key())
+        pipeline.zcard(self.key_schema.build_notification_retry_key())
+        pipeline.xlen(self.key_schema.build_notification_dead_key())
+        pipeline.hgetall(self.key_schema.build_notification_stats_key())
+        queued, retrying, dead, counters = pipeline.execute()
+
+        channels = {}
+        for field, value in counters.items():
+            name, channel, *bucket = field.split(":")
+            stats = channels.setdefault(channel, {"delivered": 0, "retried": 0, "dead": 0, "latency_sum": 0.0, "latency_buckets": {}})
+            if bucket:
+                stats["latency_buckets"][bucket[0]] = int(value)
+            else:
+                stats[name] = float(value) if name == "latency_sum" else int(value)
+
+        return {"queued": queued, "retrying": retrying, "dead": dead, "channels": channels}
@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import fnmatch
+import logging
+from typing import Dict, List, Set, Tuple
+
+from dao.redis.base import RedisDaoBase
+from models import TagMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSeriesIndex(RedisDaoBase):
+    """
+    Inverted index of the cached metric series, used to resolve tag matchers without `KEYS` or `SCAN`.
+
+    For every series the index keeps:
+        - `moniflow:index:{measurement}:{tag}={value}`: one set of series keys per tag value,
+        - `moniflow:index:{measurement}:__field__={field}`: one set of series keys per field,
+        - `moniflow:tag_values:{measurement}:{tag}`: the values every tag takes,
+        - `moniflow:series_labels`: a hash from series key to its measurement, tags and field.
+
+    Series are indexed on write, once per process, and removed once all their chunks expired.
+    """
+
+    FIELD_TAG = "__field__"
+    RESOLVE_TTL = 30  # seconds a resolved set of series is reused
+    INDEX_REFRESH_INTERVAL = 3600  # seconds after which series are indexed again, in case the index was lost
+
+    def __init__(self, redis_client, key_schema=None, resolve_ttl: int = None, **kwargs):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self.resolve_ttl = resolve_ttl if resolve_ttl is not None else self.RESOLVE_TTL
+        self._indexed: Set[str] = set()
+        self._indexed_at = time.monotonic()
+        self._resolved: Dict[tuple, Tuple[float, Dict[str, Dict[str, str]]]] = {}
+
+    def queue_index_series(self, pipeline, series: Dict[str, Tuple[str, dict, str]]) -> List[str]:
+        """
+        Queue indexing the series this process has not indexed yet, on a pipeline shared with other commands.
+
+        Args:
+            pipeline: The Redis pipeline to queue the commands on.
+            series (Dict[str, Tuple[str, dict, str]]): `(measurement, tags, field_name)` per series key.
+
+        Returns:
+            List[str]: The series queued; pass them to `mark_indexed` once the pipeline succeeded.
+        """
+        if time.monotonic() - self._indexed_at >= self.INDEX_REFRESH_INTERVAL:
+            self._indexed = set()
+            self._indexed_at = time.monotonic()
+
+        queued = [series_key for series_key in series if series_key not in self._indexed]
+        if not queued:
+            return []
+
+        labels = {}
+        for series_key in queued:
+            measurement, tags, field_name = series[series_key]
+            labels[series_key] = json.dumps({"measurement": measurement, "tags": tags, "field": field_name})
+            pipeline.sadd(self.key_schema.build_tag_index_key(measurement, self.FIELD_TAG, field_name), series_key)
+            for tag, value in tags.items():
+                pipeline.sadd(self.key_schema.build_tag_index_key(measurement, tag, value), series_key)
+                pipeline.sadd(self.key_schema.build_tag_values_key(measurement, tag), value)
+        pipeline.hset(self.key_schema.build_series_labels_key(), mapping=labels)
+        return queued
+
+    def mark_indexed(self, series_keys: List[str]):
+        """Remember series whose index entries were written, so later writes skip them."""
+        self._indexed.update(series_keys)
+
+    def resolve(self, metric_name: str, field_name: str, tags: Dict[str, str], matchers: List[TagMatcher]) -> Dict[str, Dict[str, str]]:
+        """
+        Find the series of a measurement field having the given tags and satisfying every matcher.
+
+        Results are cached for `resolve_ttl` seconds.
+
+        Args:
+            metric_name (str): The measurement name.
+            field_name (str): The field name.
+            tags (Dict[str, str]): Exact tags every series must have.
+            matchers (List[TagMatcher]): Tag matchers every series must satisfy.
+
+        Returns:
+            Dict[str, Dict[str, str]]: The tags of every matching series, by series key.
+        """
+        cache_key = (metric_name, field_name, tuple(sorted(tags.items())), tuple((m.tag, m.op, m.value) for m in matchers))
+        cached = self._resolved.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        # 1. Tag values, for the matchers that select values by pattern
+        pattern_tags = sorted({m.tag for m in matchers if m.op in ("regex", "not_regex", "wildcard")})
+        tag_values = {}
+        if pattern_tags:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for tag in pattern_tags:
+                pipeline.smembers(self.key_schema.build_tag_values_key(metric_name, tag))
+            tag_values = dict(zip(pattern_tags, pipeline.execute()))
+
+        # 2. Index sets: every group of `include` must hold a series, no `exclude` group may
+        include = [[(self.FIELD_TAG, field_name)]] + [[(tag, value)] for tag, value in sorted(tags.items())]
+        exclude = []
+        for matcher in matchers:
+            if matcher.op in ("equals", "not_equals"):
+                values = [matcher.value]
+            else:
+                values = sorted(value for value in tag_values[matcher.tag] if self._matches(matcher, value))
+            group = [(matcher.tag, value) for value in values]
+            (exclude if matcher.op.startswith("not_") else include).append(group)
+
+        pairs = sorted({pair for group in include + exclude for pair in group})
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for tag, value in pairs:
+            pipeline.smembers(self.key_schema.build_tag_index_key(metric_name, tag, value))
+        members = dict(zip(pairs, pipeline.execute()))
+
+        series_keys = set.intersection(*[set().union(*[members[pair] for pair in group]) for group in include])
+        for group in exclude:
+            series_keys -= set().union(*[members[pair] for pair in group])
+
+        # 3. Tags of the matching series
+        resolved = {}
+        if series_keys:
+            ordered = sorted(series_keys)
+            labels = self.redis_client.hmget(self.key_schema.build_series_labels_key(), ordered)
+            resolved = {series_key: json.loads(label)["tags"] for series_key, label in zip(ordered, labels) if label}
+
+        self._resolved[cache_key] = (time.monotonic() + self.resolve_ttl, resolved)
+        logger.debug(f"Resolved {len(resolved)} series of {metric_name}.{field_name} for {len(matchers)} tag matchers")
+        return resolved
+
+    def remove_series(self, series_keys: List[str]):
+        """
+        Remove series from the index, dropping tag values no series has anymore.
+
+        Args:
+            series_keys (List[str]): The series to remove.
+        """
+        labels_key = self.key_schema.build_series_labels_key()
+        labels = self.redis_client.hmget(labels_key, series_keys)
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        tag_values = set()
+        for series_key, label in zip(series_keys, labels):
+            if not label:
+                continue
+            label = json.loads(label)
+            measurement = label["measurement"]
+            pipeline.srem(self.key_schema.build_tag_index_key(measurement, self.FIELD_TAG, label["field"]), series_key)
+            for tag, value in label["tags"].items():
+                pipeline.srem(self.key_schema.build_tag_index_key(measurement, tag, value), series_key)
+                tag_values.add((measurement, tag, value))
+        pipeline.hdel(labels_key, *series_keys)
+        pipeline.execute()
+        self._indexed.difference_update(series_keys)
+
+        if not tag_values:
+            return
+
+        # Tag values whose series set is now empty are dropped from the value sets
+        tag_values = sorted(tag_values)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for measurement, tag, value in tag_values:
+            pipeline.scard(self.key_schema.build_tag_index_key(measurement, tag, value))
+        sizes = pipeline.execute()
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for (measurement, tag, value), size in zip(tag_values, sizes):
+            if not size:
+                pipeline.srem(self.key_schema.build_tag_values_key(measurement, tag), value)
+        pipeline.execute()
+
+    @staticmethod
+    def _matches(matcher: TagMatcher, value: str) -> bool:
+        if matcher.op == "wildcard":
+            return fnmatch.fnmatchcase(value, matcher.value)
+        return re.fullmatch(matcher.value, value) is not None
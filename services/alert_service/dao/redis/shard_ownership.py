@@ -0,0 +1,75 @@
+import json
+import logging
+from typing import Dict
+
+from dao.redis.base import RedisDaoBase
+
+logger = logging.getLogger(__name__)
+
+
+class RedisShardOwnership(RedisDaoBase):
+    """
+    Coordinates which worker evaluates each rule shard, and records how long every shard took.
+
+    A shard is owned through a lease: a key set with `NX` and an expiry, holding the owner's ID.
+    A shard still being evaluated when the next tick fans out is skipped instead of being
+    evaluated twice, and a lease left by a crashed worker expires on its own.
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis_client, key_schema=None, **kwargs):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self._release = self.redis_client.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, shard: int, owner: str, lease_seconds: int) -> bool:
+        """
+        Take ownership of a shard unless another worker holds it.
+
+        Args:
+            shard (int): The shard number.
+            owner (str): Unique identifier of the worker taking the shard.
+            lease_seconds (int): Expiry of the lease, so a crashed owner does not block the shard.
+
+        Returns:
+            bool: True if the shard is now owned by `owner`.
+        """
+        return bool(self.redis_client.set(self.key_schema.build_shard_owner_key(shard), owner, nx=True, ex=lease_seconds))
+
+    def release(self, shard: int, owner: str) -> bool:
+        """
+        Release a shard, only if `owner` still holds it.
+
+        Args:
+            shard (int): The shard number.
+            owner (str): Unique identifier of the worker releasing the shard.
+
+        Returns:
+            bool: True if the lease was released, False if it had expired or changed owner.
+        """
+        return bool(self._release(keys=[self.key_schema.build_shard_owner_key(shard)], args=[owner]))
+
+    def record_run(self, shard: int, stats: dict):
+        """
+        Store the statistics of the latest evaluation of a shard.
+
+        Args:
+            shard (int): The shard number.
+            stats (dict): JSON-serializable statistics, e.g. duration and rules evaluated.
+        """
+        self.redis_client.hset(self.key_schema.build_shard_stats_key(), str(shard), json.dumps(stats))
+
+    def get_runs(self) -> Dict[int, dict]:
+        """
+        Return the statistics of the latest evaluation of every shard.
+
+        Returns:
+            Dict[int, dict]: Statistics by shard number.
+        """
+        runs = self.redis_client.hgetall(self.key_schema.build_shard_stats_key())
+        return {int(shard): json.loads(stats) for shard, stats in runs.items()}
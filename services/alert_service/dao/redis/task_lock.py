@@ -0,0 +1,162 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+from dao.redis.base import RedisDaoBase
+
+logger = logging.getLogger(__name__)
+
+
+class RedisTaskLock(RedisDaoBase):
+    """
+    Lease locks with fencing tokens for periodic tasks, so a run never overlaps the previous one.
+
+    A run holds its task's lock through a lease, a key holding the run's fencing token, set with an expiry
+    so a crashed worker does not block the task. Tokens increase with every run: work carrying a token
+    can check it is still current (`is_current`), so a run that outlived its lease stops doing work
+    once a newer run started.
+
+    A run finding the lock held is skipped, or with `merge` requests one rerun from the holder, so bursts
+    of ticks collapse into one extra run. Every acquisition measures the schedule lag: how much later than
+    one interval after the previous run it started, which grows once runs take longer than their interval.
+    """
+
+    # KEYS: lock, fence counter, schedule hash. ARGV: task name, lease ms, merge, now, interval.
+    # Returns {token, lag} when acquired, {0, 0} when the lock is held.
+    ACQUIRE_SCRIPT = """
+    local name = ARGV[1]
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        if ARGV[3] == '1' then
+            redis.call('HSET', KEYS[3], name .. ':rerun', 1)
+            redis.call('HINCRBY', KEYS[3], name .. ':merged', 1)
+        else
+            redis.call('HINCRBY', KEYS[3], name .. ':skipped', 1)
+        end
+        return {0, '0'}
+    end
+
+    local token = redis.call('INCR', KEYS[2])
+    redis.call('SET', KEYS[1], token, 'PX', ARGV[2])
+
+    local now = tonumber(ARGV[4])
+    local previous = tonumber(redis.call('HGET', KEYS[3], name .. ':started') or '')
+    local lag = 0
+    if previous then
+        lag = math.max(0, now - previous - tonumber(ARGV[5]))
+    end
+    local max_lag = tonumber(redis.call('HGET', KEYS[3], name .. ':max_lag') or '0')
+    redis.call('HSET', KEYS[3], name .. ':started', ARGV[4], name .. ':lag', tostring(lag), name .. ':token', token,
+        name .. ':max_lag', tostring(math.max(lag, max_lag)))
+    redis.call('HINCRBY', KEYS[3], name .. ':runs', 1)
+    return {token, tostring(lag)}
+    """
+
+    # KEYS: lock, schedule hash. ARGV: token, task name, duration.
+    # Returns 0 if the lease was lost, 1 if released, 2 if released with a merged rerun requested.
+    RELEASE_SCRIPT = """
+    redis.call('HSET', KEYS[2], ARGV[2] .. ':duration', ARGV[3])
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    redis.call('DEL', KEYS[1])
+    if redis.call('HDEL', KEYS[2], ARGV[2] .. ':rerun') == 1 then
+        return 2
+    end
+    return 1
+    """
+
+    # KEYS: lock. ARGV: token, lease ms. Returns 1 if the lease was extended, 0 if it was lost.
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    """
+
+    def __init__(self, redis_client, key_schema=None, **kwargs):
+        super().__init__(redis_client, key_schema, **kwargs)
+        self._acquire = self.redis_client.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self.redis_client.register_script(self.RELEASE_SCRIPT)
+        self._renew = self.redis_client.register_script(self.RENEW_SCRIPT)
+
+    def acquire(self, name: str, lease_seconds: float, now: float, interval: float, merge: bool = False) -> Tuple[Optional[int], float]:
+        """
+        Start a run of a task unless the previous one still holds the lock.
+
+        Args:
+            name (str): The task name.
+            lease_seconds (float): Expiry of the lock, so a crashed run does not block the task.
+            now (float): Epoch seconds the run starts at.
+            interval (float): Seconds between scheduled runs, to measure the schedule lag.
+            merge (bool): If the lock is held, request one rerun once it is released instead of only skipping.
+
+        Returns:
+            Tuple[Optional[int], float]: The run's fencing token, None if the lock is held, and its schedule lag in seconds.
+        """
+        keys = [self.key_schema.build_task_lock_key(name), self.key_schema.build_task_fence_key(name), self.key_schema.build_task_schedule_key()]
+        token, lag = self._acquire(keys=keys, args=[name, max(int(lease_seconds * 1000), 1), int(merge), now, interval])
+        return (int(token) or None), float(lag)
+
+    def is_current(self, name: str, token: int) -> bool:
+        """
+        Check a fencing token belongs to the run holding the lock, i.e. no newer run started since.
+
+        Args:
+            name (str): The task name.
+            token (int): The fencing token of the run.
+
+        Returns:
+            bool: True if the run still holds the lock.
+        """
+        return self.redis_client.get(self.key_schema.build_task_lock_key(name)) == str(token)
+
+    def renew(self, name: str, token: int, lease_seconds: float) -> bool:
+        """
+        Extend the lease of a long-running holder, such as the rule scheduler, only if it still holds the lock.
+
+        Args:
+            name (str): The task name.
+            token (int): The fencing token of the holder.
+            lease_seconds (float): The new expiry of the lock.
+
+        Returns:
+            bool: True if the lease was extended, False if it had been lost.
+        """
+        keys = [self.key_schema.build_task_lock_key(name)]
+        return bool(self._renew(keys=keys, args=[token, max(int(lease_seconds * 1000), 1)]))
+
+    def release(self, name: str, token: int, duration: float) -> int:
+        """
+        End a run, releasing the lock only if it still holds it, and record its duration.
+
+        Args:
+            name (str): The task name.
+            token (int): The fencing token of the run.
+            duration (float): Seconds the run took.
+
+        Returns:
+            int: 0 if the run had lost its lease, 1 if released, 2 if released and a merged rerun was requested.
+        """
+        released = self._release(
+            keys=[self.key_schema.build_task_lock_key(name), self.key_schema.build_task_schedule_key()], args=[token, name, round(duration, 3)]
+        )
+        if not released:
+            logger.warning(f"Task {name} run {token} outlived its lease, a newer run may have overlapped it.")
+        return released
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        Report the latest run and the schedule lag of every periodic task.
+
+        Returns:
+            Dict[str, dict]: By task name: `started`, `lag`, `max_lag`, `duration`, `token`, and `runs`,
+            `skipped` and `merged` counts.
+        """
+        fields = self.redis_client.hgetall(self.key_schema.build_task_schedule_key())
+        stats = {}
+        for field, value in fields.items():
+            name, _, stat = field.rpartition(":")
+            if stat == "rerun":
+                continue
+            task = stats.setdefault(name, {"runs": 0, "skipped": 0, "merged": 0})
+            task[stat] = int(value) if stat in ("runs", "skipped", "merged", "token") else float(value)
+        return stats
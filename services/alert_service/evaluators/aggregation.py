@@ -0,0 +1,79 @@
+import logging
+from typing import Optional
+
+from dao.redis.chunk_summary import ChunkSummary
+from evaluators.alert_evaluator import AlertEvaluator
+from models import AlertRuleSchema
+
+logger = logging.getLogger(__name__)
+
+
+class Aggregation:
+    """
+    Computes windowed aggregations of alert rules from a window `ChunkSummary`.
+
+    Supported aggregations:
+        - avg, min, max, sum, count
+        - pNN: the NN-th percentile, e.g. p95 or p99.9, estimated from the quantile sketch
+        - increase: last value minus first value of the window, for counters
+        - rate: increase per second between the first and last samples of the window
+    """
+
+    @staticmethod
+    def compute(aggregation: str, summary: ChunkSummary) -> Optional[float]:
+        """
+        Aggregate a window summary.
+
+        Args:
+            aggregation (str): The aggregation name.
+            summary (ChunkSummary): The summary of the window.
+
+        Returns:
+            float: The aggregated value, or None if the window holds too few samples for it.
+        """
+        if aggregation == "count":
+            return float(summary.count)
+        if aggregation == "sum":
+            return summary.sum
+        if not summary.count:
+            return None
+
+        if aggregation == "avg":
+            return summary.sum / summary.count
+        if aggregation == "min":
+            return summary.min
+        if aggregation == "max":
+            return summary.max
+        if aggregation.startswith("p"):
+            return summary.quantile(float(aggregation[1:]) / 100)
+        if aggregation in ("increase", "rate"):
+            if summary.count < 2 or summary.last_ts <= summary.first_ts:
+                return None
+            increase = summary.last - summary.first
+            return increase if aggregation == "increase" else increase / (summary.last_ts - summary.first_ts)
+
+        logger.error(f"Unknown aggregation: {aggregation}.")
+        return None
+
+    @staticmethod
+    def from_alert_rule(alert_rule: AlertRuleSchema, summary: ChunkSummary) -> bool:
+        """
+        Determine whether the aggregated window of a rule compares true to its threshold.
+
+        Args:
+            alert_rule (AlertRuleSchema): A rule with an `aggregation`.
+            summary (ChunkSummary): The summary of the rule's window.
+
+        Returns:
+            bool: True if the alert condition is met, False if not or if the aggregate is undefined.
+        """
+        value = Aggregation.compute(alert_rule.aggregation, summary)
+        if value is None:
+            return False
+
+        result = AlertEvaluator.COMPARISON_OPERATORS[alert_rule.comparison](value, alert_rule.threshold)
+        logger.debug(
+            f"Evaluating {alert_rule.aggregation} = {value} `{alert_rule.comparison}` {alert_rule.threshold} over "
+            f"{summary.count} samples | Result: {'Triggered' if result else 'Not Triggered'}"
+        )
+        return result
@@ -25,7 +25,7 @@ class AlertEvaluator:
             return False
 
         if not metric_values:
-            logger.info("No metric values available. No alert triggered.")
+            logger.debug("No metric values available. No alert triggered.")
             return False
 
         metric_values = [float(v) for v in metric_values if isinstance(v, (int, float))]
@@ -36,9 +36,9 @@ class AlertEvaluator:
         comparator = AlertEvaluator.COMPARISON_OPERATORS[comparison]
         result = all(comparator(value, threshold) for value in metric_values)
 
-        logger.info(
+        logger.debug(
             f"Evaluating condition: `{comparison}` against threshold {threshold} | "
-            f"Values: {metric_values} | Result: {'Triggered' if result else 'Not Triggered'}"
+            f"{len(metric_values)} values in [{min(metric_values)}, {max(metric_values)}] | Result: {'Triggered' if result else 'Not Triggered'}"
         )
 
         return result
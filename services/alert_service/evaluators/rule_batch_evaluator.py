@@ -0,0 +1,304 @@
+import time
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import redis
+
+from models import AlertRuleSchema
+from dao.redis.metrics import RedisMetrics
+from dao.redis.alert_state import RedisAlertState
+from dao.redis.notification_queue import RedisNotificationQueue
+from dao.redis.alert_groups import RedisAlertGroups
+from dao.redis.evaluation_stats import RedisEvaluationStats
+from dao.mongo.mongo_alert_history import MongoAlertHistory
+from dao.mongo.alert_history_writer import AlertHistoryWriter
+from evaluators.aggregation import Aggregation
+from evaluators.alert_evaluator import AlertEvaluator
+from evaluators.window_state import WindowState
+
+logger = logging.getLogger(__name__)
+
+
+class RuleBatchEvaluator:
+    """
+    Evaluates alert rules in chunks with a fixed number of round trips per chunk.
+
+    Each rule keeps an incremental `WindowState` in Redis, so only the samples that arrived since
+    the previous tick are read and evaluated. For every chunk of rules:
+        1. all window states and alert states are read in one Redis pipeline,
+        2. the samples from the newest second of each state on are read in one Redis pipeline,
+        3. every state is advanced and evaluated in memory,
+        4. the alert state transitions of every rule that is not idle are taken in one script call
+           (see `RedisAlertState.transition_many`),
+        5. all state changes are written in one Redis pipeline,
+        6. all history events are handed to the history writer in one call.
+
+    Notifications are queued on the write pipeline (see `RedisNotificationQueue`), so a tick never
+    waits on a notification channel. With `alert_groups`, state changes are added to their group
+    instead, and notified as one digest per group (see `RedisAlertGroups`).
+
+    With `stats`, the duration of every phase (`fetch`, `evaluate`, `write`), the evaluation time of every
+    rule and the age of the newest sample of every series are recorded (see `RedisEvaluationStats`).
+
+    Rules with an `aggregation` are evaluated from chunk summaries instead (see `RedisMetrics.queue_summary_fetch`).
+    Rules with `tag_matchers` are expanded into one rule per matching series, each with its own alert state.
+    """
+
+    BATCH_SIZE = 500
+    STATE_TTL_GRACE = 600  # seconds a window state outlives its rule duration without updates
+
+    def __init__(
+        self,
+        redis_metrics: RedisMetrics,
+        redis_alert_state: RedisAlertState,
+        mongo_alert_history: Union[MongoAlertHistory, AlertHistoryWriter],
+        batch_size: int = None,
+        notification_queue: RedisNotificationQueue = None,
+        alert_groups: RedisAlertGroups = None,
+        stats: RedisEvaluationStats = None,
+    ):
+        self.redis_metrics = redis_metrics
+        self.redis_alert_state = redis_alert_state
+        self.mongo_alert_history = mongo_alert_history
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.notification_queue = notification_queue
+        self.alert_groups = alert_groups
+        self.stats = stats
+
+    def evaluate(self, rules: List[AlertRuleSchema], current_time: int = None) -> Dict[str, int]:
+        """
+        Evaluate every rule and persist the resulting state changes.
+
+        Args:
+            rules (List[AlertRuleSchema]): Validated alert rules.
+            current_time (int, optional): End of the evaluation windows. Defaults to now.
+
+        Returns:
+            Dict[str, int]: Number of rules evaluated, triggered and recovered.
+        """
+        if current_time is None:
+            current_time = int(time.time())
+
+        rules = self.expand(rules)
+        summary = {"evaluated": 0, "triggered": 0, "recovered": 0}
+        for start in range(0, len(rules), self.batch_size):
+            chunk_summary = self.evaluate_chunk(rules[start : start + self.batch_size], current_time)
+            for key, value in chunk_summary.items():
+                summary[key] += value
+
+        return summary
+
+    def expand(self, rules: List[AlertRuleSchema]) -> List[AlertRuleSchema]:
+        """
+        Replace every rule with `tag_matchers` by one copy per matching series, carrying the series tags.
+
+        Args:
+            rules (List[AlertRuleSchema]): Validated alert rules.
+
+        Returns:
+            List[AlertRuleSchema]: Rules that each target exactly one series.
+        """
+        expanded = []
+        for rule in rules:
+            if not rule.tag_matchers:
+                expanded.append(rule)
+                continue
+            series = self.redis_metrics.series_index.resolve(rule.metric_name, rule.field_name, rule.tags, rule.tag_matchers)
+            expanded.extend(rule.model_copy(update={"tags": tags}) for tags in series.values())
+        return expanded
+
+    @staticmethod
+    def state_id(rule: AlertRuleSchema) -> str:
+        """Return the ID alert states are kept under: the rule ID, qualified by the series tags for matcher rules."""
+        if not rule.tag_matchers:
+            return rule.rule_id
+        return f"{rule.rule_id}:" + ",".join(f"{key}={value}" for key, value in sorted(rule.tags.items()))
+
+    def evaluate_chunk(self, rules: List[AlertRuleSchema], current_time: int) -> Dict[str, int]:
+        """
+        Evaluate one chunk of rules with two read pipelines, one transition call, one write pipeline and one history write.
+
+        Args:
+            rules (List[AlertRuleSchema]): Validated alert rules.
+            current_time (int): End of the evaluation windows.
+
+        Returns:
+            Dict[str, int]: Number of rules evaluated, triggered and recovered.
+        """
+        summary = {"evaluated": 0, "triggered": 0, "recovered": 0}
+        redis_client = self.redis_metrics.redis_client
+        timer = time.perf_counter
+        phase_started = timer()
+
+        # 1. Read every window state and alert state; aggregated rules have no window state
+        state_pipeline = redis_client.pipeline(transaction=False)
+        for rule in rules:
+            if rule.aggregation is None:
+                self.redis_alert_state.queue_get_window_state(state_pipeline, self.state_id(rule))
+            self.redis_alert_state.queue_get_alert_state(state_pipeline, self.state_id(rule))
+
+        try:
+            results = iter(state_pipeline.execute())
+        except redis.RedisError as e:
+            logger.error(f"Redis error while fetching states for {len(rules)} rules: {e}")
+            return summary
+
+        stored_states, states, alert_states = [], [], []
+        for rule in rules:
+            stored = next(results) if rule.aggregation is None else None
+            stored_states.append(stored)
+            states.append(WindowState.for_rule(rule, stored) if rule.aggregation is None else None)
+            alert_states.append(next(results) or RedisAlertState.OK)
+
+        # 2. Read only the samples each state has not seen yet, or the summarized windows
+        read_pipeline = redis_client.pipeline(transaction=False)
+        windows = []
+        for rule, state in zip(rules, states):
+            if state is None:
+                windows.append(
+                    self.redis_metrics.queue_summary_fetch(read_pipeline, rule.metric_name, rule.tags, rule.field_name, rule.duration, current_time)
+                )
+                continue
+            since = state.fetch_from(current_time - rule.duration)
+            windows.append(
+                self.redis_metrics.queue_window_fetch(read_pipeline, rule.metric_name, rule.tags, rule.field_name, rule.duration, current_time, since)
+            )
+
+        try:
+            chunks = read_pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis error while fetching windows for {len(rules)} rules: {e}")
+            return summary
+
+        phase_started = self._observe_phase("fetch", phase_started)
+
+        # 3. Advance the states and collect changes
+        samples, rule_times = [], []
+        for state, window, rule_chunks in zip(states, windows, chunks):
+            rule_started = timer()
+            samples.append(RedisMetrics.decode_window(window[0], rule_chunks, window[1], current_time) if state is not None else [])
+            rule_times.append(timer() - rule_started)
+        breaches = self._compare(rules, samples)
+
+        write_pipeline = redis_client.pipeline(transaction=False)
+        pending_writes = 0
+        changes, changed_rules = [], []
+        for i, (rule, state) in enumerate(zip(rules, states)):
+            rule_started = timer()
+            min_time = current_time - rule.duration
+            summary["evaluated"] += 1
+
+            if state is None:
+                raw_starts, _, _ = windows[i]
+                window_summary = RedisMetrics.decode_summary(raw_starts, chunks[i], min_time, current_time)
+                triggered = breaching = Aggregation.from_alert_rule(rule, window_summary)
+                newest = window_summary.last_ts if window_summary.count else None
+            else:
+                state.apply(samples[i], breaches[i], min_time)
+                packed = state.pack()
+                if packed != stored_states[i]:
+                    self.redis_alert_state.queue_set_window_state(write_pipeline, self.state_id(rule), packed, rule.duration + self.STATE_TTL_GRACE)
+                    pending_writes += 1
+                triggered = state.is_triggered(min_time)
+                breaching = state.breach_count > 0
+                newest = state.newest or None
+
+            if self.stats is not None:
+                self.stats.record_rule(self.state_id(rule), rule_times[i] + timer() - rule_started)
+                self.stats.record_sample_age(self._series(rule), None if newest is None else current_time - newest)
+
+            # Idle rules cannot change state, only the others go through the state machine
+            if triggered or breaching or alert_states[i] != RedisAlertState.OK:
+                ttl = rule.duration + (rule.recovery_time or 0) + self.STATE_TTL_GRACE
+                changes.append((self.state_id(rule), breaching, triggered, rule.recovery_time or 0, ttl))
+                changed_rules.append((rule, state))
+
+        phase_started = self._observe_phase("evaluate", phase_started)
+
+        # 4. Take the alert state transitions atomically
+        try:
+            transitions = self.redis_alert_state.transition_many(changes, current_time)
+        except redis.RedisError as e:
+            logger.error(f"Redis error while updating alert states for {len(rules)} rules: {e}")
+            return summary
+
+        history = []
+        for (rule, state), transition in zip(changed_rules, transitions):
+            if transition == "triggered":
+                history.append(MongoAlertHistory.build_alert_entry(rule.rule_id, rule.metric_name, rule.tags, rule.field_name, "triggered"))
+                summary["triggered"] += 1
+                logger.warning(f"Alert triggered for {rule.metric_name} (rule {self.state_id(rule)}): {self._describe(rule, state)}")
+                pending_writes += self._notify(write_pipeline, rule, "triggered", self._describe(rule, state), current_time)
+            elif transition == "recovered":
+                history.append(MongoAlertHistory.build_alert_entry(rule.rule_id, rule.metric_name, rule.tags, rule.field_name, "recovered"))
+                summary["recovered"] += 1
+                logger.info(f"Recovery alert sent for {rule.metric_name} (rule {self.state_id(rule)}).")
+                pending_writes += self._notify(write_pipeline, rule, "recovered", None, current_time)
+            elif transition:
+                logger.debug(f"Alert {self.state_id(rule)} transition: {transition}")
+
+        # 5. Flush state writes and history in one batch each
+        if pending_writes:
+            try:
+                write_pipeline.execute()
+            except redis.RedisError as e:
+                # The transitions are already taken, so their history is still logged
+                logger.error(f"Redis error while writing window states and notifications for {len(rules)} rules: {e}")
+
+        if history:
+            self.mongo_alert_history.log_alerts(history)
+
+        self._observe_phase("write", phase_started)
+        return summary
+
+    def _observe_phase(self, phase: str, started: float) -> float:
+        """Record the duration of a phase that started at `started`, and return the time the next phase starts."""
+        now = time.perf_counter()
+        if self.stats is not None:
+            self.stats.observe("phase_duration", phase, now - started)
+        return now
+
+    @staticmethod
+    def _series(rule: AlertRuleSchema) -> str:
+        return f"{rule.metric_name}.{rule.field_name} {{{', '.join(f'{key}={value}' for key, value in sorted(rule.tags.items()))}}}"
+
+    def _notify(self, pipeline, rule: AlertRuleSchema, status: str, reason: Optional[str], current_time: int) -> int:
+        """Queue the notifications of a state change, or add it to its group, on the write pipeline. Returns the number of commands queued."""
+        notify = status == "triggered" or rule.use_recovery_alert
+        if self.alert_groups is None and (self.notification_queue is None or not notify):
+            return 0
+
+        series = self._series(rule)
+        if status == "triggered":
+            message = f"🚨 Alert triggered: {series} {rule.comparison} {rule.threshold} for {rule.duration}s\n{reason}"
+        else:
+            message = f"✅ Recovered: {series} no longer {rule.comparison} {rule.threshold}"
+
+        if self.alert_groups is not None:
+            # Recoveries are always recorded, so the group knows the alert stopped firing
+            self.alert_groups.queue_alert(pipeline, rule, self.state_id(rule), status, message, notify, current_time)
+            return 1
+
+        notifications = RedisNotificationQueue.build_notifications(
+            rule.rule_id, status, message, rule.notification_channels, rule.recipients, created_at=current_time
+        )
+        self.notification_queue.queue_notifications(pipeline, notifications)
+        return len(notifications)
+
+    def _compare(self, rules: List[AlertRuleSchema], samples: List[List[Tuple[int, float]]]) -> List[Sequence[bool]]:
+        """Check every new sample against its rule's condition."""
+        breaches = []
+        for rule, rule_samples in zip(rules, samples):
+            comparator = AlertEvaluator.COMPARISON_OPERATORS[rule.comparison]
+            breaches.append([comparator(value, rule.threshold) for _, value in rule_samples])
+        return breaches
+
+    @staticmethod
+    def _describe(rule: AlertRuleSchema, state: Optional[WindowState]) -> str:
+        """Summarize why a rule triggered, without listing its samples."""
+        if state is None:
+            return f"{rule.aggregation} over {rule.duration}s {rule.comparison} {rule.threshold}"
+        return (
+            f"{state.breach_count} samples {rule.comparison} {rule.threshold} since {state.breach_since}, "
+            f"window range [{state.window_min}, {state.window_max}]"
+        )
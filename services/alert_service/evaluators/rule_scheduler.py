@@ -0,0 +1,89 @@
+import math
+import zlib
+from typing import Dict, List, Tuple
+
+from models import AlertRuleSchema
+from evaluators.timer_wheel import TimerWheel
+
+
+class RuleScheduler:
+    """
+    Schedules every alert rule at its own evaluation interval on a `TimerWheel` with one-second ticks.
+
+    A rule is evaluated `EVALUATIONS_PER_DURATION` times per `duration`, bounded by `min_interval` and
+    `max_interval`: a 10s rule every few seconds, a one-hour rule every few minutes. Every rule gets a phase
+    within its interval from the hash of its ID, so rules sharing an interval are spread over it rather than
+    all due in the same second, and a rule keeps its phase across restarts and schedulers.
+
+    Call `sync` whenever the rules change and `pop_due` every tick; rules due while the scheduler was
+    behind are returned once, and rescheduled after the current tick.
+    """
+
+    MIN_INTERVAL = 5  # seconds
+    MAX_INTERVAL = 300  # seconds
+    EVALUATIONS_PER_DURATION = 4
+
+    def __init__(
+        self,
+        now: float,
+        min_interval: int = None,
+        max_interval: int = None,
+        evaluations_per_duration: float = None,
+        wheel: TimerWheel = None,
+    ):
+        self.min_interval = min_interval or self.MIN_INTERVAL
+        self.max_interval = max(max_interval or self.MAX_INTERVAL, self.min_interval)
+        self.evaluations_per_duration = evaluations_per_duration or self.EVALUATIONS_PER_DURATION
+        self.wheel = wheel or TimerWheel(int(now))
+        self._rules: Dict[str, Tuple[AlertRuleSchema, int]] = {}  # rule ID -> (rule, interval)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def interval_for(self, rule: AlertRuleSchema) -> int:
+        """Return the evaluation interval of a rule, in seconds."""
+        interval = math.ceil(rule.duration / self.evaluations_per_duration)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    @staticmethod
+    def phase_for(rule_id: str, interval: int) -> int:
+        """Return the second within every interval a rule is due at."""
+        return zlib.crc32(rule_id.encode()) % interval
+
+    def next_due(self, rule_id: str, interval: int, after: int) -> int:
+        """Return the first tick after `after` a rule is due at."""
+        phase = self.phase_for(rule_id, interval)
+        return after + 1 + (phase - after - 1) % interval
+
+    def sync(self, rules: List[AlertRuleSchema]):
+        """
+        Replace the scheduled rules: new rules are scheduled, removed ones cancelled, and rules whose
+        interval changed rescheduled. Other rules keep their next due tick.
+        """
+        current = {}
+        for rule in rules:
+            interval = self.interval_for(rule)
+            previous = self._rules.get(rule.rule_id)
+            if previous is None or previous[1] != interval:
+                self.wheel.schedule(rule.rule_id, self.next_due(rule.rule_id, interval, self.wheel.now))
+            current[rule.rule_id] = (rule, interval)
+
+        for rule_id in self._rules.keys() - current.keys():
+            self.wheel.cancel(rule_id)
+        self._rules = current
+
+    def pop_due(self, now: float) -> List[AlertRuleSchema]:
+        """
+        Advance to `now` and return the rules due since the previous call, rescheduling each at its next due tick.
+        """
+        due = []
+        for rule_id in self.wheel.advance(int(now)):
+            rule, interval = self._rules[rule_id]
+            self.wheel.schedule(rule_id, self.next_due(rule_id, interval, self.wheel.now))
+            due.append(rule)
+        return due
+
+    @staticmethod
+    def batches(rules: List[AlertRuleSchema], batch_size: int) -> List[List[AlertRuleSchema]]:
+        """Split due rules into batches of at most `batch_size`, one evaluation task each."""
+        return [rules[i : i + batch_size] for i in range(0, len(rules), batch_size)]
@@ -0,0 +1,60 @@
+import bisect
+import hashlib
+from typing import Dict, List
+
+from models import AlertRuleSchema
+
+
+class ShardRing:
+    """
+    Consistent hash ring assigning alert rules to evaluation shards by `rule_id`.
+
+    Every shard owns `virtual_nodes` points on the ring and a rule belongs to the shard owning
+    the first point at or after the hash of its ID. Rules spread evenly over the shards, and
+    changing the number of shards only moves the rules of the added or removed points.
+    """
+
+    VIRTUAL_NODES = 64
+
+    def __init__(self, shard_count: int, virtual_nodes: int = None):
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+
+        self.shard_count = shard_count
+        self.virtual_nodes = virtual_nodes or self.VIRTUAL_NODES
+
+        points = sorted((self._hash(f"shard-{shard}#{node}"), shard) for shard in range(shard_count) for node in range(self.virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def shard_for(self, rule_id: str) -> int:
+        """
+        Return the shard owning a rule.
+
+        Args:
+            rule_id (str): The unique identifier for the alert rule.
+
+        Returns:
+            int: The shard number, between 0 and `shard_count - 1`.
+        """
+        index = bisect.bisect_left(self._hashes, self._hash(str(rule_id)))
+        return self._shards[index % len(self._shards)]
+
+    def split(self, rules: List[AlertRuleSchema]) -> Dict[int, List[AlertRuleSchema]]:
+        """
+        Group rules by shard.
+
+        Args:
+            rules (List[AlertRuleSchema]): Validated alert rules.
+
+        Returns:
+            Dict[int, List[AlertRuleSchema]]: The rules of every shard, empty shards included.
+        """
+        shards = {shard: [] for shard in range(self.shard_count)}
+        for rule in rules:
+            shards[self.shard_for(rule.rule_id)].append(rule)
+        return shards
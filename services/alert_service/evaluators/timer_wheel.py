@@ -0,0 +1,95 @@
+from typing import Dict, Hashable, List, Tuple
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel: timers due at integer ticks, scheduled and cancelled in O(1).
+
+    Level 0 has one slot per tick, every higher level one slot per full turn of the level below, so
+    `levels` levels of `slots` slots cover `slots ** levels` ticks. A timer is put in the lowest level
+    whose range covers it; when the wheel reaches the start of a higher-level slot, the slot's timers
+    cascade down a level, until they sit in level 0 and fire at their tick. Advancing costs one step
+    per tick plus one move per timer per level, however many timers are pending.
+
+    Timers further away than the whole wheel wait in the top level and are put back until they are in range.
+    """
+
+    SLOTS = 64
+    LEVELS = 4
+
+    def __init__(self, now: int = 0, slots: int = None, levels: int = None):
+        self.slots = slots or self.SLOTS
+        self.levels = levels or self.LEVELS
+        self.now = now
+        self._spans = [self.slots**level for level in range(self.levels)]  # ticks covered by one slot of a level
+        self._wheels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(self.slots)] for _ in range(self.levels)]
+        self._timers: Dict[Hashable, Tuple[int, int]] = {}  # key -> (level, slot)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, due: int):
+        """
+        Schedule (or reschedule) the timer of `key` at tick `due`; a tick already reached fires on the next tick.
+        """
+        self.cancel(key)
+        self._place(key, max(due, self.now + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the timer of `key`. Returns False if it had none."""
+        position = self._timers.pop(key, None)
+        if position is None:
+            return False
+        level, slot = position
+        del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, to: int) -> List[Hashable]:
+        """
+        Move the wheel to tick `to`, firing every timer due on the way.
+
+        Returns:
+            List[Hashable]: The keys of the fired timers, by due tick.
+        """
+        fired = []
+        while self.now < to:
+            self.now += 1
+            # Higher levels cascade first, so their timers can cascade further down in the same tick
+            top = 0
+            while top < self.levels - 1 and self.now % self._spans[top + 1] == 0:
+                top += 1
+            for level in range(top, 0, -1):
+                self._cascade(level, (self.now // self._spans[level]) % self.slots)
+
+            bucket = self._wheels[0][self.now % self.slots]
+            if not bucket:
+                continue
+            self._wheels[0][self.now % self.slots] = {}
+            for key, due in bucket.items():
+                del self._timers[key]
+                if due <= self.now:
+                    fired.append(key)
+                else:
+                    self._place(key, due)
+        return fired
+
+    def _cascade(self, level: int, slot: int):
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return
+        self._wheels[level][slot] = {}
+        for key, due in bucket.items():
+            del self._timers[key]
+            self._place(key, max(due, self.now))
+
+    def _place(self, key: Hashable, due: int):
+        delta = due - self.now
+        level = 0
+        while level < self.levels - 1 and delta >= self._spans[level + 1]:
+            level += 1
+        slot = (due // self._spans[level]) % self.slots
+        self._wheels[level][slot][key] = due
+        self._timers[key] = (level, slot)
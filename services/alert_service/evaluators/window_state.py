@@ -0,0 +1,179 @@
+import struct
+import zlib
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+from models import AlertRuleSchema
+
+
+class WindowState:
+    """
+    Incremental evaluation state of one alert rule.
+
+    "Every sample of the last `duration` seconds satisfies the condition" holds exactly when the
+    newest sample is inside the window and the last sample *not* satisfying it is older than the
+    window. Tracking those two timestamps answers the rule in O(1) per tick, however many samples
+    the window holds, and only samples from `newest` on have to be read from Redis.
+
+    Alongside, the state keeps the current run of breaching samples (start and length) and
+    monotonic deques of the window's minimum and maximum, used for reporting instead of the
+    raw value list. Each sample enters and leaves a deque once, so updates are O(1) amortized.
+
+    Samples arriving out of order, older than `newest`, are ignored. Samples sharing the `newest`
+    second can still arrive, so reads start at `newest` again and `newest_count` tells how many of
+    its samples were already applied. A second satisfies the condition only if all its samples do,
+    so a non-breaching sample at `newest` always moves `last_ok`, whatever order the samples of
+    that second are read in.
+
+    Packed layout, all little-endian:
+
+        uint32 signature | int64 newest | uint32 newest_count | int64 last_ok | int64 breach_since | uint32 breach_count
+        | uint16 n_min | uint16 n_max | (int64 timestamp | float64 value) * (n_min + n_max)
+
+    A timestamp of 0 means "never".
+    """
+
+    HEADER = struct.Struct("<IqIqqIHH")
+    VERSION = 2  # part of the signature, so states packed in an older layout start afresh
+    ENTRY = struct.Struct("<qd")
+    MAX_DEQUE_LENGTH = 0xFFFF
+
+    def __init__(self, signature: int = 0):
+        self.signature = signature
+        self.newest = 0  # timestamp of the newest sample applied
+        self.newest_count = 0  # samples applied at `newest`
+        self.last_ok = 0  # timestamp of the newest sample not satisfying the condition
+        self.breach_since = 0  # timestamp of the first sample of the current breaching run
+        self.breach_count = 0  # samples in the current breaching run
+        self.minima: Deque[Tuple[int, float]] = deque()  # increasing values, window minimum first
+        self.maxima: Deque[Tuple[int, float]] = deque()  # decreasing values, window maximum first
+
+    @classmethod
+    def rule_signature(cls, rule: AlertRuleSchema) -> int:
+        """Return a checksum of everything the state depends on, so edited rules start afresh."""
+        tags = ",".join(f"{key}={value}" for key, value in sorted(rule.tags.items()))
+        return zlib.crc32(f"{cls.VERSION}|{rule.metric_name}|{tags}|{rule.field_name}|{rule.comparison}|{rule.threshold!r}".encode())
+
+    @classmethod
+    def for_rule(cls, rule: AlertRuleSchema, data: Optional[bytes]) -> "WindowState":
+        """
+        Restore the state of a rule, or start a fresh one.
+
+        Args:
+            rule (AlertRuleSchema): The rule the state belongs to.
+            data (bytes, optional): The packed state as stored in Redis.
+
+        Returns:
+            WindowState: The restored state, or an empty one if it is missing, corrupt or stale.
+        """
+        signature = cls.rule_signature(rule)
+        if data:
+            state = cls.unpack(data)
+            if state is not None and state.signature == signature:
+                return state
+        return cls(signature)
+
+    def fetch_from(self, min_time: int) -> int:
+        """Return the oldest timestamp that still has to be read for a window starting at `min_time`."""
+        return max(self.newest, min_time)
+
+    def update(self, comparator: Callable[[float, float], bool], threshold: float, samples: List[Tuple[int, float]], min_time: int):
+        """
+        Apply new samples and slide the window.
+
+        Args:
+            comparator (Callable[[float, float], bool]): The rule's comparison operator.
+            threshold (float): The rule's threshold.
+            samples (List[Tuple[int, float]]): `(timestamp, value)` samples sorted by timestamp.
+            min_time (int): Start of the window.
+        """
+        self.apply(samples, [comparator(value, threshold) for _, value in samples], min_time)
+
+    def apply(self, samples: List[Tuple[int, float]], breaches: Sequence[bool], min_time: int):
+        """
+        Apply new samples whose condition results are already known, and slide the window.
+
+        Args:
+            samples (List[Tuple[int, float]]): `(timestamp, value)` samples sorted by timestamp.
+            breaches (Sequence[bool]): Whether each sample satisfies the rule's condition.
+            min_time (int): Start of the window.
+        """
+        replayed = self.newest_count  # samples at `newest` read again, already applied
+        for (timestamp, value), breach in zip(samples, breaches):
+            if timestamp < self.newest:
+                continue
+            if timestamp > self.newest:
+                self.newest, self.newest_count, replayed = timestamp, 0, 0
+            replay = replayed > 0
+            if replay:
+                replayed -= 1
+            else:
+                self.newest_count += 1
+
+            # Compaction may reorder a second's samples, so a replayed non-breaching one is applied again;
+            # a breaching one only counts if it is new and its second has no non-breaching sample
+            if not breach:
+                self.last_ok = timestamp
+                self.breach_since = 0
+                self.breach_count = 0
+            elif not replay and self.last_ok != timestamp:
+                if not self.breach_count:
+                    self.breach_since = timestamp
+                self.breach_count += 1
+
+            while self.minima and self.minima[-1][1] >= value:
+                self.minima.pop()
+            self.minima.append((timestamp, value))
+            while self.maxima and self.maxima[-1][1] <= value:
+                self.maxima.pop()
+            self.maxima.append((timestamp, value))
+
+        # The extrema are for reporting only; capping them keeps the packed counts within uint16
+        for extrema in (self.minima, self.maxima):
+            while extrema and (extrema[0][0] < min_time or len(extrema) > self.MAX_DEQUE_LENGTH):
+                extrema.popleft()
+
+    def is_triggered(self, min_time: int) -> bool:
+        """Check whether the window starting at `min_time` holds samples and all of them satisfy the condition."""
+        return self.newest >= min_time and self.last_ok < min_time
+
+    @property
+    def window_min(self) -> Optional[float]:
+        return self.minima[0][1] if self.minima else None
+
+    @property
+    def window_max(self) -> Optional[float]:
+        return self.maxima[0][1] if self.maxima else None
+
+    def pack(self) -> bytes:
+        """Pack the state for storage in Redis."""
+        header = self.HEADER.pack(
+            self.signature,
+            self.newest,
+            self.newest_count,
+            self.last_ok,
+            self.breach_since,
+            self.breach_count,
+            len(self.minima),
+            len(self.maxima),
+        )
+        entries = [self.ENTRY.pack(timestamp, value) for timestamp, value in (*self.minima, *self.maxima)]
+        return header + b"".join(entries)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> Optional["WindowState"]:
+        """Unpack a stored state, returning `None` if it is corrupt."""
+        try:
+            signature, newest, newest_count, last_ok, breach_since, breach_count, n_min, n_max = cls.HEADER.unpack_from(data)
+            entries = list(cls.ENTRY.iter_unpack(data[cls.HEADER.size :]))
+        except struct.error:
+            return None
+        if len(entries) != n_min + n_max:
+            return None
+
+        state = cls(signature)
+        state.newest, state.newest_count, state.last_ok = newest, newest_count, last_ok
+        state.breach_since, state.breach_count = breach_since, breach_count
+        state.minima.extend(entries[:n_min])
+        state.maxima.extend(entries[n_min:])
+        return state
@@ -1,18 +1,53 @@
-from typing import List, Union
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional, Union
 import redis
+from pydantic import ValidationError
+from pymongo import errors as pymongo_errors
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from models import AlertRuleCreate, Metric
-from redis_config import redis_client
+from models import AlertRuleBulkSync, AlertRuleCreate, Metric
+from prometheus_exporter import CONTENT_TYPE, render_metrics
+from redis_config import redis_client, async_redis_client, REDIS_METRIC_DEFAULT_RETENTION, REDIS_METRIC_RETENTION_GRACE, REDIS_METRIC_CHUNK_SECONDS
 from mongo_config import mongo_client, MONGO_DB_NAME
 from dao.redis.metrics import RedisMetrics
+from dao.redis.shard_ownership import RedisShardOwnership
+from dao.redis.notification_queue import RedisNotificationQueue
+from dao.redis.task_lock import RedisTaskLock
+from dao.redis.evaluation_stats import RedisEvaluationStats
+from dao.redis.collection_version import RedisCollectionVersion
 from dao.mongo.mongo_alert_rules import MongoAlertRule
+from dao.mongo.mongo_alert_history import MongoAlertHistory
 from notifiers.telegram_notifier import TelegramNotifier
 
-app = FastAPI()
-redis_metrics = RedisMetrics(redis_client)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the async Redis connections on shutdown."""
+    yield
+    await async_redis_client.connection_pool.disconnect()
+
+
+app = FastAPI(lifespan=lifespan)
+redis_metrics = RedisMetrics(
+    redis_client,
+    default_retention=REDIS_METRIC_DEFAULT_RETENTION,
+    retention_grace=REDIS_METRIC_RETENTION_GRACE,
+    chunk_seconds=REDIS_METRIC_CHUNK_SECONDS,
+    async_redis_client=async_redis_client,
+)
+shard_ownership = RedisShardOwnership(redis_client)
+notification_queue = RedisNotificationQueue(redis_client)
+task_lock = RedisTaskLock(redis_client)
+evaluation_stats = RedisEvaluationStats(redis_client)
+collection_version = RedisCollectionVersion(redis_client)
 mongo_alert_rules_client = MongoAlertRule(mongo_client, MONGO_DB_NAME)
+mongo_alert_history_client = MongoAlertHistory(mongo_client, MONGO_DB_NAME)
 
 
 @app.get("/")
@@ -37,10 +72,123 @@ def create_alert(rule: AlertRuleCreate):
         rule_dict["recovery_time_value"] = None
         rule_dict["recovery_time_unit"] = None
 
-    rule_id = mongo_alert_rules_client.create_alert_rule(**rule_dict)
+    try:
+        rule_id = mongo_alert_rules_client.create_alert_rule(**rule_dict)
+    except pymongo_errors.DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"An alert rule with external_id {rule.external_id} already exists.")
+    bump_alert_rules_version()
     return {"message": "Alert rule created", "rule_id": str(rule_id)}
 
 
+@app.post("/alerts/bulk")
+def bulk_sync_alerts(request: AlertRuleBulkSync):
+    """
+    Create, update and (with `prune`) delete alert rules keyed by their `external_id`, in one MongoDB bulk write.
+    Args:
+        request (AlertRuleBulkSync): The rules, each an `AlertRuleCreate` object with an `external_id`.
+    Returns:
+        dict: Per item, its `index` (None for pruned rules), `external_id`, `status` and `rule_id`, or its
+        `errors`; and the count of every status. Pruning is skipped if any item is invalid.
+    """
+    results, rules, indexes = [], {}, {}
+    for index, item in enumerate(request.rules):
+        external_id = item.get("external_id")
+        try:
+            rule = AlertRuleCreate.model_validate(item)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+            results.append({"index": index, "external_id": external_id, "status": "invalid", "errors": errors})
+            continue
+        if rule.external_id is None or rule.external_id in rules:
+            error = "external_id is required" if rule.external_id is None else "duplicate external_id"
+            results.append({"index": index, "external_id": external_id, "status": "invalid", "errors": [error]})
+            continue
+        rules[rule.external_id] = MongoAlertRule.build_rule(**rule.model_dump())
+        indexes[rule.external_id] = index
+
+    # An invalid item may be a rule meant to be kept, so nothing is pruned then
+    prune = request.prune and not results
+    try:
+        synced = mongo_alert_rules_client.sync_alert_rules(rules, prune=prune) if rules or prune else {}
+    except pymongo_errors.PyMongoError:
+        raise HTTPException(status_code=503, detail="MongoDB is unavailable.")
+
+    results += [{"index": indexes.get(external_id), "external_id": external_id, **result} for external_id, result in synced.items()]
+    results.sort(key=lambda result: (result["index"] is None, result["index"]))
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    if any(status in summary for status in ("created", "updated", "deleted")):
+        bump_alert_rules_version()
+    return {"results": results, "summary": summary}
+
+
+@app.get("/alerts/export")
+def export_alerts():
+    """
+    Stream every alert rule as NDJSON, one `AlertRuleCreate` object per line, ready to be posted back to `/alerts/bulk`.
+    """
+    return StreamingResponse(mongo_alert_rules_client.export_alert_rules(), media_type="application/x-ndjson")
+
+
+def bump_alert_rules_version():
+    """Invalidate the ETags of alert rule listings after a write."""
+    try:
+        collection_version.bump("alert_rules")
+    except redis.RedisError as e:
+        logger.error(f"Failed to bump the alert rules version, listings may be served stale: {e}")
+
+
+@app.get("/alerts/history")
+def get_alert_history(
+    rule_id: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    status: Optional[Literal["triggered", "recovered"]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """
+    Page through alert events, newest first.
+    Args:
+        rule_id, metric_name, status, start, end: Optional filters.
+        limit (int): The page size.
+        cursor (str): The `next_cursor` returned with the previous page.
+    Returns:
+        dict: The `events` of the page and the `next_cursor`, None on the last page.
+    """
+    query = MongoAlertHistory.build_event_filter(rule_id, metric_name, status, start, end)
+    try:
+        return mongo_alert_history_client.get_events(query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except pymongo_errors.PyMongoError:
+        raise HTTPException(status_code=503, detail="MongoDB is unavailable.")
+
+
+@app.get("/alerts/history/report")
+def get_alert_history_report(
+    days: int = Query(30, ge=1, le=30),
+    rule_id: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    top: int = Query(10, ge=1, le=100),
+):
+    """
+    Report firing counts, mean time to recovery (MTTR) and the noisiest rules over the last `days` days.
+    The report is computed by MongoDB aggregations on the `alert_events` time-series collection.
+    """
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    query = MongoAlertHistory.build_event_filter(rule_id, metric_name, start=start, end=end)
+    try:
+        report = mongo_alert_history_client.get_report(query, top)
+    except pymongo_errors.PyMongoError:
+        raise HTTPException(status_code=503, detail="MongoDB is unavailable.")
+
+    return {"start": start, "end": end, **report}
+
+
 @app.get("/alerts/{rule_id}")
 def get_alert(rule_id: str):
     """
@@ -60,9 +208,53 @@ def get_alert(rule_id: str):
 
 
 @app.get("/alerts/")
-def get_alerts():
-    """Retrieve all alert rules from the database."""
-    return {"alert_rules": mongo_alert_rules_client.get_alert_rules()}
+def get_alerts(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `metric_name,threshold`."),
+    metric_name: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None, description="`key=value` tag filter, repeatable."),
+    status: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Page through alert rules, oldest first.
+    Args:
+        limit (int): The page size.
+        cursor (str): The `next_cursor` returned with the previous page.
+        fields (str): The fields to return, besides `_id`.
+        metric_name, tag, status: Optional filters.
+    Returns:
+        dict: The `alert_rules` of the page and the `next_cursor`, None on the last page.
+        The `ETag` changes with every rule write; a matching `If-None-Match` gets a 304 without querying MongoDB.
+    """
+    try:
+        tags = dict(item.split("=", 1) for item in tag or [])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Tag filters must be `key=value`.")
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+    etag = None
+    try:
+        version = collection_version.get("alert_rules")
+        etag = RedisCollectionVersion.etag(version, limit, cursor, field_list, metric_name, sorted(tags.items()), status)
+    except redis.RedisError as e:
+        logger.warning(f"Alert rules version unavailable, listing served without an ETag: {e}")
+    if etag is not None and if_none_match is not None:
+        if if_none_match.strip() == "*" or etag in (candidate.strip() for candidate in if_none_match.split(",")):
+            return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        page = mongo_alert_rules_client.list_alert_rules(limit, cursor, field_list, metric_name, tags, status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except pymongo_errors.PyMongoError:
+        raise HTTPException(status_code=503, detail="MongoDB is unavailable.")
+
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return page
 
 
 @app.delete("/alerts/{rule_id}")
@@ -80,6 +272,7 @@ def delete_alert(rule_id: str):
     result = mongo_alert_rules_client.delete_alert_rule(rule_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alert rule not found")
+    bump_alert_rules_version()
     return {"message": "Alert rule deleted"}
 
 
@@ -87,6 +280,7 @@ def delete_alert(rule_id: str):
 async def cache_metrics(metrics: Union[Metric, List[Metric]]):
     """
     Cache incoming metric values, supporting both single and multiple metrics.
+    Redis is awaited through the async connection pool, so concurrent requests do not wait on each other's round trips.
     """
 
     if isinstance(metrics, Metric):
@@ -95,14 +289,79 @@ async def cache_metrics(metrics: Union[Metric, List[Metric]]):
     metrics_list = [metric.model_dump() for metric in metrics]
 
     try:
-        for metric_dict in metrics_list:
-            redis_metrics.store_metric_in_cache(metric_dict)
+        await redis_metrics.store_metrics_in_cache_async(metrics_list)
     except redis.RedisError:
         raise HTTPException(status_code=503, detail="Redis is unavailable. Metrics not cached.")
 
     return {"message": "Metrics cached"}
 
 
+@app.get("/metrics/memory")
+def get_metrics_memory():
+    """
+    Report sample count, memory usage and expiry of every cached metric series.
+    """
+    try:
+        series = redis_metrics.get_series_memory_usage()
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis is unavailable.")
+
+    return {
+        "series": series,
+        "total_samples": sum(s["samples"] for s in series.values()),
+        "total_memory_bytes": sum(s["memory_bytes"] for s in series.values()),
+    }
+
+
+@app.get("/evaluation/shards")
+def get_evaluation_shards():
+    """
+    Report the latest evaluation of every rule shard: owner, duration and rules evaluated.
+    """
+    try:
+        shards = shard_ownership.get_runs()
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis is unavailable.")
+
+    return {"shards": [shards[shard] for shard in sorted(shards)]}
+
+
+@app.get("/evaluation/schedule")
+def get_evaluation_schedule():
+    """
+    Report every periodic task's latest run and schedule lag: a lag growing past the task's interval means
+    runs take longer than the interval and evaluation is running out of capacity.
+    """
+    try:
+        return {"tasks": task_lock.get_stats()}
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis is unavailable.")
+
+
+@app.get("/metrics")
+def get_prometheus_metrics():
+    """
+    Export evaluation timings, sample age, notification delays and task schedule lag in the Prometheus text format.
+    """
+    try:
+        body = render_metrics(evaluation_stats.get_stats(), notification_queue.get_stats(), task_lock.get_stats())
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis is unavailable.")
+
+    return Response(content=body, media_type=CONTENT_TYPE)
+
+
+@app.get("/notifications/stats")
+def get_notification_stats():
+    """
+    Report the notification backlog, retries, dead letters, and per-channel delivery counts and latency.
+    """
+    try:
+        return notification_queue.get_stats()
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis is unavailable.")
+
+
 # TEST DEBUG
 @app.get("/bot-test/")
 async def send_bot_message():
@@ -1,7 +1,34 @@
-from pydantic import BaseModel, Field
+import re
+from pydantic import AliasChoices, BaseModel, Field, model_validator
 from typing import Dict, List, Literal, Optional
 from datetime import datetime, timezone
 
+# Aggregation applied to the window before comparing it to the threshold, see `evaluators.aggregation`
+AGGREGATION_PATTERN = r"^(avg|min|max|sum|count|rate|increase|p\d{1,2}(\.\d+)?)$"
+
+
+class TagMatcher(BaseModel):
+    """
+    Matches the value of one tag, to apply a rule to every series it selects.
+
+    - `equals` / `not_equals`: exact value; `not_equals` also selects series without the tag.
+    - `regex` / `not_regex`: full match of a regular expression.
+    - `wildcard`: shell-style pattern, e.g. `web-*`.
+    """
+
+    tag: str = Field(..., min_length=1)
+    op: Literal["equals", "not_equals", "regex", "not_regex", "wildcard"] = "equals"
+    value: str
+
+    @model_validator(mode="after")
+    def check_regex(self):
+        if self.op in ("regex", "not_regex"):
+            try:
+                re.compile(self.value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex for tag '{self.tag}': {e}")
+        return self
+
 
 class AlertRuleSchema(BaseModel):
     """
@@ -9,9 +36,9 @@ class AlertRuleSchema(BaseModel):
     Used internally when fetching from MongoDB.
     """
 
-    rule_id: Optional[str] = None
+    rule_id: Optional[str] = Field(None, validation_alias=AliasChoices("rule_id", "_id"))
     metric_name: str = Field(..., min_length=1)
-    tags: Dict[str, str] = Field(..., min_length=1)
+    tags: Dict[str, str] = {}  # Exact tags; with `tag_matchers`, the tags every matched series must also have
     field_name: str = Field(..., min_length=1)
     threshold: float
     duration: int = Field(..., gt=0)
@@ -20,6 +47,15 @@ class AlertRuleSchema(BaseModel):
     recipients: Dict[str, List[str]]
     use_recovery_alert: bool
     recovery_time: int | None = Field(None, ge=0)
+    aggregation: str | None = Field(None, pattern=AGGREGATION_PATTERN)
+    tag_matchers: List[TagMatcher] | None = None  # Fan the rule out over every matching series
+    group_by: List[str] | None = None  # Labels grouping notifications into digests; None uses ALERT_GROUP_BY
+
+    @model_validator(mode="after")
+    def check_tags(self):
+        if not self.tags and not self.tag_matchers:
+            raise ValueError("A rule needs `tags` or `tag_matchers`.")
+        return self
 
 
 class AlertRuleCreate(BaseModel):
@@ -29,7 +65,7 @@ class AlertRuleCreate(BaseModel):
     """
 
     metric_name: str  # matches measurment
-    tags: Dict[str, str] = Field(..., min_length=1)
+    tags: Dict[str, str] = {}  # Required unless `tag_matchers` are given
     field_name: str  # Matches a field inside `fields`
     threshold: float
     duration_value: int = Field(..., gt=0)  # Must be positive
@@ -40,6 +76,26 @@ class AlertRuleCreate(BaseModel):
     use_recovery_alert: bool = False  # Default disabled
     recovery_time_value: int | None = Field(None, ge=0)  # Only used if recovery alerts are enabled
     recovery_time_unit: Literal["seconds", "minutes", "hours"] | None = None
+    aggregation: str | None = Field(None, pattern=AGGREGATION_PATTERN)  # None: every sample must match
+    tag_matchers: List[TagMatcher] | None = None  # Evaluate every series matching these, each with its own alert state
+    group_by: List[str] | None = None  # e.g. ["metric_name", "host"]: one digest per group; None uses the service default
+    external_id: str | None = Field(None, min_length=1, max_length=200)  # Stable key of rules managed as code, see `/alerts/bulk`
+
+    @model_validator(mode="after")
+    def check_tags(self):
+        if not self.tags and not self.tag_matchers:
+            raise ValueError("A rule needs `tags` or `tag_matchers`.")
+        return self
+
+
+class AlertRuleBulkSync(BaseModel):
+    """
+    Pydantic model for `POST /alerts/bulk` requests.
+    Rules are validated one by one as `AlertRuleCreate` objects with an `external_id`, so invalid ones are reported per item.
+    """
+
+    rules: List[dict] = Field(..., max_length=10000)
+    prune: bool = False  # Delete the rules with an external ID not in `rules`
 
 
 class Metric(BaseModel):
@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import asyncio
+import logging
+
+import redis.asyncio as aioredis
+
+from redis_config import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
+from notifiers.dispatcher import NotificationDispatcher
+from notifiers.telegram_notifier import TelegramNotifier
+from notifiers.email_notifier import EmailNotifier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NOTIFY_MAX_IN_FLIGHT = int(os.getenv("NOTIFY_MAX_IN_FLIGHT", "100"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_TELEGRAM_RATE = float(os.getenv("NOTIFY_TELEGRAM_RATE", "30"))
+NOTIFY_TELEGRAM_CHAT_RATE = float(os.getenv("NOTIFY_TELEGRAM_CHAT_RATE", "1"))
+NOTIFY_TELEGRAM_CONCURRENCY = int(os.getenv("NOTIFY_TELEGRAM_CONCURRENCY", "10"))
+NOTIFY_EMAIL_RATE = float(os.getenv("NOTIFY_EMAIL_RATE", "50"))
+NOTIFY_EMAIL_CONCURRENCY = int(os.getenv("NOTIFY_EMAIL_CONCURRENCY", "50"))
+NOTIFY_EMAIL_POOL_SIZE = int(os.getenv("NOTIFY_EMAIL_POOL_SIZE", "3"))
+
+
+async def main():
+    """
+    Run a notification dispatcher until SIGINT or SIGTERM, then finish the deliveries in flight.
+    Start with `python notification_worker.py`; any number of workers can share the queue.
+    """
+    redis_client = aioredis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        password=REDIS_PASSWORD,
+        decode_responses=True,
+    )
+    telegram = TelegramNotifier(client=TelegramNotifier.create_client(NOTIFY_TELEGRAM_CONCURRENCY))
+    email = EmailNotifier(pool=EmailNotifier.create_pool(NOTIFY_EMAIL_POOL_SIZE))
+    dispatcher = NotificationDispatcher(
+        redis_client,
+        {"telegram": telegram, "email": email},
+        consumer=f"{socket.gethostname()}:{os.getpid()}",
+        limits={
+            "telegram": {"rate": NOTIFY_TELEGRAM_RATE, "recipient_rate": NOTIFY_TELEGRAM_CHAT_RATE, "concurrency": NOTIFY_TELEGRAM_CONCURRENCY},
+            "email": {"rate": NOTIFY_EMAIL_RATE, "recipient_rate": 1, "concurrency": NOTIFY_EMAIL_CONCURRENCY},
+        },
+        max_in_flight=NOTIFY_MAX_IN_FLIGHT,
+        max_attempts=NOTIFY_MAX_ATTEMPTS,
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, dispatcher.stop)
+
+    try:
+        await dispatcher.run()
+    finally:
+        await telegram.close()
+        await email.close()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
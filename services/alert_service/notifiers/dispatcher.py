@@ -0,0 +1,296 @@
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from dao.redis.key_schema import KeySchema
+from dao.redis.notification_queue import RedisNotificationQueue
+from notifiers.notifier import Notifier, NotificationError
+from notifiers.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Asyncio consumer of the notification stream, delivering every notification through its channel's notifier.
+
+    - Entries are read with a consumer group, so every entry is delivered by one dispatcher, and entries
+      left pending by a crashed dispatcher are claimed back after `CLAIM_IDLE` seconds. Entries still
+      waiting for a token are claimed again by their own dispatcher periodically, so they never look idle.
+    - At most `max_in_flight` deliveries run at once, at most `concurrency` per channel, and one per recipient:
+      further entries for a busy recipient are held in memory, up to `MAX_HELD`, without taking a delivery
+      slot, so a storm aimed at one chat cannot stall the deliveries to every other one.
+    - Every channel has a token bucket for its global rate limit, and one per recipient for the
+      per-chat limit; a channel asking to back off (Telegram's `retry_after`) pauses the channel bucket.
+    - Failed deliveries are retried with exponential backoff and jitter through a sorted set scored by the
+      time of the next attempt. After `max_attempts`, or on a permanent error, they go to a dead letter stream.
+    - Delivery counts and the latency from evaluation to delivery are kept in a Redis hash, see
+      `RedisNotificationQueue.get_stats`.
+    """
+
+    DEFAULT_LIMITS = {
+        # Telegram allows ~30 messages per second overall and one per second per chat
+        "telegram": {"rate": 30, "recipient_rate": 1, "concurrency": 10},
+        # Email deliveries are batched and share a few SMTP sessions, so many can be in flight at once
+        "email": {"rate": 50, "recipient_rate": 1, "concurrency": 50},
+    }
+    FALLBACK_LIMITS = {"rate": 5, "recipient_rate": 1, "concurrency": 2}
+    MAX_IN_FLIGHT = 100
+    MAX_HELD = 1000  # entries read but waiting for a delivery to their recipient to finish
+    MAX_ATTEMPTS = 5
+    BACKOFF_BASE = 2.0  # seconds before the first retry, doubled for every further one
+    BACKOFF_MAX = 300.0
+    CLAIM_IDLE = 60  # seconds before an unacknowledged entry is claimed from its dispatcher
+    READ_BLOCK_MS = 1000
+    MAX_DEAD = 10_000  # dead letters kept for inspection
+
+    # Moves due retries back to the stream atomically, so no retry is lost or duplicated between dispatchers
+    PROMOTE_SCRIPT = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    for _, data in ipairs(due) do
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'data', data)
+        redis.call('ZREM', KEYS[1], data)
+    end
+    return #due
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        notifiers: Dict[str, Notifier],
+        consumer: str,
+        key_schema: KeySchema = None,
+        limits: Dict[str, dict] = None,
+        max_in_flight: int = None,
+        max_attempts: int = None,
+    ):
+        self.redis_client = redis_client
+        self.notifiers = notifiers
+        self.consumer = consumer
+        self.key_schema = key_schema or KeySchema()
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.max_attempts = max_attempts or self.MAX_ATTEMPTS
+
+        self.stream_key = self.key_schema.build_notification_stream_key()
+        self.retry_key = self.key_schema.build_notification_retry_key()
+        self.dead_key = self.key_schema.build_notification_dead_key()
+        self.stats_key = self.key_schema.build_notification_stats_key()
+
+        self.max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        self._tasks = set()
+        self._in_flight_ids = set()  # entries being delivered or held
+        self._busy_recipients = set()  # (channel, recipient) with a delivery task
+        self._held: Dict[tuple, Deque[Tuple[str, dict]]] = {}
+        self._held_count = 0
+        self._channel_slots: Dict[str, asyncio.Semaphore] = {}
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self._recipient_buckets: Dict[tuple, TokenBucket] = {}
+        self._stats: Dict[str, float] = {}
+        self._stopping = asyncio.Event()
+        self._promote = self.redis_client.register_script(self.PROMOTE_SCRIPT)
+
+    def _channel_limits(self, channel: str) -> dict:
+        return self.limits.get(channel, self.FALLBACK_LIMITS)
+
+    def _slots(self, channel: str) -> asyncio.Semaphore:
+        if channel not in self._channel_slots:
+            self._channel_slots[channel] = asyncio.Semaphore(self._channel_limits(channel)["concurrency"])
+        return self._channel_slots[channel]
+
+    def _buckets(self, channel: str, recipient: Optional[str]):
+        limits = self._channel_limits(channel)
+        if channel not in self._channel_buckets:
+            self._channel_buckets[channel] = TokenBucket(limits["rate"])
+        if (channel, recipient) not in self._recipient_buckets:
+            self._recipient_buckets[(channel, recipient)] = TokenBucket(limits["recipient_rate"])
+        return self._channel_buckets[channel], self._recipient_buckets[(channel, recipient)]
+
+    async def ensure_group(self):
+        """Create the consumer group, and the stream with it, unless they exist."""
+        try:
+            await self.redis_client.xgroup_create(self.stream_key, RedisNotificationQueue.GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def run(self):
+        """Dispatch notifications until `stop` is called, then wait for the deliveries in flight."""
+        await self.ensure_group()
+        logger.info(f"Notification dispatcher {self.consumer} started")
+
+        last_claim = 0.0
+        while not self._stopping.is_set():
+            try:
+                await self.promote_retries()
+                if time.monotonic() - last_claim >= self.CLAIM_IDLE / 2:
+                    await self.touch_in_flight()
+                    await self.claim_stale()
+                    last_claim = time.monotonic()
+                await self.read_once()
+                await self.flush_stats()
+            except redis.RedisError as e:
+                logger.error(f"Redis error in notification dispatcher: {e}")
+                await asyncio.sleep(1)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush_stats()
+        logger.info(f"Notification dispatcher {self.consumer} stopped")
+
+    def stop(self):
+        self._stopping.set()
+
+    async def read_once(self) -> int:
+        """Read new entries, as many as free delivery slots, and start delivering them."""
+        free = min(self.max_in_flight - len(self._tasks), self.MAX_HELD - self._held_count)
+        if free <= 0:
+            await asyncio.sleep(0.05)
+            return 0
+
+        response = await self.redis_client.xreadgroup(
+            RedisNotificationQueue.GROUP, self.consumer, {self.stream_key: ">"}, count=free, block=self.READ_BLOCK_MS
+        )
+        entries = [entry for _, stream_entries in response or [] for entry in stream_entries]
+        for entry_id, fields in entries:
+            self._start(entry_id, fields)
+        return len(entries)
+
+    async def claim_stale(self) -> int:
+        """Take over entries another dispatcher read but never acknowledged."""
+        _, entries, *_ = await self.redis_client.xautoclaim(
+            self.stream_key,
+            RedisNotificationQueue.GROUP,
+            self.consumer,
+            min_idle_time=self.CLAIM_IDLE * 1000,
+            start_id="0-0",
+            count=max(self.max_in_flight - len(self._tasks), 1),
+        )
+        entries = [(entry_id, fields) for entry_id, fields in entries if entry_id not in self._in_flight_ids and fields]
+        for entry_id, fields in entries:
+            self._start(entry_id, fields)
+        if entries:
+            logger.warning(f"Claimed {len(entries)} stale notifications")
+        return len(entries)
+
+    async def touch_in_flight(self):
+        """Reset the idle time of the entries being delivered, so no other dispatcher claims them."""
+        if self._in_flight_ids:
+            await self.redis_client.xclaim(
+                self.stream_key, RedisNotificationQueue.GROUP, self.consumer, min_idle_time=0, message_ids=list(self._in_flight_ids), justid=True
+            )
+
+    async def promote_retries(self) -> int:
+        """Move the retries that are due back into the stream."""
+        return await self._promote(keys=[self.retry_key, self.stream_key], args=[time.time(), 100, RedisNotificationQueue.MAX_LENGTH])
+
+    def _start(self, entry_id: str, fields: dict):
+        notification = json.loads(fields["data"])
+        key = (notification["channel"], notification["recipient"])
+        self._in_flight_ids.add(entry_id)
+        if key in self._busy_recipients:
+            # Only one task per recipient waits for its bucket, the others wait here without a slot
+            self._held.setdefault(key, deque()).append((entry_id, fields))
+            self._held_count += 1
+            return
+        self._run(key, entry_id, fields)
+
+    def _run(self, key: tuple, entry_id: str, fields: dict):
+        self._busy_recipients.add(key)
+        task = asyncio.create_task(self.deliver(entry_id, fields))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._finished(key, entry_id))
+
+    def _finished(self, key: tuple, entry_id: str):
+        """Start the next held entry of the recipient; once stopping, held entries stay pending for a later claim."""
+        self._in_flight_ids.discard(entry_id)
+        self._busy_recipients.discard(key)
+        held = self._held.get(key)
+        if held and not self._stopping.is_set():
+            self._held_count -= 1
+            self._run(key, *held.popleft())
+            if not held:
+                del self._held[key]
+
+    async def deliver(self, entry_id: str, fields: dict):
+        """Deliver one entry, then acknowledge it and schedule its retry or dead letter in one transaction."""
+        notification = json.loads(fields["data"])
+        channel, recipient = notification["channel"], notification["recipient"]
+        notifier = self.notifiers.get(channel)
+
+        error = None
+        if notifier is None:
+            error = NotificationError(f"No notifier for channel '{channel}'", permanent=True)
+        else:
+            channel_bucket, recipient_bucket = self._buckets(channel, recipient)
+            # Wait for the recipient outside the channel slots, so a busy chat does not hold up the others
+            await recipient_bucket.acquire()
+            async with self._slots(channel):
+                await channel_bucket.acquire()
+                try:
+                    await notifier.send(recipient, notification["message"])
+                except NotificationError as e:
+                    error = e
+                    if e.retry_after:
+                        channel_bucket.pause(e.retry_after)  # Rate limits apply to the whole bot, not only this chat
+                except Exception as e:
+                    error = NotificationError(f"Unexpected error: {e}")
+
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipeline:
+                pipeline.xack(self.stream_key, RedisNotificationQueue.GROUP, entry_id)
+                pipeline.xdel(self.stream_key, entry_id)
+                if error is None:
+                    self._record_delivery(channel, time.time() - notification["created_at"])
+                else:
+                    self._schedule_retry(pipeline, notification, error)
+                await pipeline.execute()
+        except redis.RedisError as e:
+            # The entry stays pending and is claimed again, so it is delivered at least once
+            logger.error(f"Failed to acknowledge notification {entry_id}: {e}")
+
+    def _schedule_retry(self, pipeline, notification: dict, error: NotificationError):
+        channel = notification["channel"]
+        attempt = notification["attempt"] + 1
+        if error.permanent or attempt >= self.max_attempts:
+            logger.error(f"Giving up on {channel} notification for rule {notification['rule_id']} after {attempt} attempts: {error}")
+            pipeline.xadd(self.dead_key, {"data": json.dumps({**notification, "attempt": attempt, "error": str(error)})}, maxlen=self.MAX_DEAD)
+            self._count(f"dead:{channel}")
+            return
+
+        delay = min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        delay = max(delay, error.retry_after or 0)
+        logger.warning(f"Retrying {channel} notification for rule {notification['rule_id']} in {delay:.1f}s: {error}")
+        pipeline.zadd(self.retry_key, {json.dumps({**notification, "attempt": attempt}): time.time() + delay})
+        self._count(f"retried:{channel}")
+
+    def _record_delivery(self, channel: str, latency: float):
+        self._count(f"delivered:{channel}")
+        self._count(f"latency_sum:{channel}", latency)
+        for bound in RedisNotificationQueue.LATENCY_BUCKETS:
+            if latency <= bound:
+                self._count(f"latency_bucket:{channel}:{bound}")
+        self._count(f"latency_bucket:{channel}:+Inf")
+
+    def _count(self, field: str, amount: float = 1):
+        self._stats[field] = self._stats.get(field, 0) + amount
+
+    async def flush_stats(self):
+        """Add the counters collected since the last flush to the stats hash."""
+        if not self._stats:
+            return
+        stats, self._stats = self._stats, {}
+        async with self.redis_client.pipeline(transaction=False) as pipeline:
+            for field, amount in stats.items():
+                if field.startswith("latency_sum:"):
+                    pipeline.hincrbyfloat(self.stats_key, field, amount)
+                else:
+                    pipeline.hincrby(self.stats_key, field, int(amount))
+            await pipeline.execute()
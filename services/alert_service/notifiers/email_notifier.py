@@ -1,5 +1,11 @@
-from .notifier import Notifier
+from .notifier import Notifier, NotificationError
+from .smtp_pool import SMTPConnectionPool
+from email.message import EmailMessage
+from typing import Dict, List
+import aiosmtplib
+import asyncio
 import logging
+import os
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,25 +13,157 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SMTP_SERVER = os.getenv("SMTP_SERVER", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT") or 0) or None
+SMTP_TLS = os.getenv("SMTP_TLS", "starttls").lower()  # "tls", "starttls" or "none"
+EMAIL_USERNAME = os.getenv("EMAIL_USERNAME") or None
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD") or None
+EMAIL_SENDER = os.getenv("EMAIL_SENDER") or EMAIL_USERNAME
+EMAIL_DEFAULT_RECIPIENT = os.getenv("EMAIL_DEFAULT_RECIPIENT") or None
+
 
 class EmailNotifier(Notifier):
     """
-    A notifier class to send alert notifications via email.
+    A notifier class to send alert notifications via email, over pooled SMTP sessions.
     Attributes:
-        smtp_server (str): The SMTP server address.
-        smtp_port (int): The SMTP server port.
-        sender_email (str): The sender's email address.
-        sender_password (str): The sender's email password.
+        pool (SMTPConnectionPool): The SMTP sessions shared by every message sent by this notifier.
+        sender (str): The sender's email address.
+        default_recipient (str): The address used when a notification has no recipient.
     Methods:
-        send_alert(message: str, recipients: list):
-            Sends an alert message to the specified recipients via email.
-            Args:
-                message (str): The alert message to be sent.
-                recipients (list): A list of recipient email addresses.
+        send(recipient: str, message: str):
+            Sends an alert message to a recipient via email. Messages sent within `batch_window` seconds are
+            batched: every distinct message becomes one email to all of its (de-duplicated) recipients, and the
+            emails of a batch are sent back to back over the pooled sessions.
+            Raises:
+                NotificationError: `permanent` when the server rejected the recipient or the message for good.
     """
-    
-    def __init__(self):
-        pass
 
-    def send_alert(self, message: str, recipients: list):
-        pass
+    BATCH_WINDOW = 0.05  # seconds a message waits for others to share its batch
+    BATCH_SIZE = 200  # messages that flush a batch without waiting for the window
+    MAX_RECIPIENTS = 50  # recipients per email, servers commonly refuse more than 100
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool = None,
+        sender: str = None,
+        default_recipient: str = None,
+        batch_window: float = None,
+        batch_size: int = None,
+    ):
+        self.pool = pool or self.create_pool()
+        self.sender = sender or EMAIL_SENDER
+        self.default_recipient = default_recipient or EMAIL_DEFAULT_RECIPIENT
+        self.batch_window = batch_window if batch_window is not None else self.BATCH_WINDOW
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self._pending: Dict[str, Dict[str, List[asyncio.Future]]] = {}  # message -> address -> waiting senders
+        self._pending_count = 0
+        self._batch_task: asyncio.Task = None
+        self._sending = set()
+
+    @classmethod
+    def create_pool(cls, size: int = None) -> SMTPConnectionPool:
+        """Create a pool of up to `size` SMTP sessions to `SMTP_SERVER`."""
+        return SMTPConnectionPool(
+            SMTP_SERVER,
+            SMTP_PORT,
+            username=EMAIL_USERNAME,
+            password=EMAIL_PASSWORD,
+            use_tls=SMTP_TLS == "tls",
+            start_tls={"tls": False, "starttls": None, "none": False}.get(SMTP_TLS),
+            size=size,
+        )
+
+    async def send(self, recipient: str, message: str):
+        address = recipient or self.default_recipient
+        if not address:
+            raise NotificationError("No email recipient given and EMAIL_DEFAULT_RECIPIENT is not set", permanent=True)
+        if "\r" in address or "\n" in address:
+            # It could not go in a header, and would fail the email of every recipient batched with it
+            raise NotificationError(f"Invalid email recipient: {address!r}", permanent=True)
+
+        future = asyncio.get_running_loop().create_future()
+        # Addresses are case-insensitive in practice; the first spelling seen is the one sent to
+        recipients = self._pending.setdefault(message, {})
+        key = next((known for known in recipients if known.lower() == address.lower()), address)
+        recipients.setdefault(key, []).append(future)
+        self._pending_count += 1
+
+        if self._pending_count >= self.batch_size:
+            self._start_batch()
+        elif self._batch_task is None:
+            self._batch_task = asyncio.create_task(self._flush_after_window())
+        await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.batch_window)
+        self._batch_task = None
+        self._start_batch()
+
+    def _start_batch(self):
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        batch, self._pending, self._pending_count = self._pending, {}, 0
+        if batch:
+            task = asyncio.create_task(self.send_batch(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def send_batch(self, batch: Dict[str, Dict[str, List[asyncio.Future]]]):
+        """Send every message of a batch, chunked by `MAX_RECIPIENTS`, and settle the futures of its senders."""
+        emails = []
+        for message, recipients in batch.items():
+            addresses = list(recipients)
+            for i in range(0, len(addresses), self.MAX_RECIPIENTS):
+                chunk = {address: recipients[address] for address in addresses[i : i + self.MAX_RECIPIENTS]}
+                emails.append(self._send_email(message, chunk))
+        await asyncio.gather(*emails)
+
+    async def _send_email(self, message: str, recipients: Dict[str, List[asyncio.Future]]):
+        errors = {}
+        try:
+            async with self.pool.session() as session:
+                refused, _ = await session.send_message(self.build_email(message, list(recipients)), sender=self.sender, recipients=list(recipients))
+            errors = {address: self._refusal(response.code, response.message) for address, response in refused.items()}
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            errors = {refusal.recipient: self._refusal(refusal.code, refusal.message) for refusal in e.recipients}
+        except aiosmtplib.SMTPResponseException as e:
+            errors = dict.fromkeys(recipients, NotificationError(f"SMTP error {e.code}: {e.message}", permanent=e.code >= 500))
+        except (aiosmtplib.SMTPException, OSError) as e:
+            errors = dict.fromkeys(recipients, NotificationError(f"SMTP request failed: {e}"))
+        except Exception as e:
+            # Every sender awaits its future, so an unexpected error must still settle them
+            logger.exception(f"Email to {len(recipients)} recipients could not be sent")
+            errors = dict.fromkeys(recipients, NotificationError(f"Email could not be sent: {e}", permanent=isinstance(e, ValueError)))
+
+        for address, futures in recipients.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if address in errors:
+                    future.set_exception(errors[address])
+                else:
+                    future.set_result(None)
+        if len(errors) < len(recipients):
+            logger.debug(f"Email alert sent to {len(recipients) - len(errors)} recipients")
+
+    @staticmethod
+    def _refusal(code: int, message: str) -> NotificationError:
+        # 4xx replies (mailbox busy, greylisting) are worth retrying, 5xx ones (no such user) are not
+        return NotificationError(f"Recipient refused ({code}): {message}", permanent=code >= 500)
+
+    def build_email(self, message: str, recipients: List[str]) -> EmailMessage:
+        """Build the email for a message: its first line is the subject, all of it the body."""
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = ", ".join(recipients)
+        email["Subject"] = message.splitlines()[0][:120] if message else "MoniFlow alert"
+        email.set_content(message)
+        return email
+
+    async def close(self):
+        """Send the pending batch, wait for the batches being sent and close the pool."""
+        self._start_batch()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+        await self.pool.close()
@@ -1,6 +1,28 @@
 from abc import ABC, abstractmethod
 
+
+class NotificationError(Exception):
+    """
+    Raised when a notification could not be delivered.
+
+    Attributes:
+        retry_after (float): Seconds the channel asked us to wait before retrying, if it said so.
+        permanent (bool): True if retrying cannot succeed, e.g. an unknown recipient.
+    """
+
+    def __init__(self, message: str, retry_after: float = None, permanent: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
 class Notifier(ABC):
     @abstractmethod
-    def send_alert(self, message: str, recipients: list):
+    async def send(self, recipient: str, message: str):
+        """Deliver one message to one recipient, raising `NotificationError` on failure."""
         pass
+
+    async def send_alert(self, message: str, recipients: list = None):
+        """Deliver a message to every recipient, or to the channel's default recipient."""
+        for recipient in recipients or [None]:
+            await self.send(recipient, message)
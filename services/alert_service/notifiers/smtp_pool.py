@@ -0,0 +1,103 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Tuple
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    A small pool of authenticated SMTP sessions, reused for many messages.
+
+    Opening a session costs a TCP (and TLS) handshake, EHLO and AUTH, and providers throttle clients opening
+    too many. Sessions are opened lazily, at most `size` at a time, and returned to the pool after every message.
+    A session is closed once it sent `max_messages` messages, since servers cap messages per session, or once it
+    was idle for `max_idle` seconds, since servers drop idle sessions; a failed session is always discarded.
+    """
+
+    SIZE = 3
+    MAX_MESSAGES = 100
+    MAX_IDLE = 60
+    TIMEOUT = 30
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int = None,
+        username: str = None,
+        password: str = None,
+        use_tls: bool = False,
+        start_tls: bool = None,
+        size: int = None,
+        max_messages: int = None,
+        max_idle: float = None,
+        timeout: float = None,
+    ):
+        self.connect_kwargs = {
+            "hostname": hostname,
+            "port": port,
+            "username": username,
+            "password": password,
+            "use_tls": use_tls,
+            "start_tls": start_tls,  # None upgrades the session when the server supports STARTTLS
+            "timeout": timeout or self.TIMEOUT,
+        }
+        self.size = size or self.SIZE
+        self.max_messages = max_messages or self.MAX_MESSAGES
+        self.max_idle = max_idle or self.MAX_IDLE
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle: List[Tuple[aiosmtplib.SMTP, int, float]] = []  # (session, messages sent, returned at)
+        self.opened = 0
+
+    async def _open(self) -> aiosmtplib.SMTP:
+        session = aiosmtplib.SMTP(**self.connect_kwargs)
+        await session.connect()
+        self.opened += 1
+        logger.debug(f"Opened SMTP session to {self.connect_kwargs['hostname']}")
+        return session
+
+    @staticmethod
+    async def _close(session: aiosmtplib.SMTP):
+        try:
+            await session.quit()
+        except aiosmtplib.SMTPException:
+            session.close()
+
+    async def _take(self) -> Tuple[aiosmtplib.SMTP, int]:
+        while self._idle:
+            session, sent, returned_at = self._idle.pop()
+            if session.is_connected and time.monotonic() - returned_at < self.max_idle:
+                return session, sent
+            await self._close(session)
+        return await self._open(), 0
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Borrow a connected session for one message, waiting while all `size` sessions are busy.
+
+        Yields:
+            aiosmtplib.SMTP: The session. It is discarded if the block raises.
+        """
+        async with self._slots:
+            session, sent = await self._take()
+            try:
+                yield session
+            except BaseException:
+                session.close()
+                raise
+
+            sent += 1
+            if sent >= self.max_messages or not session.is_connected:
+                await self._close(session)
+            else:
+                self._idle.append((session, sent, time.monotonic()))
+
+    async def close(self):
+        """Close the idle sessions."""
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._close(session) for session, _, _ in idle), return_exceptions=True)
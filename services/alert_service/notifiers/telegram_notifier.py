@@ -1,5 +1,5 @@
-from .notifier import Notifier
-from telegram import Bot
+from .notifier import Notifier, NotificationError
+import httpx
 from dotenv import load_dotenv
 import os
 import logging
@@ -15,30 +15,50 @@ CHANNEL_ID = os.getenv("CHANNEL_ID")
 
 class TelegramNotifier(Notifier):
     """
-    A notifier class for sending alerts via Telegram.
+    A notifier class for sending alerts via the Telegram Bot API.
     Attributes:
-        bot (Bot): An instance of the Telegram Bot initialized with the bot token.
+        client (httpx.AsyncClient): A pooled HTTP client, shared by every message sent by this notifier.
     Methods:
-        __init__():
-            Initializes the TelegramNotifier with the bot token.
-        send_alert(message: str):
-            Asynchronously sends an alert message to a specified Telegram channel.
-            Args:
-                message (str): The alert message to be sent.
-            Returns:
-                response: The response from the Telegram API if the message is sent successfully.
+        send(recipient: str, message: str):
+            Sends a message to a chat, or to `CHANNEL_ID` when no recipient is given.
             Raises:
-                Exception: If there is an error while sending the message.
+                NotificationError: With `retry_after` when Telegram rate limits us, `permanent` when the
+                request was rejected for good.
     """
-    
-    def __init__(self):
-        self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
-        
-    async def send_alert(self, message: str):
+
+    API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+    MAX_CONNECTIONS = 20
+
+    def __init__(self, client: httpx.AsyncClient = None, token: str = None, default_chat_id: str = None):
+        self.client = client or self.create_client()
+        self.url = self.API_URL.format(token=token or TELEGRAM_BOT_TOKEN)
+        self.default_chat_id = default_chat_id or CHANNEL_ID
+
+    @classmethod
+    def create_client(cls, max_connections: int = None) -> httpx.AsyncClient:
+        """Create an HTTP client keeping up to `max_connections` connections to Telegram alive."""
+        max_connections = max_connections or cls.MAX_CONNECTIONS
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def send(self, recipient: str, message: str):
         try:
-            # logger.info(f"TELEGRAM_BOT_TOKEN: {TELEGRAM_BOT_TOKEN}, CHANNEL_ID: {CHANNEL_ID}, Sending Telegram alert: {message}")
-            response = await self.bot.send_message(chat_id=CHANNEL_ID, text=message)
-            logger.info(f"Telegram alert sent: {response}")
-            return response
-        except Exception as e:
-            logger.error(f"Telegram alert sending failed: {e}")
\ No newline at end of file
+            response = await self.client.post(self.url, json={"chat_id": recipient or self.default_chat_id, "text": message})
+        except httpx.HTTPError as e:
+            raise NotificationError(f"Telegram request failed: {e}") from e
+
+        if response.status_code == 429:
+            retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            raise NotificationError("Telegram rate limit reached", retry_after=float(retry_after))
+        if response.status_code >= 500:
+            raise NotificationError(f"Telegram server error {response.status_code}")
+        if response.status_code >= 400:
+            raise NotificationError(f"Telegram rejected the message: {response.text}", permanent=True)
+
+        logger.debug(f"Telegram alert sent to {recipient or self.default_chat_id}")
+        return response.json()
+
+    async def close(self):
+        await self.client.aclose()
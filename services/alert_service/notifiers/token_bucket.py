@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Rate limiter allowing `rate` acquisitions per second on average, with bursts of up to `capacity`.
+
+    Waiters are served in the order they called `acquire`, each sleeping only until its token is due.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """
+        Take one token, waiting until one is available.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait:
+                # Hold the lock while waiting, so later callers queue behind this one
+                await asyncio.sleep(wait)
+            return wait
+
+    def pause(self, seconds: float):
+        """Drain the bucket for `seconds`, e.g. when the channel asked us to back off."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, -seconds * self.rate)
@@ -0,0 +1,144 @@
+"""
+Renders the statistics the alert service keeps in Redis in the Prometheus text exposition format, served by `GET /metrics`.
+
+The statistics are written by every worker process (evaluation, notification dispatch, periodic tasks), so they are
+read back from Redis on every scrape instead of being kept in the API process.
+"""
+
+import math
+from typing import Dict, Iterable, List, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def bucket_order(bound: str) -> float:
+    return math.inf if bound == "+Inf" else float(bound)
+
+
+def metric(name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Render a gauge or counter with one sample per label set."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{format_labels(labels)} {format_value(value)}" for labels, value in samples)
+    return lines
+
+
+def histogram(name: str, help_text: str, series: Iterable[Tuple[Dict[str, str], dict]]) -> List[str]:
+    """
+    Render a histogram from cumulative bucket counts.
+
+    Args:
+        name (str): The metric name, without the `_bucket`/`_sum`/`_count` suffixes.
+        help_text (str): The metric description.
+        series: Per label set, a dict of `buckets` ({upper bound: cumulative count}, with "+Inf"), `sum` and `count`.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, values in series:
+        buckets = values["buckets"]
+        for bound in sorted(buckets, key=bucket_order):
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {buckets[bound]}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(float(values['sum']))}")
+        lines.append(f"{name}_count{format_labels(labels)} {values.get('count', buckets.get('+Inf', 0))}")
+    return lines
+
+
+def render_metrics(evaluation: dict, notifications: dict, tasks: Dict[str, dict]) -> str:
+    """
+    Render every alert service metric.
+
+    Args:
+        evaluation (dict): `RedisEvaluationStats.get_stats`.
+        notifications (dict): `RedisNotificationQueue.get_stats`.
+        tasks (Dict[str, dict]): `RedisTaskLock.get_stats`.
+
+    Returns:
+        str: The metrics in the Prometheus text format.
+    """
+    histograms = evaluation["histograms"]
+    lines = []
+    lines += histogram(
+        "moniflow_eval_tick_duration_seconds",
+        "Duration of an evaluation run, by task (a shard of a tick, a scheduled batch, or the updated series).",
+        (({"task": task}, values) for task, values in sorted(histograms.get("tick_duration", {}).items())),
+    )
+    lines += histogram(
+        "moniflow_eval_phase_duration_seconds",
+        "Duration of an evaluation phase: rule load, fetch, evaluate, state write.",
+        (({"phase": phase}, values) for phase, values in sorted(histograms.get("phase_duration", {}).items())),
+    )
+    lines += histogram(
+        "moniflow_eval_sample_age_seconds",
+        "Age of the newest sample of every evaluated series, +Inf for series without samples.",
+        (({}, values) for values in histograms.get("sample_age", {}).values()),
+    )
+    lines += metric(
+        "moniflow_eval_slowest_rule_seconds",
+        "gauge",
+        "Evaluation time of the slowest rules over the last minute or two.",
+        (({"rule": rule}, seconds) for rule, seconds in evaluation["slow_rules"]),
+    )
+    lines += metric(
+        "moniflow_eval_stalest_series_age_seconds",
+        "gauge",
+        "Age of the newest sample of the stalest evaluated series over the last minute or two.",
+        (({"series": series}, math.inf if age >= 1e12 else age) for series, age in evaluation["stale_series"]),
+    )
+
+    channels = notifications["channels"]
+    lines += histogram(
+        "moniflow_notification_delay_seconds",
+        "Delay between the evaluation raising a notification and its delivery, by channel.",
+        (
+            ({"channel": channel}, {"buckets": stats["latency_buckets"], "sum": stats["latency_sum"]})
+            for channel, stats in sorted(channels.items())
+            if stats["latency_buckets"]
+        ),
+    )
+    lines += metric(
+        "moniflow_notifications_total",
+        "counter",
+        "Notification delivery attempts by channel and result.",
+        (
+            ({"channel": channel, "result": result}, stats[result])
+            for channel, stats in sorted(channels.items())
+            for result in ("delivered", "retried", "dead")
+        ),
+    )
+    lines += metric(
+        "moniflow_notification_backlog",
+        "gauge",
+        "Notifications queued, waiting for a retry, or dead-lettered.",
+        (({"state": state}, notifications[state]) for state in ("queued", "retrying", "dead")),
+    )
+
+    for name, stat, kind, help_text in (
+        (
+            "moniflow_task_schedule_lag_seconds",
+            "lag",
+            "gauge",
+            "How much later than one interval after the previous run a periodic task last started.",
+        ),
+        ("moniflow_task_schedule_max_lag_seconds", "max_lag", "gauge", "Largest schedule lag of a periodic task so far."),
+        ("moniflow_task_duration_seconds", "duration", "gauge", "Duration of the latest completed run of a periodic task."),
+        ("moniflow_task_runs_total", "runs", "counter", "Runs of a periodic task."),
+        ("moniflow_task_skipped_total", "skipped", "counter", "Ticks of a periodic task skipped because the previous run was still going."),
+        ("moniflow_task_merged_total", "merged", "counter", "Ticks of a periodic task merged into a rerun of the run still going."),
+    ):
+        lines += metric(name, kind, help_text, (({"task": task}, stats[stat]) for task, stats in sorted(tasks.items()) if stat in stats))
+
+    return "\n".join(lines) + "\n"
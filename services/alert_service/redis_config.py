@@ -1,5 +1,6 @@
 import os
 import redis
+import redis.asyncio
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,12 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 REDIS_ALERT_EXPIRY = int(os.getenv("REDIS_ALERT_EXPIRY", "300"))
+REDIS_METRIC_DEFAULT_RETENTION = int(os.getenv("REDIS_METRIC_DEFAULT_RETENTION", "600"))
+REDIS_METRIC_RETENTION_GRACE = int(os.getenv("REDIS_METRIC_RETENTION_GRACE", "60"))
+REDIS_METRIC_CHUNK_SECONDS = int(os.getenv("REDIS_METRIC_CHUNK_SECONDS", "600"))
+REDIS_METRIC_CHUNK_COMPRESSION = os.getenv("REDIS_METRIC_CHUNK_COMPRESSION", "false").lower() == "true"
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.getenv("REDIS_ASYNC_MAX_CONNECTIONS", "50"))
+REDIS_ASYNC_POOL_TIMEOUT = float(os.getenv("REDIS_ASYNC_POOL_TIMEOUT", "5"))
 
 
 redis_client = redis.Redis(
@@ -18,3 +25,17 @@ redis_client = redis.Redis(
     password=REDIS_PASSWORD,
     decode_responses=True,
 )
+
+# Used by the API's async endpoints: requests share up to REDIS_ASYNC_MAX_CONNECTIONS connections,
+# waiting up to REDIS_ASYNC_POOL_TIMEOUT seconds for a free one instead of opening more
+async_redis_client = redis.asyncio.Redis(
+    connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        password=REDIS_PASSWORD,
+        decode_responses=True,
+        max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+        timeout=REDIS_ASYNC_POOL_TIMEOUT,
+    )
+)
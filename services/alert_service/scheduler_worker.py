@@ -0,0 +1,87 @@
+import signal
+import logging
+import threading
+import time
+
+from evaluators.rule_scheduler import RuleScheduler
+from tasks import (
+    celery,
+    task_lock,
+    redis_metrics,
+    alert_rule_cache,
+    rule_batch_evaluator,
+    ALERT_EVAL_BATCH_SIZE,
+    ALERT_EVAL_MIN_INTERVAL,
+    ALERT_EVAL_MAX_INTERVAL,
+    ALERT_EVALS_PER_DURATION,
+    ALERT_SCHEDULER_LEASE_SECONDS,
+    FETCH_ALERT_RULES_INTERVAL,
+    SCHEDULER_LOCK_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch(scheduler: RuleScheduler, now: float, token: int) -> int:
+    """Send the rules due by `now` to the Celery workers, one `evaluate_rules` task per batch; returns the rule count."""
+    due = scheduler.pop_due(now)
+    for batch in scheduler.batches(due, ALERT_EVAL_BATCH_SIZE):
+        celery.send_task("alert_service.evaluate_rules", args=[[rule.rule_id for rule in batch], int(now), token])
+    return len(due)
+
+
+def main():
+    """
+    Run the rule scheduler until SIGINT or SIGTERM: every second, dispatch the rules due at their own interval.
+    Start with `python scheduler_worker.py`.
+
+    One scheduler is active at a time, holding the `SCHEDULER_LOCK_NAME` lease; any others wait to take over
+    once it expires. Batches carry the lease's fencing token, so a scheduler that lost its lease while stalled
+    cannot get its batches evaluated next to the new scheduler's.
+    """
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    renew_every = ALERT_SCHEDULER_LEASE_SECONDS / 3
+    scheduler, token, renewed, rules_version, retention_synced = None, None, 0.0, None, 0.0
+    while not stop.is_set():
+        now = time.time()
+        try:
+            if token is None:
+                token, _ = task_lock.acquire(SCHEDULER_LOCK_NAME, ALERT_SCHEDULER_LEASE_SECONDS, now, ALERT_SCHEDULER_LEASE_SECONDS)
+                if token is None:
+                    stop.wait(renew_every)
+                    continue
+                logger.info(f"Took over rule scheduling with token {token}.")
+                scheduler = RuleScheduler(now, ALERT_EVAL_MIN_INTERVAL, ALERT_EVAL_MAX_INTERVAL, ALERT_EVALS_PER_DURATION)
+                renewed, rules_version, retention_synced = now, None, 0.0
+            elif now - renewed >= renew_every:
+                if not task_lock.renew(SCHEDULER_LOCK_NAME, token, ALERT_SCHEDULER_LEASE_SECONDS):
+                    logger.warning(f"Rule scheduler lease {token} was lost, standing by.")
+                    token = None
+                    continue
+                renewed = now
+
+            alert_rule_cache.ensure_started()
+            if alert_rule_cache.version != rules_version:
+                rules_version = alert_rule_cache.version
+                scheduler.sync(alert_rule_cache.get_rules())
+                logger.info(f"Scheduling {len(scheduler)} alert rules.")
+            if now - retention_synced >= FETCH_ALERT_RULES_INTERVAL:
+                redis_metrics.sync_series_retention(rule_batch_evaluator.expand(alert_rule_cache.get_rules()))
+                retention_synced = now
+
+            dispatch(scheduler, now, token)
+        except Exception:
+            logger.exception("Rule scheduler tick failed")
+
+        stop.wait(1 - time.time() % 1)  # until the start of the next second
+
+    if token is not None:
+        task_lock.release(SCHEDULER_LOCK_NAME, token, 0)
+    alert_rule_cache.stop()
+
+
+if __name__ == "__main__":
+    main()
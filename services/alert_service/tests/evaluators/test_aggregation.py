@@ -0,0 +1,68 @@
+import pytest
+from dao.redis.chunk_summary import ChunkSummary
+from evaluators.aggregation import Aggregation
+from models import AlertRuleSchema
+
+SAMPLES = [(100, 10.0), (110, 20.0), (120, 30.0), (130, 40.0)]
+
+
+@pytest.mark.parametrize(
+    "aggregation, expected",
+    [
+        ("avg", 25.0),
+        ("min", 10.0),
+        ("max", 40.0),
+        ("sum", 100.0),
+        ("count", 4.0),
+        ("increase", 30.0),
+        ("rate", 1.0),
+        ("p0", 10.0),  # Quantiles are estimated within the sketch's relative accuracy
+        ("p99.9", 40.0),
+    ],
+)
+def test_compute(aggregation, expected):
+    assert Aggregation.compute(aggregation, ChunkSummary.from_samples(SAMPLES)) == pytest.approx(expected, rel=ChunkSummary.RELATIVE_ACCURACY)
+
+
+@pytest.mark.parametrize(
+    "aggregation, expected",
+    [("count", 0.0), ("sum", 0.0), ("avg", None), ("max", None), ("p95", None), ("rate", None)],
+)
+def test_compute_empty_window(aggregation, expected):
+    """Only count and sum are defined without samples."""
+    assert Aggregation.compute(aggregation, ChunkSummary()) == expected
+
+
+def test_rate_needs_two_timestamps():
+    assert Aggregation.compute("rate", ChunkSummary.from_samples([(100, 1.0)])) is None
+
+
+def make_rule(aggregation, comparison=">", threshold=25.0):
+    return AlertRuleSchema(
+        _id="rule",
+        metric_name="latency",
+        tags={"host": "server-1"},
+        field_name="ms",
+        threshold=threshold,
+        duration=300,
+        comparison=comparison,
+        use_recovery_alert=False,
+        notification_channels=["telegram"],
+        recipients={},
+        aggregation=aggregation,
+    )
+
+
+def test_from_alert_rule():
+    summary = ChunkSummary.from_samples(SAMPLES)
+
+    assert Aggregation.from_alert_rule(make_rule("p95"), summary) is True
+    assert Aggregation.from_alert_rule(make_rule("avg"), summary) is False
+    assert Aggregation.from_alert_rule(make_rule("count", "<", 1.0), ChunkSummary()) is True
+    assert Aggregation.from_alert_rule(make_rule("avg"), ChunkSummary()) is False
+
+
+@pytest.mark.parametrize("aggregation", ["median", "p", "p100.5", "P95", "avg "])
+def test_invalid_aggregation_rejected(aggregation):
+    with pytest.raises(ValueError):
+        make_rule(aggregation)
@@ -0,0 +1,289 @@
+import json
+import pytest
+import redis
+from unittest.mock import MagicMock
+from redis.client import NEVER_DECODE
+from dao.redis.metrics import RedisMetrics
+from dao.redis.alert_state import RedisAlertState
+from dao.redis.notification_queue import RedisNotificationQueue
+from dao.redis.alert_groups import RedisAlertGroups
+from dao.redis.evaluation_stats import RedisEvaluationStats
+from dao.redis.chunk_codec import ChunkCodec
+from dao.mongo.mongo_alert_history import MongoAlertHistory
+from evaluators.alert_evaluator import AlertEvaluator
+from evaluators.rule_batch_evaluator import RuleBatchEvaluator
+from evaluators.window_state import WindowState
+from models import AlertRuleSchema, TagMatcher
+
+CURRENT_TIME = 1740571230
+CHUNK_START = 1740571200
+
+
+def make_rule(rule_id, threshold=85.0, comparison=">"):
+    return AlertRuleSchema(
+        _id=rule_id,
+        metric_name="cpu_usage",
+        tags={"host": rule_id},
+        field_name="usage",
+        threshold=threshold,
+        duration=20,
+        comparison=comparison,
+        use_recovery_alert=True,
+        recovery_time=600,
+        notification_channels=["telegram"],
+        recipients={"telegram": ["@user1"]},
+    )
+
+
+def window(*values):
+    """A single chunk holding one sample per value, inside the rule window."""
+    return [ChunkCodec.pack(CHUNK_START, [(CURRENT_TIME - i, value) for i, value in enumerate(values)])]
+
+
+@pytest.fixture
+def pipelines():
+    """State, read and write pipelines, in the order the evaluator requests them."""
+    return [MagicMock(), MagicMock(), MagicMock()]
+
+
+@pytest.fixture
+def evaluator(pipelines):
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = pipelines
+    history = MagicMock(spec=MongoAlertHistory)
+    return RuleBatchEvaluator(RedisMetrics(redis_client), RedisAlertState(redis_client), history)
+
+
+def test_alert_rule_schema_reads_mongo_id():
+    """Rules loaded from MongoDB carry their `_id` as `rule_id`."""
+    assert make_rule("abc").rule_id == "abc"
+
+
+def test_evaluate_chunk_uses_one_round_trip_per_phase(evaluator, pipelines):
+    """States, windows and changes each take one pipeline, history takes one insert."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    rules = [make_rule("fire"), make_rule("active"), make_rule("recover"), make_rule("idle")]
+    state_pipeline.execute.return_value = [
+        None, None,  # Condition met, ok -> trigger
+        None, "firing",  # Condition met, already firing -> nothing
+        None, "firing",  # Condition not met, firing -> recover
+        None, None,  # No data, ok -> idle, not sent to the state machine
+    ]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), window(90.0, 91.0), window(50.0, 91.0), [None]]
+    evaluator.redis_alert_state._transition.return_value = ["triggered", "", "recovered"]
+
+    summary = evaluator.evaluate(rules, CURRENT_TIME)
+
+    assert summary == {"evaluated": 4, "triggered": 1, "recovered": 1}
+    state_pipeline.execute.assert_called_once()
+    assert state_pipeline.execute_command.call_count == 4
+    assert state_pipeline.hget.call_count == 4
+    read_pipeline.execute.assert_called_once()
+    assert read_pipeline.execute_command.call_count == 4
+
+    evaluator.redis_alert_state._transition.assert_called_once()
+    keys = evaluator.redis_alert_state._transition.call_args[1]["keys"]
+    assert keys == ["moniflow:alert_fsm:fire", "moniflow:alert_fsm:active", "moniflow:alert_fsm:recover"]
+    write_pipeline.execute.assert_called_once()
+
+    evaluator.mongo_alert_history.log_alerts.assert_called_once()
+    history = evaluator.mongo_alert_history.log_alerts.call_args[0][0]
+    assert [(entry["rule_id"], entry["status"]) for entry in history] == [("fire", "triggered"), ("recover", "recovered")]
+
+
+def test_evaluate_chunk_reads_only_new_samples(evaluator, pipelines):
+    """A stored window state limits the fetch to samples from its newest second on and still answers for the whole window."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    rule = make_rule("fire")
+    state = WindowState.for_rule(rule, None)
+    state.update(AlertEvaluator.COMPARISON_OPERATORS[">"], 85.0, [(CURRENT_TIME - 15, 90.0)], CURRENT_TIME - 20)
+    state_pipeline.execute.return_value = [state.pack(), None]
+    samples = [(CURRENT_TIME - 18, 10.0), (CURRENT_TIME - 15, 90.0), (CURRENT_TIME, 95.0)]
+    read_pipeline.execute.return_value = [[ChunkCodec.pack(CHUNK_START, samples)]]
+    evaluator.redis_alert_state._transition.return_value = ["triggered"]
+
+    summary = evaluator.evaluate([rule], CURRENT_TIME)
+
+    # The sample older than the state is skipped, otherwise it would prevent the alert
+    assert summary == {"evaluated": 1, "triggered": 1, "recovered": 0}
+    chunk_key = "moniflow:metrics:cpu_usage:host=fire:usage:chunk:1740571200"
+    read_pipeline.execute_command.assert_called_once_with("MGET", chunk_key, **{NEVER_DECODE: []})
+
+    stored = WindowState.unpack(write_pipeline.setex.call_args_list[0][0][2])
+    assert (stored.newest, stored.breach_count) == (CURRENT_TIME, 2)  # The re-read sample at CURRENT_TIME - 15 is not counted again
+    assert (stored.window_min, stored.window_max) == (90.0, 95.0)
+
+
+def test_evaluate_without_changes_skips_writes(evaluator, pipelines):
+    """An unchanged state and no alert changes means no write pipeline and no history insert."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    rule = make_rule("quiet")
+    state = WindowState.for_rule(rule, None)
+    state.update(AlertEvaluator.COMPARISON_OPERATORS[">"], 85.0, [(CURRENT_TIME, 50.0)], CURRENT_TIME - 20)
+    state_pipeline.execute.return_value = [state.pack(), None]
+    read_pipeline.execute.return_value = [[None]]
+
+    summary = evaluator.evaluate([rule], CURRENT_TIME)
+
+    assert summary == {"evaluated": 1, "triggered": 0, "recovered": 0}
+    evaluator.redis_alert_state._transition.assert_not_called()
+    write_pipeline.execute.assert_not_called()
+    evaluator.mongo_alert_history.log_alerts.assert_not_called()
+
+
+def test_evaluate_splits_rules_into_chunks():
+    """Each chunk of rules gets its own state and read pipelines."""
+    redis_client = MagicMock(spec=redis.Redis)
+    state_pipelines = [MagicMock() for _ in range(3)]
+    read_pipelines = [MagicMock() for _ in range(3)]
+    for state_pipeline, read_pipeline, size in zip(state_pipelines, read_pipelines, [2, 2, 1]):
+        state_pipeline.execute.return_value = [None, None] * size
+        read_pipeline.execute.return_value = [[None]] * size
+    redis_client.pipeline.side_effect = [p for pair in zip(state_pipelines, read_pipelines) for p in (*pair, MagicMock())]
+    evaluator = RuleBatchEvaluator(RedisMetrics(redis_client), RedisAlertState(redis_client), MagicMock(), batch_size=2)
+
+    summary = evaluator.evaluate([make_rule(str(i)) for i in range(5)], CURRENT_TIME)
+
+    assert summary["evaluated"] == 5
+    for pipeline in state_pipelines + read_pipelines:
+        pipeline.execute.assert_called_once()
+
+
+def test_evaluate_chunk_redis_error(evaluator, pipelines):
+    """A Redis failure while reading skips the chunk without writing anything."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    state_pipeline.execute.return_value = [None, None]
+    read_pipeline.execute.side_effect = redis.RedisError("Redis failure")
+
+    summary = evaluator.evaluate([make_rule("a")], CURRENT_TIME)
+
+    assert summary == {"evaluated": 0, "triggered": 0, "recovered": 0}
+    write_pipeline.execute.assert_not_called()
+
+
+def test_evaluate_compares_each_rule_with_its_own_operator(pipelines):
+    """Rules of one chunk are compared with their own operators and thresholds."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = pipelines
+    evaluator = RuleBatchEvaluator(RedisMetrics(redis_client), RedisAlertState(redis_client), MagicMock())
+    rules = [make_rule("fire"), make_rule("low", comparison="<"), make_rule("idle")]
+    state_pipeline.execute.return_value = [None, None, None, None, None, None]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), window(50.0, 91.0), [None]]
+    evaluator.redis_alert_state._transition.return_value = ["triggered", "pending"]
+
+    summary = evaluator.evaluate(rules, CURRENT_TIME)
+
+    assert summary == {"evaluated": 3, "triggered": 1, "recovered": 0}
+    # "low" breaches with its newest sample only, so it is pending; "idle" has no data
+    assert evaluator.redis_alert_state._transition.call_args[1]["args"] == [CURRENT_TIME, 1, 1, 600, 1220, 1, 0, 600, 1220]
+
+
+def test_aggregated_rule_uses_chunk_summaries(evaluator, pipelines):
+    """Rules with an aggregation skip the window state and are evaluated from summaries."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    rule = make_rule("p95").model_copy(update={"aggregation": "avg"})
+    state_pipeline.execute.return_value = [None]  # Only the alert state is read
+    read_pipeline.execute.return_value = [[ChunkCodec.pack(CHUNK_START, [(CURRENT_TIME - 5, 80.0), (CURRENT_TIME, 100.0)])]]
+    evaluator.redis_alert_state._transition.return_value = ["triggered"]
+
+    summary = evaluator.evaluate([rule], CURRENT_TIME)
+
+    assert summary == {"evaluated": 1, "triggered": 1, "recovered": 0}
+    state_pipeline.execute_command.assert_not_called()
+    write_pipeline.setex.assert_not_called()
+    # An aggregation has no pending phase: it is breaching exactly when triggered
+    assert evaluator.redis_alert_state._transition.call_args[1]["args"] == [CURRENT_TIME, 1, 1, 600, 20 + 600 + 600]
+
+
+def test_matcher_rule_fans_out_per_series(evaluator, pipelines):
+    """A rule with tag matchers is evaluated once per matching series, each with its own alert state."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    rule = make_rule("web").model_copy(update={"tags": {}, "tag_matchers": [TagMatcher(tag="host", op="wildcard", value="web-*")]})
+    evaluator.redis_metrics.series_index.resolve = MagicMock(return_value={"a": {"host": "web-1"}, "b": {"host": "web-2"}})
+    state_pipeline.execute.return_value = [None, None, None, None]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), window(50.0, 51.0)]
+    evaluator.redis_alert_state._transition.return_value = ["triggered"]
+
+    summary = evaluator.evaluate([rule], CURRENT_TIME)
+
+    assert summary == {"evaluated": 2, "triggered": 1, "recovered": 0}
+    assert evaluator.redis_alert_state._transition.call_args[1]["keys"] == ["moniflow:alert_fsm:web:host=web-1"]
+    history = evaluator.mongo_alert_history.log_alerts.call_args[0][0]
+    assert [(entry["rule_id"], entry["tags"]) for entry in history] == [("web", {"host": "web-1"})]
+
+
+def test_rule_needs_tags_or_matchers():
+    with pytest.raises(ValueError, match="tag_matchers"):
+        make_rule("none").model_validate({**make_rule("none").model_dump(), "tags": {}})
+    with pytest.raises(ValueError, match="Invalid regex"):
+        TagMatcher(tag="host", op="regex", value="web-(")
+
+
+def test_state_changes_queue_notifications(pipelines):
+    """Triggers and recoveries queue their notifications on the write pipeline."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = pipelines
+    evaluator = RuleBatchEvaluator(
+        RedisMetrics(redis_client), RedisAlertState(redis_client), MagicMock(), notification_queue=RedisNotificationQueue(redis_client)
+    )
+    state_pipeline.execute.return_value = [None, None, None, "firing"]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), window(50.0, 51.0)]
+    redis_client.register_script.return_value.return_value = ["triggered", "recovered"]
+
+    evaluator.evaluate([make_rule("fire"), make_rule("recover")], CURRENT_TIME)
+
+    notifications = [json.loads(call[0][1]["data"]) for call in write_pipeline.xadd.call_args_list]
+    assert [(n["rule_id"], n["status"], n["channel"], n["recipient"]) for n in notifications] == [
+        ("fire", "triggered", "telegram", "@user1"),
+        ("recover", "recovered", "telegram", "@user1"),
+    ]
+    assert "cpu_usage.usage {host=fire} > 85.0" in notifications[0]["message"]
+    write_pipeline.execute.assert_called_once()
+
+
+def test_state_changes_join_alert_groups(pipelines):
+    """With grouping, state changes are added to their group instead of being notified one by one."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = pipelines
+    evaluator = RuleBatchEvaluator(
+        RedisMetrics(redis_client),
+        RedisAlertState(redis_client),
+        MagicMock(),
+        notification_queue=RedisNotificationQueue(redis_client),
+        alert_groups=RedisAlertGroups(redis_client),
+    )
+    state_pipeline.execute.return_value = [None, None, None, None]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), window(90.0, 91.0)]
+    redis_client.register_script.return_value.return_value = ["triggered", "triggered"]
+
+    evaluator.evaluate([make_rule("web-1"), make_rule("web-2")], CURRENT_TIME)
+
+    write_pipeline.xadd.assert_not_called()
+    assert [call[0][0] for call in write_pipeline.hset.call_args_list] == ["moniflow:alert_group:metric_name=cpu_usage"] * 2
+    write_pipeline.zadd.assert_called_with("moniflow:alert_groups:due", {"metric_name=cpu_usage": CURRENT_TIME + 30}, nx=True)
+
+
+def test_evaluation_records_stats(pipelines):
+    """With stats, phases, per-rule times and the age of the newest sample of every series are recorded."""
+    state_pipeline, read_pipeline, write_pipeline = pipelines
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = pipelines
+    stats = MagicMock(spec=RedisEvaluationStats)
+    evaluator = RuleBatchEvaluator(RedisMetrics(redis_client), RedisAlertState(redis_client), MagicMock(), stats=stats)
+    state_pipeline.execute.return_value = [None, None, None, None]
+    read_pipeline.execute.return_value = [window(90.0, 91.0), [None]]
+    redis_client.register_script.return_value.return_value = ["triggered"]
+
+    evaluator.evaluate([make_rule("fire"), make_rule("silent")], CURRENT_TIME)
+
+    assert [call[0][:2] for call in stats.observe.call_args_list] == [
+        ("phase_duration", "fetch"),
+        ("phase_duration", "evaluate"),
+        ("phase_duration", "write"),
+    ]
+    assert [call[0][0] for call in stats.record_rule.call_args_list] == ["fire", "silent"]
+    stats.record_sample_age.assert_any_call("cpu_usage.usage {host=fire}", 0)
+    stats.record_sample_age.assert_any_call("cpu_usage.usage {host=silent}", None)
@@ -0,0 +1,69 @@
+from collections import Counter
+from types import SimpleNamespace
+from evaluators.rule_scheduler import RuleScheduler
+
+
+def make_rule(rule_id, duration=60):
+    return SimpleNamespace(rule_id=rule_id, duration=duration)
+
+
+def test_interval_follows_duration_within_bounds():
+    scheduler = RuleScheduler(0, min_interval=5, max_interval=300, evaluations_per_duration=4)
+
+    assert scheduler.interval_for(make_rule("a", 10)) == 5
+    assert scheduler.interval_for(make_rule("a", 60)) == 15
+    assert scheduler.interval_for(make_rule("a", 3600)) == 300
+
+
+def test_rules_are_due_once_per_interval():
+    scheduler = RuleScheduler(1000)
+    scheduler.sync([make_rule("fast", 20), make_rule("slow", 240)])
+
+    counts = Counter()
+    for now in range(1001, 1601):
+        counts.update(rule.rule_id for rule in scheduler.pop_due(now))
+
+    assert counts == {"fast": 120, "slow": 10}
+
+
+def test_rules_are_spread_over_their_interval():
+    """Rules sharing an interval are due at stable phases spread over it, not all in the same second."""
+    rules = [make_rule(f"rule-{i}", 240) for i in range(600)]
+    scheduler = RuleScheduler(0)
+    scheduler.sync(rules)
+
+    per_second = [len(scheduler.pop_due(now)) for now in range(1, 61)]
+    assert sum(per_second) == 600
+    assert min(per_second) > 0 and max(per_second) < 30
+
+    restarted = RuleScheduler(7)
+    restarted.sync(rules)
+    assert [len(restarted.pop_due(now)) for now in range(8, 61)] == per_second[7:]
+
+
+def test_catching_up_returns_missed_rules_once():
+    scheduler = RuleScheduler(0)
+    scheduler.sync([make_rule("a", 20)])
+
+    assert [rule.rule_id for rule in scheduler.pop_due(30)] == ["a"]
+    assert scheduler.wheel.now == 30
+    assert len(scheduler.wheel) == 1
+
+
+def test_sync_follows_rule_changes():
+    scheduler = RuleScheduler(0)
+    scheduler.sync([make_rule("a", 20), make_rule("b", 20)])
+    assert len(scheduler.wheel) == 2
+
+    scheduler.sync([make_rule("a", 1200), make_rule("c", 20)])
+
+    assert len(scheduler) == 2
+    assert "b" not in scheduler.wheel
+    due = Counter(rule.rule_id for now in range(1, 301) for rule in scheduler.pop_due(now))
+    assert due == {"a": 1, "c": 60}
+
+
+def test_batches():
+    rules = [make_rule(str(i)) for i in range(5)]
+
+    assert [[rule.rule_id for rule in batch] for batch in RuleScheduler.batches(rules, 2)] == [["0", "1"], ["2", "3"], ["4"]]
@@ -0,0 +1,34 @@
+import pytest
+from types import SimpleNamespace
+from evaluators.shard_ring import ShardRing
+
+
+def test_shard_for_is_stable_and_in_range():
+    """A rule always lands on the same shard, within the shard count."""
+    ring = ShardRing(8)
+    shards = [ring.shard_for(f"rule-{i}") for i in range(1000)]
+
+    assert shards == [ShardRing(8).shard_for(f"rule-{i}") for i in range(1000)]
+    assert set(shards) == set(range(8))
+
+
+def test_shards_are_balanced():
+    """Virtual nodes keep every shard within a reasonable share of the rules."""
+    ring = ShardRing(4)
+    sizes = [len(rules) for rules in ring.split([SimpleNamespace(rule_id=f"rule-{i}") for i in range(4000)]).values()]
+
+    assert min(sizes) > 500 and max(sizes) < 1500
+
+
+def test_adding_a_shard_moves_few_rules():
+    """Growing the ring only moves the rules taken over by the new shard."""
+    before, after = ShardRing(8), ShardRing(9)
+    moved = [i for i in range(2000) if before.shard_for(str(i)) != after.shard_for(str(i))]
+
+    assert all(after.shard_for(str(i)) == 8 for i in moved)
+    assert len(moved) < 2000 * 0.25
+
+
+def test_invalid_shard_count():
+    with pytest.raises(ValueError):
+        ShardRing(0)
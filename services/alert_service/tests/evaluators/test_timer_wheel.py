@@ -0,0 +1,72 @@
+import random
+from evaluators.timer_wheel import TimerWheel
+
+
+def test_timers_fire_at_their_tick():
+    wheel = TimerWheel(now=100, slots=4, levels=3)
+    wheel.schedule("a", 101)
+    wheel.schedule("b", 103)
+    wheel.schedule("c", 103)
+
+    assert wheel.advance(102) == ["a"]
+    assert sorted(wheel.advance(103)) == ["b", "c"]
+    assert wheel.advance(200) == []
+    assert len(wheel) == 0
+
+
+def test_far_timers_cascade_down_the_levels():
+    """Timers beyond level 0, and beyond the whole wheel, still fire exactly at their tick."""
+    wheel = TimerWheel(now=0, slots=4, levels=2)  # the wheel covers 16 ticks
+    for due in (5, 17, 40):
+        wheel.schedule(due, due)
+
+    fired = {}
+    for tick in range(1, 50):
+        for key in wheel.advance(tick):
+            fired[key] = tick
+
+    assert fired == {5: 5, 17: 17, 40: 40}
+
+
+def test_schedule_replaces_and_cancel_removes():
+    wheel = TimerWheel(now=0, slots=4, levels=2)
+    wheel.schedule("a", 3)
+    wheel.schedule("a", 9)
+    wheel.schedule("b", 5)
+
+    assert wheel.cancel("b") is True
+    assert wheel.cancel("b") is False
+    assert "b" not in wheel
+    assert wheel.advance(8) == []
+    assert wheel.advance(9) == ["a"]
+
+
+def test_past_due_timers_fire_on_next_tick():
+    wheel = TimerWheel(now=10)
+    wheel.schedule("late", 5)
+
+    assert wheel.advance(11) == ["late"]
+
+
+def test_random_timers_fire_once_when_due():
+    """Whatever the wheel size and advance steps, every timer fires once, at the first advance past its tick."""
+    rng = random.Random(7)
+    for _ in range(50):
+        slots, levels = rng.choice([2, 4, 8]), rng.choice([1, 2, 3])
+        start = rng.randint(0, 10**6)
+        wheel = TimerWheel(now=start, slots=slots, levels=levels)
+        horizon = 3 * slots**levels
+        due = {key: start + rng.randint(1, horizon) for key in range(40)}
+        for key, tick in due.items():
+            wheel.schedule(key, tick)
+
+        fired, now = {}, start
+        while now < start + horizon + 8:
+            step = rng.randint(1, 7)
+            for key in wheel.advance(now + step):
+                assert key not in fired
+                fired[key] = now + step
+            now += step
+
+        assert fired.keys() == due.keys()
+        assert all(due[key] <= fired[key] < due[key] + 7 for key in due)
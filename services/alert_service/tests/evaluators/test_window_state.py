@@ -0,0 +1,104 @@
+import pytest
+from evaluators.alert_evaluator import AlertEvaluator
+from evaluators.window_state import WindowState
+from models import AlertRuleSchema
+
+GREATER = AlertEvaluator.COMPARISON_OPERATORS[">"]
+
+
+def make_rule(threshold=85.0):
+    return AlertRuleSchema(
+        _id="rule",
+        metric_name="cpu_usage",
+        tags={"host": "server-1"},
+        field_name="usage",
+        threshold=threshold,
+        duration=20,
+        comparison=">",
+        use_recovery_alert=False,
+        notification_channels=["telegram"],
+        recipients={},
+    )
+
+
+@pytest.mark.parametrize(
+    "samples, min_time, expected",
+    [
+        ([(100, 90.0), (110, 91.0)], 95, True),  # Every sample in the window breaches
+        ([(100, 50.0), (110, 91.0)], 95, False),  # One sample in the window does not
+        ([(100, 50.0), (110, 91.0)], 105, True),  # The non-breaching sample left the window
+        ([(100, 90.0)], 105, False),  # No sample left in the window
+        ([], 0, False),  # No data at all
+    ],
+)
+def test_is_triggered_matches_full_window_evaluation(samples, min_time, expected):
+    """The O(1) answer matches evaluating every value of the window."""
+    state = WindowState()
+    state.update(GREATER, 85.0, samples, min_time)
+    assert state.is_triggered(min_time) is expected
+    window = [value for timestamp, value in samples if timestamp >= min_time]
+    assert AlertEvaluator.evaluate(">", 85.0, window) is expected
+
+
+def test_update_is_incremental():
+    """Samples are applied once, older ones are skipped and the extrema follow the window."""
+    state = WindowState()
+    state.update(GREATER, 85.0, [(100, 90.0), (105, 99.0), (110, 86.0)], 95)
+    assert (state.newest, state.breach_since, state.breach_count) == (110, 100, 3)
+    assert (state.window_min, state.window_max) == (86.0, 99.0)
+
+    state.update(GREATER, 85.0, [(105, 10.0), (120, 95.0)], 108)
+
+    assert (state.newest, state.last_ok, state.breach_count) == (120, 0, 4)
+    assert (state.window_min, state.window_max) == (86.0, 95.0)
+    assert state.fetch_from(108) == 120  # A later sample can still share the newest second
+    assert state.fetch_from(200) == 200
+
+
+@pytest.mark.parametrize("replayed", [[(120, 95.0), (120, 50.0)], [(120, 50.0), (120, 95.0)]])
+def test_sample_sharing_the_newest_second_is_applied(replayed):
+    """A non-breaching sample landing in the second of an applied breaching one clears the breach, in either read order."""
+    state = WindowState()
+    state.update(GREATER, 85.0, [(100, 90.0), (120, 95.0)], 95)
+    assert state.is_triggered(95) and state.fetch_from(95) == 120
+
+    state.update(GREATER, 85.0, replayed, 95)
+
+    assert (state.newest, state.newest_count, state.last_ok, state.breach_count) == (120, 2, 120, 0)
+    assert not state.is_triggered(95)
+    assert (state.window_min, state.window_max) == (50.0, 95.0)
+
+    state.update(GREATER, 85.0, [(120, 50.0), (120, 95.0), (120, 99.0)], 95)  # A breaching sample joins the same second
+
+    assert (state.newest_count, state.last_ok, state.breach_count) == (3, 120, 0)
+    assert not state.is_triggered(95)
+
+
+def test_breaching_samples_sharing_a_second_are_counted_once():
+    state = WindowState()
+    state.update(GREATER, 85.0, [(100, 90.0), (100, 91.0)], 95)
+    state.update(GREATER, 85.0, [(100, 90.0), (100, 91.0), (100, 92.0)], 95)
+
+    assert (state.newest_count, state.breach_since, state.breach_count) == (3, 100, 3)
+    assert state.is_triggered(95)
+
+
+def test_pack_round_trip():
+    """A packed state restores every field."""
+    state = WindowState(signature=42)
+    state.update(GREATER, 85.0, [(100, 50.0), (105, 99.0), (110, 86.0)], 95)
+
+    restored = WindowState.unpack(state.pack())
+
+    assert vars(restored) == vars(state)
+
+
+def test_for_rule_discards_stale_or_corrupt_state():
+    """A state saved for another condition, or unreadable, is replaced by a fresh one."""
+    state = WindowState.for_rule(make_rule(), None)
+    state.update(GREATER, 85.0, [(100, 90.0)], 95)
+
+    assert WindowState.for_rule(make_rule(), state.pack()).newest == 100
+    assert WindowState.for_rule(make_rule(threshold=80.0), state.pack()).newest == 0
+    assert WindowState.for_rule(make_rule(), state.pack()[:-3]).newest == 0
+    assert WindowState.for_rule(make_rule(), b"junk").newest == 0
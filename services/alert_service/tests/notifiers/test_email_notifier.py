@@ -0,0 +1,147 @@
+import socket
+import asyncio
+import pytest
+from aiosmtpd.controller import Controller
+from notifiers.email_notifier import EmailNotifier
+from notifiers.notifier import NotificationError
+from notifiers.smtp_pool import SMTPConnectionPool
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping every envelope, and refusing `unknown@example.com`."""
+
+    def __init__(self):
+        self.envelopes = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == "unknown@example.com":
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content.decode()))
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+def make_notifier(port, size=2):
+    pool = SMTPConnectionPool("127.0.0.1", port, start_tls=False, size=size)
+    return EmailNotifier(pool=pool, sender="alerts@example.com", batch_window=0.01)
+
+
+def run(notifier, sends):
+    async def send_all():
+        try:
+            return await asyncio.gather(*(notifier.send(recipient, message) for recipient, message in sends), return_exceptions=True)
+        finally:
+            await notifier.close()
+
+    return asyncio.run(send_all())
+
+
+def test_batch_sends_one_email_per_message_to_unique_recipients(smtp_server):
+    """Concurrent sends of a message become one email; recipients differing only in case are sent to once."""
+    handler, port = smtp_server
+    sends = [("ops@example.com", "CPU high\nsince 12:00"), ("OPS@example.com", "CPU high\nsince 12:00"), ("dba@example.com", "CPU high\nsince 12:00")]
+
+    results = run(make_notifier(port), sends + [("ops@example.com", "Disk full")])
+
+    assert results == [None] * 4
+    emails = sorted(handler.envelopes, key=lambda envelope: len(envelope[1]))
+    assert [(sender, recipients) for sender, recipients, _ in emails] == [
+        ("alerts@example.com", ["ops@example.com"]),
+        ("alerts@example.com", ["ops@example.com", "dba@example.com"]),
+    ]
+    assert "Subject: CPU high" in emails[1][2]
+
+
+def test_sessions_are_pooled(smtp_server):
+    """Many emails share at most `size` SMTP sessions."""
+    handler, port = smtp_server
+
+    results = run(make_notifier(port, size=2), [(f"user{i}@example.com", f"Alert {i}") for i in range(20)])
+
+    assert results == [None] * 20
+    assert len(handler.envelopes) == 20
+    assert handler.sessions <= 2
+
+
+def test_refused_recipient_fails_permanently(smtp_server):
+    """A recipient the server refuses fails for good, without failing the others of the email."""
+    handler, port = smtp_server
+
+    ok, refused = run(make_notifier(port), [("ops@example.com", "CPU high"), ("unknown@example.com", "CPU high")])
+
+    assert ok is None
+    assert isinstance(refused, NotificationError) and refused.permanent
+    assert [recipients for _, recipients, _ in handler.envelopes] == [["ops@example.com"]]
+
+
+def test_recipient_with_linefeed_is_permanent_and_spares_the_others(smtp_server):
+    handler, port = smtp_server
+
+    ok, invalid = run(make_notifier(port), [("ops@example.com", "CPU high"), ("ops@example.com\nBcc: x@example.com", "CPU high")])
+
+    assert ok is None
+    assert isinstance(invalid, NotificationError) and invalid.permanent
+    assert [recipients for _, recipients, _ in handler.envelopes] == [["ops@example.com"]]
+
+
+def test_unexpected_error_fails_senders_instead_of_hanging(smtp_server, monkeypatch):
+    """An email that cannot be built settles the futures of all its senders."""
+    _, port = smtp_server
+    notifier = make_notifier(port)
+
+    def build_email(message, recipients):
+        raise ValueError("Header values may not contain linefeed or carriage return characters")
+
+    monkeypatch.setattr(notifier, "build_email", build_email)
+
+    async def send_all():
+        sends = asyncio.gather(notifier.send("ops@example.com", "CPU high"), notifier.send("dba@example.com", "CPU high"), return_exceptions=True)
+        try:
+            return await asyncio.wait_for(sends, timeout=5)
+        finally:
+            await notifier.close()
+
+    errors = asyncio.run(send_all())
+
+    assert all(isinstance(error, NotificationError) and error.permanent for error in errors)
+
+
+def test_unreachable_server_is_retryable():
+    notifier = EmailNotifier(pool=SMTPConnectionPool("127.0.0.1", free_port(), start_tls=False, timeout=2), sender="alerts@example.com")
+
+    (error,) = run(notifier, [("ops@example.com", "CPU high")])
+
+    assert isinstance(error, NotificationError) and not error.permanent
+
+
+def test_missing_recipient_is_permanent():
+    notifier = EmailNotifier(pool=SMTPConnectionPool("127.0.0.1"), sender="alerts@example.com")
+    notifier.default_recipient = None
+
+    with pytest.raises(NotificationError) as error:
+        asyncio.run(notifier.send(None, "CPU high"))
+    assert error.value.permanent
@@ -0,0 +1,153 @@
+import json
+import time
+import asyncio
+import pytest
+import fakeredis
+from unittest.mock import AsyncMock, MagicMock
+from dao.redis.notification_queue import RedisNotificationQueue
+from notifiers.dispatcher import NotificationDispatcher
+from notifiers.notifier import NotificationError
+from notifiers.token_bucket import TokenBucket
+
+STREAM_KEY = "moniflow:notifications"
+
+
+def make_entry(recipient="@ops", channel="telegram", attempt=0):
+    notification = RedisNotificationQueue.build_notifications("r1", "triggered", "CPU high", [channel], {channel: [recipient]})[0]
+    notification["attempt"] = attempt
+    return {"data": json.dumps(notification)}
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = MagicMock()
+    pipeline.execute = AsyncMock()
+    return pipeline
+
+
+@pytest.fixture
+def dispatcher(pipeline):
+    redis_client = MagicMock()
+    redis_client.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipeline)
+    redis_client.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    notifier = MagicMock()
+    notifier.send = AsyncMock()
+    return NotificationDispatcher(redis_client, {"telegram": notifier}, "worker-1")
+
+
+def test_deliver_acknowledges_and_records_latency(dispatcher, pipeline):
+    """A delivered entry is acknowledged and removed from the stream in one transaction."""
+    asyncio.run(dispatcher.deliver("1-0", make_entry()))
+
+    dispatcher.notifiers["telegram"].send.assert_awaited_once_with("@ops", "CPU high")
+    dispatcher.redis_client.pipeline.assert_called_once_with(transaction=True)
+    pipeline.xack.assert_called_once_with(STREAM_KEY, "dispatchers", "1-0")
+    pipeline.xdel.assert_called_once_with(STREAM_KEY, "1-0")
+    pipeline.zadd.assert_not_called()
+    assert dispatcher._stats["delivered:telegram"] == 1
+    assert dispatcher._stats["latency_bucket:telegram:+Inf"] == 1
+
+
+def test_deliver_schedules_retry_with_backoff(dispatcher, pipeline):
+    """A failed delivery is retried no sooner than the channel asked, with the attempt counted."""
+    dispatcher.notifiers["telegram"].send.side_effect = NotificationError("Too Many Requests", retry_after=30)
+
+    asyncio.run(dispatcher.deliver("1-0", make_entry()))
+
+    pipeline.xack.assert_called_once()
+    retry_key, retries = pipeline.zadd.call_args[0]
+    assert retry_key == "moniflow:notifications:retry"
+    ((data, due),) = retries.items()
+    assert json.loads(data)["attempt"] == 1
+    assert due >= time.time() + 29
+    assert dispatcher._stats == {"retried:telegram": 1}
+
+
+@pytest.mark.parametrize(
+    "entry, error",
+    [
+        (make_entry(attempt=NotificationDispatcher.MAX_ATTEMPTS - 1), NotificationError("timeout")),
+        (make_entry(), NotificationError("chat not found", permanent=True)),
+        (make_entry(channel="sms"), None),
+    ],
+)
+def test_deliver_dead_letters(dispatcher, pipeline, entry, error):
+    """Exhausted retries, permanent errors and unknown channels end in the dead letter stream."""
+    dispatcher.notifiers["telegram"].send.side_effect = error
+
+    asyncio.run(dispatcher.deliver("1-0", entry))
+
+    pipeline.zadd.assert_not_called()
+    dead_key, fields = pipeline.xadd.call_args[0]
+    assert dead_key == "moniflow:notifications:dead"
+    assert "error" in json.loads(fields["data"])
+
+
+def test_read_once_is_bounded_by_free_slots(dispatcher):
+    dispatcher.max_in_flight = 3
+    dispatcher._tasks = {MagicMock()}
+    dispatcher.redis_client.xreadgroup = AsyncMock(return_value=[])
+
+    asyncio.run(dispatcher.read_once())
+
+    assert dispatcher.redis_client.xreadgroup.call_args[1]["count"] == 2
+
+
+def test_token_bucket_spaces_out_bursts():
+    """Once the burst is used, every further token waits for the refill."""
+
+    async def acquire_all(bucket, count):
+        return [await bucket.acquire() for _ in range(count)]
+
+    waits = asyncio.run(acquire_all(TokenBucket(rate=50, capacity=2), 4))
+
+    assert waits[:2] == [0.0, 0.0]
+    assert all(0.01 < wait <= 0.02 for wait in waits[2:])
+
+
+def test_promote_retries_moves_only_due_retries_to_the_stream():
+    """The promote script, run on fakeredis, moves due retries to the stream once and leaves later ones scheduled."""
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    dispatcher = NotificationDispatcher(redis_client, {}, "worker-1")
+    due, later = make_entry(attempt=1)["data"], make_entry(recipient="@dba", attempt=1)["data"]
+
+    async def promote():
+        await redis_client.zadd(dispatcher.retry_key, {due: time.time() - 1, later: time.time() + 60})
+        promoted = [await dispatcher.promote_retries(), await dispatcher.promote_retries()]
+        return promoted, await redis_client.xrange(STREAM_KEY), await redis_client.zrange(dispatcher.retry_key, 0, -1)
+
+    promoted, stream, retries = asyncio.run(promote())
+
+    assert promoted == [1, 0]
+    assert [fields["data"] for _, fields in stream] == [due]
+    assert retries == [later]
+
+
+def test_storm_to_one_recipient_holds_one_delivery_slot(dispatcher):
+    """Entries for a recipient already being delivered to wait without a task, so other recipients keep their slots."""
+    dispatcher.limits["telegram"] = {"rate": 1000, "recipient_rate": 1000, "concurrency": 10}
+    dispatcher.max_in_flight = 3
+    send = dispatcher.notifiers["telegram"].send
+
+    async def dispatch():
+        for i in range(5):
+            dispatcher._start(f"{i}-0", make_entry(recipient="@storm"))
+        dispatcher._start("5-0", make_entry(recipient="@ops"))
+        started = (len(dispatcher._tasks), dispatcher._held_count, len(dispatcher._in_flight_ids))
+        while dispatcher._tasks:
+            await asyncio.gather(*dispatcher._tasks)
+        return started
+
+    assert asyncio.run(dispatch()) == (2, 4, 6)
+    assert [call.args[0] for call in send.await_args_list].count("@storm") == 5
+    assert "@ops" in [call.args[0] for call in send.await_args_list[:2]]
+    assert (dispatcher._held, dispatcher._held_count, dispatcher._in_flight_ids) == ({}, 0, set())
+
+
+def test_read_once_is_bounded_by_held_entries(dispatcher):
+    dispatcher._held_count = NotificationDispatcher.MAX_HELD - 1
+    dispatcher.redis_client.xreadgroup = AsyncMock(return_value=[])
+
+    asyncio.run(dispatcher.read_once())
+
+    assert dispatcher.redis_client.xreadgroup.call_args[1]["count"] == 1
@@ -0,0 +1,148 @@
+import pytest
+import redis
+from unittest.mock import MagicMock
+from bson import ObjectId, json_util
+from pymongo import errors
+from dao.mongo.alert_history_writer import AlertHistoryWriter
+from dao.mongo.mongo_alert_history import MongoAlertHistory
+
+SPILL_KEY = "moniflow:history_spill"
+
+
+def make_entries(count, status="triggered"):
+    return [MongoAlertHistory.build_alert_entry(str(i), "cpu_usage", {"host": "server-1"}, "usage", status) for i in range(count)]
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    monkeypatch.setattr(AlertHistoryWriter, "RETRY_BACKOFF", 0)
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.lpop.return_value = None
+    mongo_alert_history = MagicMock(spec=MongoAlertHistory, collection=MagicMock(), events=MagicMock())
+    return AlertHistoryWriter(mongo_alert_history, redis_client, flush_size=3, flush_interval=60)
+
+
+def test_log_alerts_buffers_until_size(writer):
+    """Events are only written once `flush_size` are buffered, in one unordered batch."""
+    collection = writer.mongo_alert_history.collection
+    writer.log_alerts(make_entries(2))
+    collection.insert_many.assert_not_called()
+
+    writer.log_alerts(make_entries(1, "recovered"))
+
+    collection.insert_many.assert_called_once()
+    assert len(collection.insert_many.call_args[0][0]) == 3
+    assert collection.insert_many.call_args[1] == {"ordered": False}
+
+
+def test_log_alerts_flushes_on_interval(writer):
+    writer.flush_interval = 0
+    writer.log_alerts(make_entries(1))
+
+    writer.mongo_alert_history.collection.insert_many.assert_called_once()
+
+
+def test_flush_writes_remaining_events(writer):
+    writer.log_alerts(make_entries(2))
+
+    assert writer.flush() == 2
+    assert writer.flush() == 0
+    writer.mongo_alert_history.collection.insert_many.assert_called_once()
+
+
+def test_flush_retries_only_failed_events(writer):
+    """After a partial failure, only rejected events are retried; duplicates of written events count as written."""
+    collection = writer.mongo_alert_history.collection
+    write_errors = [{"index": 0, "code": 11000}, {"index": 2, "code": 91}]
+    collection.insert_many.side_effect = [errors.BulkWriteError({"writeErrors": write_errors}), None]
+    entries = make_entries(3)
+    writer.log_alerts(entries)
+
+    assert collection.insert_many.call_count == 2
+    assert collection.insert_many.call_args[0][0] == [entries[2]]
+    writer.redis_client.pipeline.assert_not_called()
+    writer.mongo_alert_history.events.insert_many.assert_called_once_with([MongoAlertHistory.build_event(entry) for entry in entries], ordered=False)
+
+
+def test_flush_spills_after_retries(writer):
+    """Events MongoDB keeps rejecting are pushed to the Redis spill list."""
+    collection = writer.mongo_alert_history.collection
+    collection.insert_many.side_effect = errors.AutoReconnect("down")
+    pipeline = writer.redis_client.pipeline.return_value
+    entries = make_entries(2)
+    writer.log_alerts(entries)
+
+    assert writer.flush() == 0
+    assert collection.insert_many.call_count == writer.max_retries + 1
+    writer.mongo_alert_history.events.insert_many.assert_not_called()
+    pipeline.rpush.assert_called_once_with(SPILL_KEY, *[json_util.dumps(entry) for entry in entries])
+    pipeline.ltrim.assert_called_once_with(SPILL_KEY, -AlertHistoryWriter.MAX_SPILL, -1)
+
+
+def test_flush_replays_spilled_events(writer):
+    collection = writer.mongo_alert_history.collection
+    spilled = make_entries(1)
+    spilled[0]["_id"] = ObjectId()
+    writer.redis_client.lpop.return_value = [json_util.dumps(spilled[0])]
+
+    assert writer.flush() == 1
+    writer.redis_client.lpop.assert_called_once_with(SPILL_KEY, 3)
+    replayed = collection.insert_many.call_args[0][0]
+    assert [(entry["_id"], entry["rule_id"]) for entry in replayed] == [(spilled[0]["_id"], "0")]
+
+
+def test_flush_spills_without_retries_while_replay_fails(writer):
+    """When the replay fails, spilled events go back and new events are spilled without retrying."""
+    collection = writer.mongo_alert_history.collection
+    collection.insert_many.side_effect = errors.AutoReconnect("down")
+    spilled = json_util.dumps(make_entries(1)[0])
+    writer.redis_client.lpop.return_value = [spilled]
+    writer.log_alerts(make_entries(1))
+
+    assert writer.flush() == 0
+    assert collection.insert_many.call_count == writer.max_retries + 1  # Only the replayed batch was retried
+    writer.redis_client.lpush.assert_called_once_with(SPILL_KEY, spilled)
+    writer.redis_client.pipeline.return_value.rpush.assert_called_once()
+
+
+def test_flush_spills_events_whose_mirror_fails(writer):
+    """Events written to `alert_history` but not to `alert_events` are retried, then spilled rather than lost."""
+    events = writer.mongo_alert_history.events
+    write_errors = [{"index": 1, "code": 91}]
+    events.insert_many.side_effect = [errors.BulkWriteError({"writeErrors": write_errors})] + [errors.AutoReconnect("down")] * writer.max_retries
+    pipeline = writer.redis_client.pipeline.return_value
+    entries = make_entries(2)
+    writer.log_alerts(entries)
+
+    assert writer.flush() == 2
+    assert events.insert_many.call_count == writer.max_retries + 1
+    assert events.insert_many.call_args[0][0] == [MongoAlertHistory.build_event(entries[1])]
+    pipeline.rpush.assert_called_once_with(SPILL_KEY, json_util.dumps(entries[1]))
+
+
+def test_replay_mirrors_events_already_in_history(writer):
+    """A spilled event already in `alert_history` is reported as a duplicate there, not counted again, and mirrored again."""
+    collection, events = writer.mongo_alert_history.collection, writer.mongo_alert_history.events
+    spilled = make_entries(1)[0]
+    spilled["_id"] = ObjectId()
+    writer.redis_client.lpop.return_value = [json_util.dumps(spilled)]
+    collection.insert_many.side_effect = errors.BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]})
+
+    assert writer.flush() == 0
+    assert collection.insert_many.call_count == 1
+    events.insert_many.assert_called_once()
+    assert events.insert_many.call_args[0][0][0]["history_id"] == spilled["_id"]
+
+
+def test_mirror_retries_carry_the_history_id(writer):
+    """A mirror write that may have landed is retried with the same `history_id`, which queries deduplicate on."""
+    events = writer.mongo_alert_history.events
+    events.insert_many.side_effect = [errors.AutoReconnect("lost reply"), None]
+    entries = make_entries(2)
+    writer.log_alerts(entries)
+
+    assert writer.flush() == 2
+    attempts = [[event["history_id"] for event in call[0][0]] for call in events.insert_many.call_args_list]
+    assert attempts == [[entry["_id"] for entry in entries]] * 2
+    assert all(history_id is not None for history_id in attempts[0])
+    writer.redis_client.lpush.assert_not_called()
@@ -0,0 +1,164 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from pymongo import errors
+from dao.mongo.alert_rule_cache import AlertRuleCache
+from dao.mongo.mongo_alert_rules import MongoAlertRule
+from evaluators.shard_ring import ShardRing
+
+
+def make_document(rule_id, threshold=85.0, updated_at=datetime(2025, 3, 10, 12, 0), host="server-1"):
+    return {
+        "_id": rule_id,
+        "metric_name": "cpu_usage",
+        "tags": {"host": host},
+        "field_name": "usage",
+        "threshold": threshold,
+        "duration": 300,
+        "comparison": ">",
+        "notification_channels": ["telegram"],
+        "recipients": {},
+        "use_recovery_alert": False,
+        "recovery_time": None,
+        "updated_at": updated_at,
+    }
+
+
+@pytest.fixture
+def mongo_alert_rules():
+    return MagicMock(spec=MongoAlertRule)
+
+
+@pytest.fixture
+def cache(mongo_alert_rules):
+    mongo_alert_rules.get_alert_rules.return_value = [make_document("a"), make_document("b"), {"_id": "broken"}]
+    cache = AlertRuleCache(mongo_alert_rules)
+    cache.load()
+    return cache
+
+
+def test_load_validates_once(cache, mongo_alert_rules):
+    """Rules are loaded and validated once; invalid documents are skipped."""
+    assert sorted(rule.rule_id for rule in cache.get_rules()) == ["a", "b"]
+
+    with patch("dao.mongo.alert_rule_cache.AlertRuleSchema") as schema:
+        cache.get_rules()
+        cache.get_rules()
+
+    schema.assert_not_called()
+    mongo_alert_rules.get_alert_rules.assert_called_once()
+
+
+def test_apply_change_stream_events(cache):
+    """Insert, update and delete events are applied to the cache."""
+    new_id = ObjectId()
+    version = cache.version
+
+    cache.apply_change({"operationType": "insert", "documentKey": {"_id": new_id}, "fullDocument": make_document(new_id)})
+    cache.apply_change({"operationType": "update", "documentKey": {"_id": "a"}, "fullDocument": make_document("a", threshold=95.0)})
+    cache.apply_change({"operationType": "delete", "documentKey": {"_id": "b"}})
+
+    rules = {rule.rule_id: rule for rule in cache.get_rules()}
+    assert set(rules) == {"a", str(new_id)}
+    assert rules["a"].threshold == 95.0
+    assert cache.version == version + 3
+
+
+def test_apply_update_without_full_document_removes_rule(cache):
+    """An update whose document was deleted before lookup removes the rule."""
+    cache.apply_change({"operationType": "update", "documentKey": {"_id": "a"}, "fullDocument": None})
+
+    assert [rule.rule_id for rule in cache.get_rules()] == ["b"]
+
+
+def test_poll_applies_changes_since_last_update(cache, mongo_alert_rules):
+    """Polling reads rules changed since the newest `updated_at` seen, minus the overlap."""
+    mongo_alert_rules.get_alert_rules_updated_since.return_value = [
+        make_document("a"),  # Re-read without changes
+        make_document("c", updated_at=datetime(2025, 3, 10, 12, 5)),
+    ]
+    mongo_alert_rules.get_alert_rule_ids.return_value = {"a", "b", "c", "broken"}
+    version = cache.version
+
+    cache.poll()
+
+    mongo_alert_rules.get_alert_rules_updated_since.assert_called_once_with(datetime(2025, 3, 10, 12, 0) - AlertRuleCache.POLL_OVERLAP)
+    assert sorted(rule.rule_id for rule in cache.get_rules()) == ["a", "b", "c"]
+    assert cache.version == version + 1
+
+
+def test_poll_detects_deleted_rules(cache, mongo_alert_rules):
+    """Rules missing from the ID scan are dropped."""
+    mongo_alert_rules.get_alert_rules_updated_since.return_value = []
+    mongo_alert_rules.get_alert_rule_ids.return_value = {"a", "broken"}
+
+    cache.poll()
+
+    assert [rule.rule_id for rule in cache.get_rules()] == ["a"]
+
+
+def test_poll_detects_deletion_replaced_by_insertion(cache, mongo_alert_rules):
+    """A rule deleted and another inserted in the same interval leave the count unchanged, the deleted one is still dropped."""
+    mongo_alert_rules.get_alert_rules_updated_since.return_value = [make_document("c", updated_at=datetime(2025, 3, 10, 12, 5))]
+    mongo_alert_rules.get_alert_rule_ids.return_value = {"a", "c", "broken"}
+    version = cache.version
+
+    cache.poll()
+
+    assert sorted(rule.rule_id for rule in cache.get_rules()) == ["a", "c"]
+    assert cache.version == version + 2
+
+
+def test_run_falls_back_to_polling_on_standalone(cache, mongo_alert_rules):
+    """Change streams unsupported by the server switch the cache to polling."""
+    mongo_alert_rules.watch_alert_rules.side_effect = errors.OperationFailure("The $changeStream stage is only supported on replica sets")
+
+    with patch.object(cache, "_poll_forever") as poll_forever:
+        cache._run()
+
+    poll_forever.assert_called_once()
+
+
+def test_get_rules_for_series(cache):
+    """Rules are looked up by the series key they depend on and the index follows changes."""
+    cache.apply_change({"operationType": "insert", "documentKey": {"_id": "c"}, "fullDocument": make_document("c", host="server-2")})
+
+    rules = cache.get_rules_for_series(["moniflow:metrics:cpu_usage:host=server-1:usage", "moniflow:metrics:unknown:host=x:usage"])
+    assert sorted(rule.rule_id for rule in rules) == ["a", "b"]
+
+    cache.apply_change({"operationType": "delete", "documentKey": {"_id": "a"}})
+
+    rules = cache.get_rules_for_series(["moniflow:metrics:cpu_usage:host=server-1:usage", "moniflow:metrics:cpu_usage:host=server-2:usage"])
+    assert sorted(rule.rule_id for rule in rules) == ["b", "c"]
+
+
+def test_get_rules_for_series_selects_matcher_rules(cache):
+    """Rules with tag matchers are selected for any series of their measurement field."""
+    document = make_document("m")
+    document["tags"] = {}
+    document["tag_matchers"] = [{"tag": "host", "op": "wildcard", "value": "web-*"}]
+    cache.apply_change({"operationType": "insert", "documentKey": {"_id": "m"}, "fullDocument": document})
+
+    rules = cache.get_rules_for_series(["moniflow:metrics:cpu_usage:host=web-9:usage"])
+    assert [rule.rule_id for rule in rules] == ["m"]
+    assert cache.get_rules_for_series(["moniflow:metrics:cpu_usage:host=web-9:idle"]) == []
+
+
+def test_get_rules_in_shard(cache):
+    """Every rule belongs to exactly one shard and the split follows changes."""
+    ring = ShardRing(4)
+    shards = [cache.get_rules_in_shard(ring, shard) for shard in range(4)]
+    assert sorted(rule.rule_id for rules in shards for rule in rules) == ["a", "b"]
+
+    cache.apply_change({"operationType": "delete", "documentKey": {"_id": "a"}})
+
+    shards = [cache.get_rules_in_shard(ring, shard) for shard in range(4)]
+    assert sorted(rule.rule_id for rules in shards for rule in rules) == ["b"]
+
+
+def test_get_rules_by_ids_skips_deleted_rules(cache):
+    """Rules dispatched by the scheduler are looked up by ID, rules deleted since are dropped."""
+    cache.apply_change({"operationType": "delete", "documentKey": {"_id": "a"}})
+
+    assert [rule.rule_id for rule in cache.get_rules_by_ids(["a", "b", "broken"])] == ["b"]
@@ -7,6 +7,7 @@ from unittest.mock import patch
 from fastapi.testclient import TestClient
 from main import app
 from dao.redis.metrics import RedisMetrics
+from dao.redis.chunk_codec import ChunkCodec
 
 client = TestClient(app)
 
@@ -28,17 +29,50 @@ def test_store_metric_in_cache(mock_redis):
         "timestamp": "2025-02-26T12:00:00Z",
     }
 
+    # Convert timestamp to expected UNIX format
+    expected_timestamp = int(time.mktime(time.strptime(metric["timestamp"], "%Y-%m-%dT%H:%M:%SZ")))
+
     redis_metrics = RedisMetrics(mock_redis)
-    redis_metrics.store_metric_in_cache(metric)
+    with patch("dao.redis.metrics.time.time", return_value=expected_timestamp + 60):
+        redis_metrics.store_metric_in_cache(metric)
+    chunk_start = expected_timestamp - expected_timestamp % RedisMetrics.CHUNK_SECONDS
 
-    # Generate expected Redis key
-    redis_key = "moniflow:metrics:cpu:host=server-1:usage"
+    # Generate expected Redis chunk key
+    redis_key = f"moniflow:metrics:cpu:host=server-1:usage:chunk:{chunk_start}"
 
-    # Convert timestamp to expected UNIX format
-    expected_timestamp = int(time.mktime(time.strptime(metric["timestamp"], "%Y-%m-%dT%H:%M:%SZ")))
+    # Assert that the sample was appended on a non-transactional pipeline and sent once
+    mock_redis.pipeline.assert_called_once_with(transaction=False)
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.append.assert_called_once_with(redis_key, ChunkCodec.pack(chunk_start, [(expected_timestamp, 90.3)]))
+    pipeline.execute.assert_called_once()
+
+
+def test_store_metrics_in_cache_single_round_trip(mock_redis):
+    """Test that a batch of metrics with several fields is written in one pipeline."""
+    metrics = [
+        {
+            "measurement": "cpu",
+            "tags": {"host": f"server-{i}", "group": "alpha"},
+            "fields": {"usage": 90.3, "temperature": 60.0},
+            "timestamp": "2025-02-26T12:00:00Z",
+        }
+        for i in range(50)
+    ]
+
+    redis_metrics = RedisMetrics(mock_redis)
+    with patch("dao.redis.metrics.time.time", return_value=1740571260):
+        redis_metrics.store_metrics_in_cache(metrics)
+
+    pipeline = mock_redis.pipeline.return_value
+    mock_redis.pipeline.assert_called_once_with(transaction=False)
+    assert pipeline.append.call_count == 100  # one APPEND per series chunk
+    pipeline.execute.assert_called_once()
+    mock_redis.append.assert_not_called()
 
-    # Assert that Redis ZADD was called correctly
-    mock_redis.zadd.assert_called_once_with(redis_key, {90.3: expected_timestamp})
+    # Keys must match the ones used when reading metric values
+    keys = {call[0][0] for call in pipeline.append.call_args_list}
+    assert "moniflow:metrics:cpu:group=alpha,host=server-1:usage:chunk:1740571200" in keys
+    assert "moniflow:metrics:cpu:group=alpha,host=server-1:temperature:chunk:1740571200" in keys
 
 
 @pytest.mark.parametrize(
@@ -111,9 +145,10 @@ def test_store_metric_missing_timestamp(mock_redis):
     redis_metrics = RedisMetrics(mock_redis)
     redis_metrics.store_metric_in_cache(metric)
 
-    # Extract the stored timestamp argument passed to Redis
-    stored_metric = mock_redis.zadd.call_args[0][1]  # Extract timestamp from mock call
-    stored_timestamp = list(stored_metric.values())[0]  # Extract actual timestamp value
+    # Decode the stored sample from the appended chunk
+    chunk_key, data = mock_redis.pipeline.return_value.append.call_args[0]
+    chunk_start = int(chunk_key.rsplit(":", 1)[1])
+    stored_timestamp = ChunkCodec.unpack(chunk_start, data)[0][0]
 
     # Ensure timestamp is **recent** (max 5s drift)
     current_time = int(datetime.now().timestamp())
@@ -130,7 +165,7 @@ def test_store_metric_redis_failure():
         "timestamp": "2025-02-26T12:00:00Z",
     }
 
-    with patch("dao.redis.metrics.RedisMetrics.store_metric_in_cache", side_effect=redis.RedisError("Redis error")):
+    with patch("dao.redis.metrics.RedisMetrics.store_metrics_in_cache_async", side_effect=redis.RedisError("Redis error")):
         response = client.post("/metrics/", json=metric)
 
     assert response.status_code == 503
@@ -154,17 +189,17 @@ def test_store_multiple_metrics_in_cache():
         },
     ]
 
-    with unittest.mock.patch("dao.redis.metrics.RedisMetrics.store_metric_in_cache") as mock_store:
+    with unittest.mock.patch("dao.redis.metrics.RedisMetrics.store_metrics_in_cache_async") as mock_store:
         response = client.post("/metrics/", json=metrics)
 
         assert response.status_code == 200
         assert response.json() == {"message": "Metrics cached"}
 
-        # Ensure `store_metric_in_cache` was called twice (once per metric)
-        assert mock_store.call_count == 2
+        # Ensure `store_metrics_in_cache_async` was called once for the whole batch
+        assert mock_store.call_count == 1
 
         # Extract call arguments
-        calls = [call[0][0] for call in mock_store.call_args_list]
+        calls = mock_store.call_args[0][0]
 
         # Verify that both metrics were processed
         assert metrics[0] in calls
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from bson import ObjectId
+from pymongo import MongoClient
+from dao.mongo.mongo_alert_history import MongoAlertHistory
+
+
+@pytest.fixture
+def history():
+    history = MongoAlertHistory(MagicMock(spec=MongoClient), "moniflow_test")
+    history.collection, history.events = MagicMock(), MagicMock()
+    return history
+
+
+def make_event(timestamp, status="triggered", history_id=None):
+    """An event as `get_events` reads it, with `history_id` filled in."""
+    return {
+        "_id": ObjectId(),
+        "history_id": history_id or ObjectId(),
+        "timestamp": timestamp,
+        "meta": {"rule_id": "r1", "metric_name": "cpu_usage", "field_name": "usage", "tags": {"host": "server-1"}},
+        "status": status,
+    }
+
+
+def test_log_alerts_mirrors_into_time_series(history):
+    entry = MongoAlertHistory.build_alert_entry("r1", "cpu_usage", {"host": "server-1"}, "usage", "triggered")
+
+    history.log_alerts([entry])
+
+    history.collection.insert_many.assert_called_once_with([entry], ordered=False)
+    history.events.insert_many.assert_called_once_with([MongoAlertHistory.build_event(entry)], ordered=False)
+    assert MongoAlertHistory.build_event(entry)["meta"]["rule_id"] == "r1"
+    assert MongoAlertHistory.build_event({**entry, "_id": "h1"})["history_id"] == "h1"
+
+
+def test_build_event_filter():
+    start, end = datetime(2025, 3, 1), datetime(2025, 3, 31)
+
+    assert MongoAlertHistory.build_event_filter() == {}
+    assert MongoAlertHistory.build_event_filter("r1", "cpu_usage", "triggered", start, end) == {
+        "meta.rule_id": "r1",
+        "meta.metric_name": "cpu_usage",
+        "status": "triggered",
+        "timestamp": {"$gte": start, "$lt": end},
+    }
+
+
+def test_get_events_pages_by_timestamp_and_id(history):
+    """A full page returns a cursor that continues strictly after its last event."""
+    events = [make_event(datetime(2025, 3, 10, 12, 0, i)) for i in (3, 2, 1)]
+    history.events.aggregate.return_value = iter(events)
+
+    page = history.get_events({"meta.rule_id": "r1"}, limit=2)
+
+    assert [event["id"] for event in page["events"]] == [str(events[0]["history_id"]), str(events[1]["history_id"])]
+    assert page["events"][0]["rule_id"] == "r1"
+    pipeline = history.events.aggregate.call_args[0][0]
+    assert pipeline[3:] == [{"$sort": {"timestamp": -1, "history_id": -1}}, {"$limit": 3}]
+
+    history.events.aggregate.return_value = iter(events[2:])
+    last_page = history.get_events({"meta.rule_id": "r1"}, limit=2, cursor=page["next_cursor"])
+
+    assert last_page["next_cursor"] is None
+    pipeline = history.events.aggregate.call_args[0][0]
+    assert pipeline[0]["$match"]["$and"][1] == {"timestamp": {"$lte": events[1]["timestamp"]}}
+    assert pipeline[2]["$match"]["$or"] == [
+        {"timestamp": {"$lt": events[1]["timestamp"]}},
+        {"timestamp": events[1]["timestamp"], "history_id": {"$lt": events[1]["history_id"]}},
+    ]
+
+
+def test_get_events_returns_copies_of_an_event_once(history):
+    """Copies left by retried mirror writes are dropped, and the page is read again with a larger limit to stay full."""
+    timestamp = datetime(2025, 3, 10, 12, 0, 3)
+    first = make_event(timestamp)
+    copies = [first, make_event(timestamp, history_id=first["history_id"])]
+    rest = [make_event(datetime(2025, 3, 10, 12, 0, i)) for i in (2, 1)]
+    history.events.aggregate.side_effect = [iter(copies + rest[:1]), iter(copies + rest)]
+
+    page = history.get_events({}, limit=2)
+
+    assert [event["id"] for event in page["events"]] == [str(first["history_id"]), str(rest[0]["history_id"])]
+    assert page["next_cursor"] is not None
+    assert [call[0][0][-1] for call in history.events.aggregate.call_args_list] == [{"$limit": 3}, {"$limit": 6}]
+
+
+def test_get_events_rejects_bad_cursor(history):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        history.get_events({}, limit=10, cursor="not-a-cursor")
+
+
+def test_get_report_runs_one_aggregation(history):
+    """The report is one pipeline dropping copies of events, then pairing every trigger with the next event of its series."""
+    history.events.aggregate.return_value = iter([{"totals": [], "noisiest": []}])
+
+    report = history.get_report({"meta.rule_id": "r1"}, top=5)
+
+    assert report == {"totals": {"rules": 0, "firing_count": 0, "recovered_count": 0, "mttr_seconds": None}, "noisiest": []}
+    pipeline = history.events.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"meta.rule_id": "r1"}}
+    assert pipeline[1] == {"$group": {"_id": {"$ifNull": ["$history_id", "$_id"]}, "event": {"$first": "$$ROOT"}}}
+    assert pipeline[3]["$setWindowFields"]["partitionBy"] == {"rule_id": "$meta.rule_id", "tags": "$meta.tags"}
+    assert pipeline[-1]["$facet"]["noisiest"][1] == {"$limit": 5}
@@ -0,0 +1,176 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo import DeleteOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from dao.mongo.mongo_alert_rules import MongoAlertRule
+from main import app
+from models import AlertRuleCreate
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def alert_rules():
+    alert_rules = MongoAlertRule(MagicMock(spec=MongoClient), "moniflow_test")
+    alert_rules.collection = MagicMock()
+    return alert_rules
+
+
+def found(alert_rules, rules):
+    """Make the collection's `find().sort().limit()` chain return `rules`."""
+    alert_rules.collection.find.return_value.sort.return_value.limit.return_value = iter(rules)
+
+
+def test_get_alert_rule_ids_scans_the_id_index(alert_rules):
+    ids = [ObjectId(), ObjectId()]
+    alert_rules.collection.find.return_value.hint.return_value = iter({"_id": rule_id} for rule_id in ids)
+
+    assert alert_rules.get_alert_rule_ids() == {str(rule_id) for rule_id in ids}
+    alert_rules.collection.find.assert_called_once_with({}, {"_id": 1})
+    alert_rules.collection.find.return_value.hint.assert_called_once_with([("_id", 1)])
+
+
+def test_list_alert_rules_pages_by_id(alert_rules):
+    """A full page returns the last `_id` as cursor, the next page continues strictly after it."""
+    ids = [ObjectId() for _ in range(3)]
+    rules = [{"_id": rule_id, "metric_name": "cpu_usage"} for rule_id in ids]
+    found(alert_rules, rules)
+
+    page = alert_rules.list_alert_rules(limit=2)
+
+    assert [rule["_id"] for rule in page["alert_rules"]] == [str(ids[0]), str(ids[1])]
+    assert page["next_cursor"] == str(ids[1])
+    alert_rules.collection.find.return_value.sort.assert_called_once_with("_id", 1)
+    alert_rules.collection.find.return_value.sort.return_value.limit.assert_called_once_with(3)
+
+    found(alert_rules, rules[2:])
+    last_page = alert_rules.list_alert_rules(limit=2, cursor=page["next_cursor"])
+
+    assert alert_rules.collection.find.call_args[0][0] == {"_id": {"$gt": ids[1]}}
+    assert last_page["next_cursor"] is None
+
+
+def test_list_alert_rules_filters_and_projection(alert_rules):
+    found(alert_rules, [])
+
+    alert_rules.list_alert_rules(10, fields=["metric_name", "threshold"], metric_name="cpu_usage", tags={"host": "web-1"}, status="active")
+
+    alert_rules.collection.find.assert_called_once_with(
+        {"tags.host": "web-1", "metric_name": "cpu_usage", "status": "active"}, {"metric_name": 1, "threshold": 1}
+    )
+
+
+def test_list_alert_rules_invalid_cursor(alert_rules):
+    with pytest.raises(ValueError):
+        alert_rules.list_alert_rules(10, cursor="not-an-id")
+
+
+def make_rule_create(external_id, threshold=85.0):
+    return AlertRuleCreate(
+        external_id=external_id,
+        metric_name="cpu_usage",
+        tags={"host": "web-1"},
+        field_name="usage",
+        threshold=threshold,
+        duration_value=5,
+        duration_unit="minutes",
+        comparison=">",
+        use_recovery_alert=True,
+        recovery_time_value=1,
+        recovery_time_unit="minutes",
+    )
+
+
+def test_sync_alert_rules_applies_diff_in_one_bulk_write(alert_rules):
+    """New rules are upserted, changed ones updated, unchanged ones skipped, and with `prune` the others deleted."""
+    changed_id, unchanged_id, removed_id, created_id = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    alert_rules.collection.find.return_value = [
+        {"_id": changed_id, **MongoAlertRule.build_rule(**make_rule_create("changed").model_dump())},
+        {"_id": unchanged_id, **MongoAlertRule.build_rule(**make_rule_create("unchanged").model_dump())},
+        {"_id": removed_id, **MongoAlertRule.build_rule(**make_rule_create("removed").model_dump())},
+    ]
+    alert_rules.collection.bulk_write.return_value.upserted_ids = {0: created_id}
+    rules = {
+        "new": MongoAlertRule.build_rule(**make_rule_create("new").model_dump()),
+        "changed": MongoAlertRule.build_rule(**make_rule_create("changed", threshold=90.0).model_dump()),
+        "unchanged": MongoAlertRule.build_rule(**make_rule_create("unchanged").model_dump()),
+    }
+
+    results = alert_rules.sync_alert_rules(rules, prune=True)
+
+    assert results == {
+        "new": {"status": "created", "rule_id": str(created_id)},
+        "changed": {"status": "updated", "rule_id": str(changed_id)},
+        "unchanged": {"status": "unchanged", "rule_id": str(unchanged_id)},
+        "removed": {"status": "deleted", "rule_id": str(removed_id)},
+    }
+    operations = alert_rules.collection.bulk_write.call_args[0][0]
+    assert [type(operation) for operation in operations] == [UpdateOne, UpdateOne, DeleteOne]
+    assert operations[0]._filter == {"external_id": "new"} and operations[0]._upsert
+    assert operations[1]._doc["$set"]["threshold"] == 90.0
+    assert alert_rules.collection.bulk_write.call_args[1] == {"ordered": False}
+    assert alert_rules.collection.find.call_args[0][0] == {"external_id": {"$type": "string"}}
+
+
+def test_sync_alert_rules_reports_failed_writes(alert_rules):
+    alert_rules.collection.find.return_value = []
+    alert_rules.collection.bulk_write.side_effect = BulkWriteError(
+        {"writeErrors": [{"index": 1, "errmsg": "E11000 duplicate key"}], "upserted": [{"index": 0, "_id": "id-a"}]}
+    )
+    rules = {key: MongoAlertRule.build_rule(**make_rule_create(key).model_dump()) for key in ("a", "b")}
+
+    results = alert_rules.sync_alert_rules(rules)
+
+    assert results["a"] == {"status": "created", "rule_id": "id-a"}
+    assert results["b"] == {"status": "failed", "rule_id": None, "error": "E11000 duplicate key"}
+    assert alert_rules.collection.find.call_args[0][0] == {"external_id": {"$in": ["a", "b"]}}
+
+
+def test_export_round_trips_through_bulk_sync(alert_rules):
+    """An exported line rebuilds the stored rule exactly, so re-importing an export changes nothing."""
+    stored = MongoAlertRule.build_rule(**make_rule_create("cpu-high").model_dump())
+    alert_rules.collection.find.return_value.batch_size.return_value = [dict(stored), dict(stored)]
+
+    lines = "".join(alert_rules.export_alert_rules(batch_size=1)).splitlines()
+
+    assert len(lines) == 2
+    assert MongoAlertRule.build_rule(**AlertRuleCreate.model_validate(json.loads(lines[0])).model_dump()) == stored
+
+
+def test_export_of_rule_without_external_id_is_adopted_on_sync(alert_rules):
+    """A rule without an external ID is exported under its `_id`, and re-importing it updates that rule instead of creating one."""
+    rule_id = ObjectId()
+    stored = {"_id": rule_id, **MongoAlertRule.build_rule(**make_rule_create(None).model_dump())}
+    alert_rules.collection.find.return_value.batch_size.return_value = [dict(stored)]
+    line = json.loads("".join(alert_rules.export_alert_rules()))
+    assert line["external_id"] == str(rule_id)
+
+    alert_rules.collection.find.return_value = [stored]
+    rule = MongoAlertRule.build_rule(**AlertRuleCreate.model_validate(line).model_dump())
+    results = alert_rules.sync_alert_rules({line["external_id"]: rule}, prune=True)
+
+    assert results == {str(rule_id): {"status": "updated", "rule_id": str(rule_id)}}
+    operations = alert_rules.collection.bulk_write.call_args[0][0]
+    assert operations[0]._filter == {"_id": rule_id} and operations[0]._doc["$set"]["external_id"] == str(rule_id)
+    assert alert_rules.collection.find.call_args[0][0] == {
+        "$or": [{"external_id": {"$type": "string"}}, {"_id": {"$in": [rule_id]}, "external_id": None}]
+    }
+
+
+def test_bulk_endpoint_reports_invalid_items_and_skips_pruning():
+    with patch("main.mongo_alert_rules_client") as mongo_alert_rules, patch("main.collection_version") as collection_version:
+        mongo_alert_rules.sync_alert_rules.return_value = {"cpu-high": {"status": "created", "rule_id": "r1"}}
+        valid = make_rule_create("cpu-high").model_dump()
+
+        response = client.post("/alerts/bulk", json={"rules": [valid, {**valid, "threshold": "high"}, valid], "prune": True})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(result["index"], result["status"]) for result in results] == [(0, "created"), (1, "invalid"), (2, "invalid")]
+    assert results[2]["errors"] == ["duplicate external_id"]
+    assert response.json()["summary"] == {"created": 1, "invalid": 2}
+    assert mongo_alert_rules.sync_alert_rules.call_args[1] == {"prune": False}
+    collection_version.bump.assert_called_once_with("alert_rules")
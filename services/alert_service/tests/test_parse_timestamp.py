@@ -13,6 +13,16 @@ from dao.redis.metrics import RedisMetrics
         ("2025-02-26T14:00:00+02:00", 1740571200),  # UTC equivalent
         ("2025-02-26T10:00:00-02:00", 1740571200),  # UTC equivalent
         ("2025-02-26T09:30:00-02:30", 1740571200),  # UTC equivalent
+        # ISO 8601 forms outside the RFC 3339 fast path
+        ("2025-02-26T12:00Z", 1740571200),  # No seconds
+        ("2025-02-26T14:00:00+0200", 1740571200),  # Offset without colon
+        ("2025-02-26T24:00:00Z", 1740614400),  # Midnight at the end of the day
+        # Epoch timestamps with an explicit unit
+        ("1740571200s", 1740571200),
+        ("1740571200999ms", 1740571200),
+        ("1740571200123456us", 1740571200),
+        ("1740571200123456789ns", 1740571200),
+        ("253402300799s", 253402300799),  # 9999-12-31T23:59:59Z
     ],
 )
 def test_parse_timestamp_valid_formats(input_timestamp, expected_unix):
@@ -35,6 +45,14 @@ def test_parse_timestamp_valid_formats(input_timestamp, expected_unix):
         ("2025-02-26T25:00:00Z", "Invalid timestamp format"),  # Invalid hour
         ("2025-13-26T12:00:00Z", "Invalid timestamp format"),  # Invalid month
         ("2025-02-30T12:00:00Z", "Invalid timestamp format"),  # Invalid day
+        ("2025-02-26T12:00:00+02:60", "Invalid timestamp format"),  # Invalid offset minutes
+        # Epoch timestamps without a valid unit
+        ("1740571200", "Invalid timestamp format"),
+        ("1740571200h", "Invalid timestamp format"),
+        ("-1740571200s", "Invalid timestamp format"),
+        ("\u0661\u0667\u0664\u0660\u0665\u0667\u0661\u0662\u0660\u0660s", "Invalid timestamp format"),  # Non-ASCII digits
+        ("9999999999999999999s", "Invalid timestamp format"),  # Past year 9999
+        ("253402300800s", "Invalid timestamp format"),
         # Wrong types
         (None, "Invalid timestamp format"),
         ({}, "Invalid timestamp format"),
@@ -0,0 +1,54 @@
+import math
+from prometheus_exporter import format_labels, histogram, metric, render_metrics
+
+
+def test_format_labels_escapes_values():
+    assert format_labels({}) == ""
+    assert format_labels({"series": 'cpu {host="a\\b"}'}) == '{series="cpu {host=\\"a\\\\b\\"}"}'
+
+
+def test_histogram_sorts_buckets_numerically():
+    lines = histogram("latency_seconds", "Latency.", [({"phase": "fetch"}, {"buckets": {"+Inf": 3, "10": 2, "2.5": 1}, "sum": 12.5, "count": 3})])
+
+    assert lines == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{phase="fetch",le="2.5"} 1',
+        'latency_seconds_bucket{phase="fetch",le="10"} 2',
+        'latency_seconds_bucket{phase="fetch",le="+Inf"} 3',
+        'latency_seconds_sum{phase="fetch"} 12.5',
+        'latency_seconds_count{phase="fetch"} 3',
+    ]
+
+
+def test_metric_renders_infinite_values():
+    assert metric("age_seconds", "gauge", "Age.", [({}, math.inf)])[-1] == "age_seconds +Inf"
+
+
+def test_render_metrics():
+    evaluation = {
+        "histograms": {"sample_age": {"all": {"buckets": {"60": 1, "+Inf": 2}, "sum": 30.0, "count": 2}}},
+        "slow_rules": [("rule-1", 0.25)],
+        "stale_series": [("cpu.usage {host=a}", 1e12)],
+    }
+    notifications = {
+        "queued": 4,
+        "retrying": 1,
+        "dead": 0,
+        "channels": {"email": {"delivered": 3, "retried": 1, "dead": 0, "latency_sum": 1.5, "latency_buckets": {"1": 2, "+Inf": 3}}},
+    }
+    tasks = {"alert_service.fetch_alert_rules": {"runs": 5, "skipped": 1, "merged": 0, "lag": 2.0, "max_lag": 4.5}}
+
+    body = render_metrics(evaluation, notifications, tasks)
+
+    assert body.endswith("\n")
+    lines = body.splitlines()
+    assert 'moniflow_eval_sample_age_seconds_bucket{le="60"} 1' in lines
+    assert 'moniflow_eval_slowest_rule_seconds{rule="rule-1"} 0.25' in lines
+    assert 'moniflow_eval_stalest_series_age_seconds{series="cpu.usage {host=a}"} +Inf' in lines
+    assert 'moniflow_notification_delay_seconds_count{channel="email"} 3' in lines
+    assert 'moniflow_notifications_total{channel="email",result="retried"} 1' in lines
+    assert 'moniflow_notification_backlog{state="queued"} 4' in lines
+    assert 'moniflow_task_schedule_lag_seconds{task="alert_service.fetch_alert_rules"} 2.0' in lines
+    assert 'moniflow_task_runs_total{task="alert_service.fetch_alert_rules"} 5' in lines
+    assert not any(line.startswith("moniflow_task_duration_seconds{") for line in lines)
@@ -0,0 +1,102 @@
+import json
+import pytest
+import redis
+from unittest.mock import MagicMock
+from dao.redis.alert_groups import RedisAlertGroups
+from dao.redis.notification_queue import RedisNotificationQueue
+from models import AlertRuleSchema
+
+
+def make_rule(host, group_by=None, recipients=None):
+    return AlertRuleSchema(
+        _id=f"rule-{host}",
+        metric_name="cpu_usage",
+        tags={"host": host},
+        field_name="usage",
+        threshold=85.0,
+        duration=60,
+        comparison=">",
+        notification_channels=["telegram"],
+        recipients=recipients or {},
+        use_recovery_alert=True,
+        group_by=group_by,
+    )
+
+
+def make_alert(host, status="triggered", notify=True, recipients=None, at=1000):
+    return {
+        "rule_id": f"rule-{host}",
+        "status": status,
+        "message": f"{host} {status}\nsince {at}",
+        "notify": notify,
+        "channels": ["telegram"],
+        "recipients": recipients or {},
+        "at": at,
+    }
+
+
+@pytest.fixture
+def groups():
+    return RedisAlertGroups(MagicMock(spec=redis.Redis), group_by=["metric_name"], group_wait=30)
+
+
+def test_group_key_uses_rule_labels(groups):
+    """Rules group by the default labels unless they set their own; tags are labels too."""
+    assert groups.group_key(make_rule("web-1")) == "metric_name=cpu_usage"
+    assert groups.group_key(make_rule("web-1", group_by=["metric_name", "host"])) == "host=web-1,metric_name=cpu_usage"
+    assert groups.group_key(make_rule("web-1", group_by=["region"])) == "region="
+
+
+def test_queue_alert_starts_group_wait_once(groups):
+    """An alert marks its group changed; only the first alert of a group schedules it, `group_wait` later."""
+    pipeline = MagicMock()
+
+    groups.queue_alert(pipeline, make_rule("web-1"), "rule-web-1", "triggered", "CPU high", True, 1000)
+
+    (key,), kwargs = pipeline.hset.call_args
+    assert key == "moniflow:alert_group:metric_name=cpu_usage"
+    assert json.loads(kwargs["mapping"]["rule-web-1"])["status"] == "triggered"
+    assert kwargs["mapping"]["__changed__"] == 1
+    pipeline.zadd.assert_called_once_with("moniflow:alert_groups:due", {"metric_name=cpu_usage": 1030}, nx=True)
+
+
+def test_flush_due_queues_one_digest_per_group(groups):
+    redis_client = groups.redis_client
+    redis_client.zrangebyscore.return_value = ["metric_name=cpu_usage", "metric_name=mem_usage"]
+    flush = redis_client.register_script.return_value
+    flush.side_effect = [[json.dumps(make_alert("web-1")), json.dumps(make_alert("web-2"))], []]  # The second group has nothing new
+    queue = RedisNotificationQueue(redis_client)
+
+    assert groups.flush_due(queue, 1030) == 1
+
+    flush.assert_any_call(
+        keys=["moniflow:alert_group:metric_name=cpu_usage", "moniflow:alert_groups:due"],
+        args=["metric_name=cpu_usage", 1030, groups.group_interval, groups.repeat_interval],
+    )
+    (stream_key, fields), _ = redis_client.pipeline.return_value.xadd.call_args
+    digest = json.loads(fields["data"])
+    assert (digest["rule_id"], digest["status"], digest["channel"]) == ("metric_name=cpu_usage", "digest", "telegram")
+    assert digest["message"].startswith("[metric_name=cpu_usage]\n🚨 FIRING: 2\n- web-1 triggered | since 1000")
+
+
+def test_build_digests_per_recipient(groups):
+    """Each recipient gets the alerts addressed to it; recoveries a rule does not notify are left out."""
+    alerts = [
+        make_alert("web-1", recipients={"telegram": ["@ops"]}),
+        make_alert("web-2", recipients={"telegram": ["@ops", "@dba"]}),
+        make_alert("web-3", status="recovered", notify=False, recipients={"telegram": ["@dba"]}),
+    ]
+
+    digests = groups.build_digests("metric_name=cpu_usage", alerts, 1030)
+
+    assert [(d["recipient"], d["message"].count("\n- ")) for d in digests] == [("@ops", 2), ("@dba", 1)]
+
+
+def test_format_digest_truncates_long_groups(groups):
+    groups.MAX_DIGEST_ALERTS = 2
+    alerts = [make_alert(f"web-{i}", at=1000 + i) for i in range(5)] + [make_alert("db-1", status="recovered")]
+
+    message = groups.format_digest("metric_name=cpu_usage", alerts)
+
+    assert "🚨 FIRING: 5\n- web-0 triggered | since 1000\n- web-1 triggered | since 1001\n... and 3 more" in message
+    assert message.endswith("✅ RESOLVED: 1\n- db-1 recovered | since 1000")
@@ -0,0 +1,93 @@
+import pytest
+import fakeredis
+import redis
+from unittest.mock import MagicMock
+from dao.redis.alert_state import RedisAlertState
+
+
+@pytest.fixture
+def alert_state():
+    return RedisAlertState(MagicMock(spec=redis.Redis))
+
+
+def test_transition_many_is_one_script_call(alert_state):
+    """Every rule's transition is taken by one call of the script, with four arguments per rule."""
+    script = alert_state.redis_client.register_script.return_value
+    script.return_value = ["triggered", ""]
+
+    transitions = alert_state.transition_many([("r1", True, True, 0, 620), ("r2:host=web-1", True, False, 300, 920)], 1000)
+
+    assert transitions == ["triggered", ""]
+    script.assert_called_once_with(
+        keys=["moniflow:alert_fsm:r1", "moniflow:alert_fsm:r2:host=web-1"],
+        args=[1000, 1, 1, 0, 620, 1, 0, 300, 920],
+    )
+
+
+def test_transition_many_without_changes_skips_redis(alert_state):
+    assert alert_state.transition_many([], 1000) == []
+    alert_state.redis_client.register_script.return_value.assert_not_called()
+
+
+def test_get_alert_state_defaults_to_ok(alert_state):
+    """A rule without a state hash is ok."""
+    alert_state.redis_client.hget.return_value = None
+    assert alert_state.get_alert_state("r1") == "ok"
+
+    alert_state.redis_client.hget.return_value = "recovering"
+    assert alert_state.get_alert_state("r1") == "recovering"
+    alert_state.redis_client.hget.assert_called_with("moniflow:alert_fsm:r1", "state")
+
+
+@pytest.fixture
+def fsm():
+    """An alert state store whose transition script runs on fakeredis' Lua interpreter."""
+    return RedisAlertState(fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_pending_fires_after_duration_then_recovers_after_hold(fsm):
+    assert fsm.transition("r1", breaching=True, triggered=False, current_time=1000, recovery_hold=60) == "pending"
+    assert fsm.transition("r1", breaching=True, triggered=False, current_time=1010, recovery_hold=60) == ""
+    assert fsm.transition("r1", breaching=True, triggered=True, current_time=1020, recovery_hold=60) == "triggered"
+    assert fsm.get_alert_state("r1") == "firing"
+
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1030, recovery_hold=60) == "recovering"
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1089, recovery_hold=60) == ""
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1090, recovery_hold=60) == "recovered"
+    assert fsm.get_alert_state("r1") == "ok"
+    assert not fsm.redis_client.exists("moniflow:alert_fsm:r1")
+
+
+def test_recovery_without_hold_is_immediate(fsm):
+    """Without a recovery alert (no hold), a firing rule goes straight back to ok."""
+    fsm.transition("r1", breaching=True, triggered=True, current_time=1000)
+
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1010) == "recovered"
+    assert fsm.get_alert_state("r1") == "ok"
+
+
+def test_pending_clears_when_the_condition_stops(fsm):
+    fsm.transition("r1", breaching=True, triggered=False, current_time=1000)
+
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1010) == "cleared"
+    assert fsm.get_alert_state("r1") == "ok"
+
+
+def test_flap_back_while_recovering_resumes_without_a_new_trigger(fsm):
+    """A rule firing again before its hold is over resumes firing, and its hold restarts from the next recovery."""
+    fsm.transition("r1", breaching=True, triggered=True, current_time=1000, recovery_hold=60)
+    fsm.transition("r1", breaching=False, triggered=False, current_time=1010, recovery_hold=60)
+
+    assert fsm.transition("r1", breaching=True, triggered=True, current_time=1020, recovery_hold=60) == "resumed"
+    assert fsm.get_alert_state("r1") == "firing"
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1030, recovery_hold=60) == "recovering"
+    assert fsm.transition("r1", breaching=False, triggered=False, current_time=1075, recovery_hold=60) == ""
+
+
+def test_transition_many_takes_each_rule_independently_and_sets_ttl(fsm):
+    transitions = fsm.transition_many([("r1", True, True, 0, 620), ("r2", True, False, 300, 920), ("r3", False, False, 0, 60)], 1000)
+
+    assert transitions == ["triggered", "pending", ""]
+    assert fsm.redis_client.hgetall("moniflow:alert_fsm:r2") == {"state": "pending", "since": "1000"}
+    assert 0 < fsm.redis_client.ttl("moniflow:alert_fsm:r1") <= 620
+    assert not fsm.redis_client.exists("moniflow:alert_fsm:r3")
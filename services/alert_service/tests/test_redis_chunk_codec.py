@@ -0,0 +1,69 @@
+import pytest
+from dao.redis.chunk_codec import ChunkCodec
+
+
+@pytest.mark.parametrize(
+    "timestamp, chunk_seconds, expected_start",
+    [
+        (1740571200, 600, 1740571200),  # Exactly on a chunk boundary
+        (1740571799, 600, 1740571200),  # Last second of the chunk
+        (1740571800, 600, 1740571800),  # First second of the next chunk
+        (1740571234, 60, 1740571200),
+    ],
+)
+def test_chunk_start(timestamp, chunk_seconds, expected_start):
+    """Test that timestamps are mapped to the start of their chunk."""
+    assert ChunkCodec.chunk_start(timestamp, chunk_seconds) == expected_start
+
+
+def test_chunk_starts_cover_window():
+    """Every chunk overlapping the window is returned, including partially covered ones."""
+    assert ChunkCodec.chunk_starts(1740571250, 1740572400, 600) == [1740571200, 1740571800, 1740572400]
+
+
+def test_pack_unpack_roundtrip():
+    """Raw records decode back to the original samples in storage order."""
+    samples = [(1740571205, 90.3), (1740571200, -1.5), (1740571799, 1e300)]
+    data = ChunkCodec.pack(1740571200, samples)
+
+    assert len(data) == 3 * ChunkCodec.RECORD.size
+    assert ChunkCodec.unpack(1740571200, data) == samples
+    assert ChunkCodec.sample_count(data) == 3
+
+
+def test_unpack_empty_and_truncated_chunks():
+    """Empty chunks decode to nothing and a truncated trailing record is ignored."""
+    data = ChunkCodec.pack(0, [(1, 1.0), (2, 2.0)])
+
+    assert ChunkCodec.unpack(0, b"") == []
+    assert ChunkCodec.unpack(0, data[:-3]) == [(1, 1.0)]
+
+
+def test_compress_roundtrip_sorts_samples():
+    """Compressed chunks decode to the same samples, sorted by timestamp."""
+    samples = [(10, 50.0), (0, 50.0), (5, 50.5), (599, float("inf"))]
+    data = ChunkCodec.pack(0, samples)
+
+    compressed = ChunkCodec.compress(0, data)
+
+    assert ChunkCodec.is_compressed(compressed)
+    assert ChunkCodec.unpack(0, compressed) == sorted(samples)
+    assert ChunkCodec.sample_count(compressed) == 4
+
+
+def test_compressed_chunk_accepts_late_samples():
+    """Records appended after compaction are decoded after the compressed block."""
+    compressed = ChunkCodec.compress(0, ChunkCodec.pack(0, [(1, 1.0), (2, 2.0)]))
+    data = compressed + ChunkCodec.pack(0, [(3, 3.0)])
+
+    assert ChunkCodec.unpack(0, data) == [(1, 1.0), (2, 2.0), (3, 3.0)]
+    assert ChunkCodec.sample_count(data) == 3
+    assert ChunkCodec.sample_count(data[: ChunkCodec.HEADER.size], len(data)) == 3
+    assert ChunkCodec.unpack(0, ChunkCodec.compress(0, data)) == [(1, 1.0), (2, 2.0), (3, 3.0)]
+
+
+def test_compression_shrinks_steady_series():
+    """A steady series compresses far below its raw size."""
+    data = ChunkCodec.pack(0, [(i * 10, 50.0 + (i % 4) * 0.5) for i in range(60)])
+
+    assert len(ChunkCodec.compress(0, data)) * 5 < len(data)
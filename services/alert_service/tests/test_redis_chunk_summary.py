@@ -0,0 +1,46 @@
+import math
+import random
+import pytest
+from dao.redis.chunk_summary import ChunkSummary
+
+
+def test_from_samples_tracks_moments_and_edges():
+    """Count, sum, extremes and first/last samples by timestamp, regardless of arrival order."""
+    summary = ChunkSummary.from_samples([(20, 5.0), (10, 1.0), (30, -2.0), (25, math.nan), (26, math.inf)])
+
+    assert (summary.count, summary.sum, summary.min, summary.max) == (3, 4.0, -2.0, 5.0)
+    assert (summary.first_ts, summary.first, summary.last_ts, summary.last) == (10, 1.0, 30, -2.0)
+
+
+def test_merge_equals_summary_of_all_samples():
+    samples = [(i, float(i % 7) - 3) for i in range(100)]
+
+    merged = ChunkSummary.from_samples(samples[50:]).merge(ChunkSummary.from_samples(samples[:50]))
+
+    assert vars(merged) == vars(ChunkSummary.from_samples(samples))
+
+
+def test_json_round_trip():
+    summary = ChunkSummary.from_samples([(1, 0.0), (2, -1.5), (3, 1e6)])
+
+    assert vars(ChunkSummary.from_json(summary.to_json())) == vars(summary)
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_quantile_within_relative_accuracy(q):
+    """Sketch quantiles are within the relative accuracy of the exact sample quantile."""
+    random.seed(7)
+    values = sorted(random.lognormvariate(5, 1) for _ in range(5000))
+    summary = ChunkSummary.from_samples(enumerate(values))
+
+    exact = values[round(q * (len(values) - 1))]
+    assert summary.quantile(q) == pytest.approx(exact, rel=ChunkSummary.RELATIVE_ACCURACY)
+
+
+def test_quantile_handles_negative_zero_and_empty():
+    summary = ChunkSummary.from_samples([(1, -10.0), (2, 0.0), (3, 10.0)])
+
+    assert summary.quantile(0.0) == -10.0
+    assert summary.quantile(0.5) == 0.0
+    assert summary.quantile(1.0) == 10.0
+    assert ChunkSummary().quantile(0.5) is None
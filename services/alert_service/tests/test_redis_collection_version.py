@@ -0,0 +1,64 @@
+import pytest
+import redis
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from dao.redis.collection_version import RedisCollectionVersion
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def collection_version():
+    return RedisCollectionVersion(MagicMock(spec=redis.Redis))
+
+
+def test_get_starts_missing_counter_at_current_time(collection_version):
+    pipeline = collection_version.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [True, "1740571230000"]
+
+    with patch("dao.redis.collection_version.time.time", return_value=1740571230.0):
+        assert collection_version.get("alert_rules") == 1740571230000
+
+    pipeline.set.assert_called_once_with("moniflow:collection_version:alert_rules", 1740571230000, nx=True)
+    pipeline.get.assert_called_once_with("moniflow:collection_version:alert_rules")
+
+
+def test_bump_increments_counter(collection_version):
+    pipeline = collection_version.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [None, 1740571230001]
+
+    assert collection_version.bump("alert_rules") == 1740571230001
+    pipeline.incr.assert_called_once_with("moniflow:collection_version:alert_rules")
+
+
+def test_etag_depends_on_version_and_params():
+    assert RedisCollectionVersion.etag(1, 100, None) == RedisCollectionVersion.etag(1, 100, None)
+    assert RedisCollectionVersion.etag(1, 100, None) != RedisCollectionVersion.etag(2, 100, None)
+    assert RedisCollectionVersion.etag(1, 100, None) != RedisCollectionVersion.etag(1, 50, None)
+
+
+def test_unchanged_alert_rules_listing_is_not_modified():
+    """A matching If-None-Match gets a 304 without querying MongoDB."""
+    with patch("main.collection_version") as version, patch("main.mongo_alert_rules_client") as alert_rules:
+        version.get.return_value = 7
+        alert_rules.list_alert_rules.return_value = {"alert_rules": [{"_id": "r1", "metric_name": "cpu_usage"}], "next_cursor": None}
+
+        response = client.get("/alerts/", params={"metric_name": "cpu_usage", "tag": "host=web-1"})
+        assert response.status_code == 200
+        assert response.json()["alert_rules"] == [{"_id": "r1", "metric_name": "cpu_usage"}]
+        alert_rules.list_alert_rules.assert_called_once_with(100, None, None, "cpu_usage", {"host": "web-1"}, None)
+
+        etag = response.headers["ETag"]
+        response = client.get("/alerts/", params={"metric_name": "cpu_usage", "tag": "host=web-1"}, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert alert_rules.list_alert_rules.call_count == 1
+
+        version.get.return_value = 8
+        response = client.get("/alerts/", params={"metric_name": "cpu_usage", "tag": "host=web-1"}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+
+def test_alert_rules_listing_rejects_malformed_tag_filter():
+    with patch("main.collection_version"), patch("main.mongo_alert_rules_client"):
+        assert client.get("/alerts/", params={"tag": "host"}).status_code == 400
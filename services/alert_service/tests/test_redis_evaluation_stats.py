@@ -0,0 +1,87 @@
+import math
+import pytest
+import redis
+from unittest.mock import MagicMock
+from dao.redis.evaluation_stats import RedisEvaluationStats
+
+NOW = 1740571230  # window 29009520
+
+
+@pytest.fixture
+def evaluation_stats():
+    redis_client = MagicMock(spec=redis.Redis)
+    return RedisEvaluationStats(redis_client)
+
+
+def test_observe_counts_cumulative_buckets(evaluation_stats):
+    evaluation_stats.observe("phase_duration", "fetch", 0.02)
+    evaluation_stats.observe("phase_duration", "fetch", 3)
+
+    counts = evaluation_stats._counts
+    assert "phase_duration:fetch:0.01" not in counts
+    assert counts["phase_duration:fetch:0.025"] == 1
+    assert counts["phase_duration:fetch:5"] == 2
+    assert counts["phase_duration:fetch:+Inf"] == 2
+    assert counts["phase_duration:fetch:count"] == 2
+    assert counts["phase_duration:fetch:sum"] == pytest.approx(3.02)
+
+
+def test_missing_samples_count_as_infinitely_old(evaluation_stats):
+    """A series without samples lands in the +Inf bucket only and does not skew the sum."""
+    evaluation_stats.record_sample_age("cpu_usage.usage {host=a}", None)
+
+    counts = evaluation_stats._counts
+    assert counts == {"sample_age:all:+Inf": 1, "sample_age:all:count": 1}
+    assert evaluation_stats._top["stale_series"] == {"cpu_usage.usage {host=a}": math.inf}
+
+
+def test_flush_adds_everything_in_one_pipeline(evaluation_stats):
+    pipeline = evaluation_stats.redis_client.pipeline.return_value
+    evaluation_stats.observe("tick_duration", "shard", 0.2)
+    evaluation_stats.record_rule("rule-1", 0.004)
+    evaluation_stats.record_rule("rule-1", 0.001)
+    evaluation_stats.record_sample_age("cpu", None)
+
+    evaluation_stats.flush(NOW)
+
+    pipeline.hincrby.assert_any_call("moniflow:evaluation_stats", "tick_duration:shard:0.25", 1)
+    pipeline.hincrbyfloat.assert_any_call("moniflow:evaluation_stats", "tick_duration:shard:sum", 0.2)
+    # The highest time per rule is kept, and only raises the score already stored
+    pipeline.zadd.assert_any_call("moniflow:evaluation_top:slow_rules:29009520", {"rule-1": 0.004}, gt=True)
+    pipeline.zadd.assert_any_call("moniflow:evaluation_top:stale_series:29009520", {"cpu": 1e12}, gt=True)
+    pipeline.zremrangebyrank.assert_any_call("moniflow:evaluation_top:slow_rules:29009520", 0, -11)
+    pipeline.expire.assert_any_call("moniflow:evaluation_top:slow_rules:29009520", 120)
+    pipeline.execute.assert_called_once()
+    assert evaluation_stats._counts == {}
+
+    evaluation_stats.flush(NOW)
+    pipeline.execute.assert_called_once()
+
+
+def test_flush_redis_error_drops_values(evaluation_stats):
+    pipeline = evaluation_stats.redis_client.pipeline.return_value
+    pipeline.execute.side_effect = redis.RedisError("down")
+    evaluation_stats.observe("tick_duration", "dirty", 0.1)
+
+    evaluation_stats.flush(NOW)
+
+    assert evaluation_stats._counts == {}
+
+
+def test_get_stats_parses_histograms_and_merges_windows(evaluation_stats):
+    pipeline = evaluation_stats.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [
+        {"phase_duration:fetch:0.025": "1", "phase_duration:fetch:+Inf": "2", "phase_duration:fetch:count": "2", "phase_duration:fetch:sum": "3.02"},
+        [("rule-1", 0.5)],
+        [("rule-1", 0.9), ("rule-2", 0.2)],
+        [],
+        [("cpu", 1e12)],
+    ]
+
+    stats = evaluation_stats.get_stats(NOW)
+
+    assert stats["histograms"] == {"phase_duration": {"fetch": {"buckets": {"0.025": 1, "+Inf": 2}, "sum": 3.02, "count": 2}}}
+    assert stats["slow_rules"] == [("rule-1", 0.5), ("rule-2", 0.2)]
+    assert stats["stale_series"] == [("cpu", 1e12)]
+    pipeline.zrevrange.assert_any_call("moniflow:evaluation_top:slow_rules:29009520", 0, 9, withscores=True)
+    pipeline.zrevrange.assert_any_call("moniflow:evaluation_top:slow_rules:29009519", 0, 9, withscores=True)
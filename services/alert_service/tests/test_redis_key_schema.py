@@ -40,36 +40,77 @@ def test_build_redis_metric_key(metric_name, tags, field_name, expected_key):
 
 
 @pytest.mark.parametrize(
-    "rule_id, expected_key",
+    "state_id, expected_key",
     [
         # Basic rule ID
-        ("rule123", "moniflow:alert_state:rule123"),
+        ("rule123", "moniflow:alert_fsm:rule123"),
         # Rule ID with special characters
-        ("alert/cpu-high#2", "moniflow:alert_state:alert/cpu-high#2"),
-        # Long rule ID
-        ("a" * 100, f"moniflow:alert_state:{'a' * 100}"),
+        ("alert/cpu-high#2", "moniflow:alert_fsm:alert/cpu-high#2"),
+        # Rule ID qualified by series tags
+        ("rule123:host=web-1,region=eu", "moniflow:alert_fsm:rule123:host=web-1,region=eu"),
         # Empty rule ID
-        ("", "moniflow:alert_state:"),
+        ("", "moniflow:alert_fsm:"),
     ],
 )
-def test_build_alert_state_key(rule_id, expected_key):
-    """Test alert state key generation for various rule IDs."""
-    assert KeySchema.build_alert_state_key(rule_id) == expected_key
+def test_build_alert_fsm_key(state_id, expected_key):
+    """Test alert state machine key generation for various state IDs."""
+    assert KeySchema.build_alert_fsm_key(state_id) == expected_key
 
 
 @pytest.mark.parametrize(
-    "rule_id, expected_key",
+    "series_key, chunk_start, expected_key",
     [
-        # Basic rule ID
-        ("rule123", "moniflow:recovery_state:rule123"),
-        # Rule ID with special characters
-        ("recovery/mem-low#2", "moniflow:recovery_state:recovery/mem-low#2"),
-        # Long rule ID
-        ("b" * 100, f"moniflow:recovery_state:{'b' * 100}"),
-        # Empty rule ID
-        ("", "moniflow:recovery_state:"),
+        ("moniflow:metrics:cpu_usage:host=server-1:usage", 1740571200, "moniflow:metrics:cpu_usage:host=server-1:usage:chunk:1740571200"),
+        ("moniflow:metrics:cpu_usage:group=alpha,host=server-1:usage", 0, "moniflow:metrics:cpu_usage:group=alpha,host=server-1:usage:chunk:0"),
     ],
 )
-def test_build_recovery_state_key(rule_id, expected_key):
-    """Test recovery state key generation for various rule IDs."""
-    assert KeySchema.build_recovery_state_key(rule_id) == expected_key
+def test_build_metric_chunk_key(series_key, chunk_start, expected_key):
+    """Test metric chunk key generation."""
+    assert KeySchema.build_metric_chunk_key(series_key, chunk_start) == expected_key
+
+
+def test_build_metric_summary_key():
+    """Test metric chunk summary key generation."""
+    assert (
+        KeySchema.build_metric_summary_key("moniflow:metrics:cpu_usage:host=server-1:usage", 1740571200)
+        == "moniflow:metrics:cpu_usage:host=server-1:usage:summary:1740571200"
+    )
+
+
+def test_build_tag_index_keys():
+    """Test series index key generation."""
+    assert KeySchema.build_tag_index_key("cpu_usage", "host", "web-1") == "moniflow:index:cpu_usage:host=web-1"
+    assert KeySchema.build_tag_values_key("cpu_usage", "host") == "moniflow:tag_values:cpu_usage:host"
+    assert KeySchema.build_series_labels_key() == "moniflow:series_labels"
+
+
+def test_build_notification_keys():
+    """Test notification queue key generation."""
+    assert KeySchema.build_notification_stream_key() == "moniflow:notifications"
+    assert KeySchema.build_notification_retry_key() == "moniflow:notifications:retry"
+    assert KeySchema.build_notification_dead_key() == "moniflow:notifications:dead"
+    assert KeySchema.build_notification_stats_key() == "moniflow:notification_stats"
+
+
+def test_build_alert_group_keys():
+    """Test alert group key generation."""
+    assert KeySchema.build_alert_group_key("host=web-1,metric_name=cpu_usage") == "moniflow:alert_group:host=web-1,metric_name=cpu_usage"
+    assert KeySchema.build_alert_groups_due_key() == "moniflow:alert_groups:due"
+
+
+def test_build_task_lock_keys():
+    """Test periodic task lock, fence and schedule key generation."""
+    assert KeySchema.build_task_lock_key("alert_service.fetch_alert_rules") == "moniflow:task_lock:alert_service.fetch_alert_rules"
+    assert KeySchema.build_task_fence_key("alert_service.fetch_alert_rules") == "moniflow:task_fence:alert_service.fetch_alert_rules"
+    assert KeySchema.build_task_schedule_key() == "moniflow:task_schedule"
+
+
+def test_build_evaluation_stats_keys():
+    """Test evaluation histogram and top-N key generation."""
+    assert KeySchema.build_evaluation_stats_key() == "moniflow:evaluation_stats"
+    assert KeySchema.build_evaluation_top_key("slow_rules", 29009520) == "moniflow:evaluation_top:slow_rules:29009520"
+
+
+def test_build_collection_version_key():
+    """Test MongoDB collection version counter key generation."""
+    assert KeySchema.build_collection_version_key("alert_rules") == "moniflow:collection_version:alert_rules"
@@ -1,8 +1,16 @@
+import asyncio
+import time
+import fakeredis
 import pytest
 import redis
-from unittest.mock import MagicMock
+import redis.asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from redis.client import NEVER_DECODE
 from dao.redis.metrics import RedisMetrics
 from dao.redis.key_schema import KeySchema
+from dao.redis.chunk_codec import ChunkCodec
+from dao.redis.chunk_summary import ChunkSummary
 
 
 @pytest.fixture
@@ -33,14 +41,20 @@ def redis_metrics(mock_redis, mock_key_schema):
 def test_get_metric_values_valid_inputs(redis_metrics, metric_name, tags, field_name, duration):
     """Test that valid inputs query Redis properly."""
     mock_redis_key = f"moniflow:metrics:{metric_name}:{tags}:{field_name}"
+    current_time = 1740571230
+    chunk_start = 1740571200
 
-    # Mock Redis response
-    redis_metrics.redis_client.zrangebyscore.return_value = ["10.5", "20.1", "30.7"]
+    # Mock Redis response: the window only overlaps the current chunk
+    redis_metrics.redis_client.execute_command.return_value = [
+        ChunkCodec.pack(chunk_start, [(current_time - 9, 10.5), (current_time - 5, 20.1), (current_time, 30.7)])
+    ]
 
     # Mock key generation
     redis_metrics.key_schema.build_redis_metric_key.return_value = mock_redis_key
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
 
-    values = redis_metrics.get_metric_values(metric_name, tags, field_name, duration)
+    with patch("dao.redis.metrics.time.time", return_value=current_time):
+        values = redis_metrics.get_metric_values(metric_name, tags, field_name, 10)
 
     assert isinstance(values, list)
     assert values == [10.5, 20.1, 30.7]
@@ -49,7 +63,31 @@ def test_get_metric_values_valid_inputs(redis_metrics, metric_name, tags, field_
     redis_metrics.key_schema.build_redis_metric_key.assert_called_once_with(metric_name, tags, field_name)
 
     # Ensure Redis query was made using the generated key
-    redis_metrics.redis_client.zrangebyscore.assert_called_once()
+    redis_metrics.redis_client.execute_command.assert_called_once()
+    assert redis_metrics.redis_client.execute_command.call_args[0] == ("MGET", f"{mock_redis_key}:chunk:{chunk_start}")
+
+
+def test_get_metric_values_reads_only_overlapping_chunks(redis_metrics):
+    """Only chunks overlapping the window are fetched and samples outside the window are dropped."""
+    redis_metrics.key_schema.build_redis_metric_key.return_value = "series"
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
+    current_time = 1740571200 + 1500
+    redis_metrics.redis_client.execute_command.return_value = [
+        ChunkCodec.pack(1740571200, [(1740571200, 1.0), (1740571200 + 599, 2.0)]),
+        None,
+        ChunkCodec.pack(1740572400, [(1740572400 + 100, 4.0), (1740572400 + 50, 3.0)]),
+    ]
+
+    with patch("dao.redis.metrics.time.time", return_value=current_time):
+        samples = redis_metrics.get_metric_samples("cpu", {"host": "server-1"}, "usage", 1000)
+
+    assert redis_metrics.redis_client.execute_command.call_args[0] == (
+        "MGET",
+        "series:chunk:1740571200",
+        "series:chunk:1740571800",
+        "series:chunk:1740572400",
+    )
+    assert samples == [(1740571200 + 599, 2.0), (1740572400 + 50, 3.0), (1740572400 + 100, 4.0)]
 
 
 @pytest.mark.parametrize(
@@ -78,11 +116,288 @@ def test_get_metric_values_redis_error(redis_metrics):
     redis_metrics.key_schema.build_redis_metric_key.return_value = mock_redis_key
 
     # Simulate Redis failure
-    redis_metrics.redis_client.zrangebyscore.side_effect = redis.RedisError("Redis failure")
+    redis_metrics.redis_client.execute_command.side_effect = redis.RedisError("Redis failure")
 
     values = redis_metrics.get_metric_values("cpu_usage", {"host": "server-1"}, "usage", 300)
 
     assert values == []
 
     # Ensure Redis query was attempted
-    redis_metrics.redis_client.zrangebyscore.assert_called_once()
+    redis_metrics.redis_client.execute_command.assert_called_once()
+
+
+def test_store_metrics_groups_samples_by_chunk(redis_metrics):
+    """Samples of a series are appended per chunk and each chunk expires after the series retention."""
+    redis_metrics.key_schema.build_redis_metric_key.return_value = "series"
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
+    redis_metrics.redis_client.hgetall.return_value = {"series": "3600"}
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571800):
+        redis_metrics.store_metrics_in_cache(
+            [
+                {"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0}, "timestamp": "2025-02-26T12:00:00Z"},
+                {"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0}, "timestamp": "2025-02-26T12:00:10Z"},
+                {"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 60.0}, "timestamp": "2025-02-26T12:10:00Z"},
+            ]
+        )
+
+    pipeline.append.assert_any_call("series:chunk:1740571200", ChunkCodec.pack(1740571200, [(1740571200, 50.0), (1740571210, 50.0)]))
+    pipeline.append.assert_any_call("series:chunk:1740571800", ChunkCodec.pack(1740571800, [(1740571800, 60.0)]))
+    pipeline.expireat.assert_any_call("series:chunk:1740571200", 1740571200 + 600 + 3600)
+    pipeline.execute.assert_called_once()
+
+
+def test_store_metrics_merges_chunk_summaries(redis_metrics):
+    """Every written chunk has the summary of its new samples merged in the same pipeline."""
+    redis_metrics.key_schema.build_redis_metric_key.return_value = "series"
+    redis_metrics.key_schema.build_metric_summary_key.side_effect = lambda key, start: f"{key}:summary:{start}"
+    redis_metrics.redis_client.hgetall.return_value = {}
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571230):
+        redis_metrics.store_metrics_in_cache(
+            [
+                {"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0}, "timestamp": "2025-02-26T12:00:00Z"},
+                {"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 70.0}, "timestamp": "2025-02-26T12:00:10Z"},
+            ]
+        )
+
+    expected = ChunkSummary.from_samples([(1740571200, 50.0), (1740571210, 70.0)])
+    redis_metrics._merge_summary.assert_called_once_with(
+        keys=["series:summary:1740571200"], args=[expected.to_json(), 1740571200 + 600 + RedisMetrics.DEFAULT_RETENTION], client=pipeline
+    )
+
+
+def test_store_metrics_async_awaits_one_pipeline(mock_redis):
+    """The async variant queues the same writes on an async pipeline and awaits its single round trip."""
+    async_redis = MagicMock(spec=redis.asyncio.Redis)
+    async_redis.hgetall = AsyncMock(return_value={})
+    pipeline = async_redis.pipeline.return_value
+    pipeline.execute = AsyncMock()
+    async_redis.register_script.return_value = AsyncMock()
+    redis_metrics = RedisMetrics(mock_redis, async_redis_client=async_redis)
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571230):
+        asyncio.run(
+            redis_metrics.store_metrics_in_cache_async(
+                [{"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0}, "timestamp": "2025-02-26T12:00:00Z"}]
+            )
+        )
+
+    chunk_key = "moniflow:metrics:cpu:host=server-1:usage:chunk:1740571200"
+    pipeline.append.assert_called_once_with(chunk_key, ChunkCodec.pack(1740571200, [(1740571200, 50.0)]))
+    async_redis.pipeline.assert_called_once_with(transaction=False)
+    pipeline.execute.assert_awaited_once()
+    redis_metrics._merge_summary_async.assert_awaited_once()
+    assert redis_metrics._merge_summary_async.call_args[1]["client"] is pipeline
+    mock_redis.pipeline.assert_not_called()
+
+
+def test_store_metrics_async_requires_async_client(redis_metrics):
+    with pytest.raises(RuntimeError):
+        asyncio.run(redis_metrics.store_metrics_in_cache_async([{"measurement": "cpu", "tags": {}, "fields": {"usage": 1.0}}]))
+
+
+def test_queue_summary_fetch_reads_boundary_chunks_raw(redis_metrics):
+    """Chunks inside the window are read as summaries, the ones cut by its boundaries raw, all in one MGET."""
+    redis_metrics.key_schema.build_redis_metric_key.return_value = "series"
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
+    redis_metrics.key_schema.build_metric_summary_key.side_effect = lambda key, start: f"{key}:summary:{start}"
+    pipeline = MagicMock()
+
+    raw_starts, summary_starts, min_time = redis_metrics.queue_summary_fetch(pipeline, "cpu", {"host": "a"}, "usage", 1800, 1740571230)
+
+    assert (raw_starts, summary_starts, min_time) == ([1740569400, 1740571200], [1740569400 + 600, 1740570600], 1740569430)
+    pipeline.execute_command.assert_called_once_with(
+        "MGET",
+        "series:chunk:1740569400",
+        "series:chunk:1740571200",
+        "series:summary:1740570000",
+        "series:summary:1740570600",
+        **{NEVER_DECODE: []},
+    )
+
+
+def test_decode_summary_merges_boundary_samples_and_summaries():
+    """Boundary samples outside the window are dropped, summaries are merged as stored."""
+    first = ChunkCodec.pack(1740569400, [(1740569410, 100.0), (1740569500, 1.0)])
+    middle = ChunkSummary.from_samples([(1740570000, 2.0), (1740570010, 3.0)]).to_json().encode()
+
+    summary = RedisMetrics.decode_summary([1740569400, 1740571200], [first, None, middle], 1740569430, 1740571230)
+
+    assert (summary.count, summary.sum, summary.min, summary.max) == (3, 6.0, 1.0, 3.0)
+    assert (summary.first_ts, summary.last_ts) == (1740569500, 1740570010)
+
+
+def test_store_metrics_drops_samples_older_than_retention(redis_metrics):
+    """Chunks that would already be expired are not written."""
+    redis_metrics.key_schema.build_redis_metric_key.return_value = "series"
+    redis_metrics.key_schema.build_series_index_key.return_value = "moniflow:series"
+    redis_metrics.redis_client.hgetall.return_value = {}
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571200 + 600 + RedisMetrics.DEFAULT_RETENTION):
+        redis_metrics.store_metrics_in_cache(
+            [{"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0}, "timestamp": "2025-02-26T12:00:00Z"}]
+        )
+
+    pipeline.append.assert_not_called()
+    pipeline.sadd.assert_any_call("moniflow:series", "series")
+
+
+def test_store_metrics_marks_series_dirty(redis_metrics):
+    """Written series are added to the dirty set in the same pipeline."""
+    redis_metrics.key_schema.build_redis_metric_key.side_effect = lambda m, t, f: f"moniflow:metrics:{m}:{f}"
+    redis_metrics.key_schema.build_dirty_series_key.return_value = "moniflow:dirty_series"
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+
+    redis_metrics.store_metrics_in_cache([{"measurement": "cpu", "tags": {"host": "server-1"}, "fields": {"usage": 50.0, "idle": 10.0}}])
+
+    pipeline.sadd.assert_any_call("moniflow:dirty_series", "moniflow:metrics:cpu:usage", "moniflow:metrics:cpu:idle")
+    pipeline.execute.assert_called_once()
+
+
+def test_pop_dirty_series(redis_metrics):
+    """Dirty series are read and cleared atomically."""
+    redis_metrics.key_schema.build_dirty_series_key.return_value = "moniflow:dirty_series"
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [{"b", "a"}, 1]
+
+    assert redis_metrics.pop_dirty_series() == ["a", "b"]
+    redis_metrics.redis_client.pipeline.assert_called_once_with()
+    pipeline.smembers.assert_called_once_with("moniflow:dirty_series")
+    pipeline.delete.assert_called_once_with("moniflow:dirty_series")
+
+
+def test_sync_series_retention_uses_longest_rule_duration(redis_metrics):
+    """Retention of a series is the longest duration of the rules referencing it plus the grace period."""
+    redis_metrics.key_schema.build_redis_metric_key.side_effect = lambda m, t, f: f"moniflow:metrics:{m}:{f}"
+    redis_metrics.key_schema.build_series_retention_key.return_value = "moniflow:series_retention"
+    rules = [
+        SimpleNamespace(metric_name="cpu", tags={"host": "a"}, field_name="usage", duration=300),
+        SimpleNamespace(metric_name="cpu", tags={"host": "a"}, field_name="usage", duration=3600),
+        SimpleNamespace(metric_name="mem", tags={"host": "a"}, field_name="used", duration=60),
+    ]
+
+    retention = redis_metrics.sync_series_retention(rules)
+
+    grace = RedisMetrics.RETENTION_GRACE
+    assert retention == {"moniflow:metrics:cpu:usage": 3600 + grace, "moniflow:metrics:mem:used": 60 + grace}
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+    pipeline.hset.assert_called_once_with("moniflow:series_retention", mapping=retention)
+
+    # Unchanged rules do not rewrite the hash
+    redis_metrics.sync_series_retention(rules)
+    pipeline.execute.assert_called_once()
+
+
+def test_get_series_memory_usage(redis_metrics):
+    """Memory usage is reported per series with chunks, without touching the index."""
+    redis_metrics.key_schema.build_series_index_key.return_value = "moniflow:series"
+    redis_metrics.redis_client.smembers.return_value = {"a", "b"}
+    redis_metrics.redis_client.hgetall.return_value = {"a": "60", "b": "60"}
+    redis_metrics.chunk_seconds = 60
+
+    raw = ChunkCodec.pack(0, [(1, 1.0), (2, 2.0)])
+    compressed = ChunkCodec.compress(0, raw) + ChunkCodec.pack(0, [(3, 3.0)])
+    header = ChunkCodec.HEADER.size
+    # Each series spans three chunks: (memory usage, length, header bytes) per chunk
+    redis_metrics.redis_client.pipeline.return_value.execute.return_value = (
+        [None, 0, b"", 100, len(raw), raw[:header], 120, len(compressed), compressed[:header]] + [None, 0, b""] * 3
+    )
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571230):
+        report = redis_metrics.get_series_memory_usage()
+
+    assert report == {"a": {"chunks": 2, "samples": 5, "memory_bytes": 220, "bytes_per_sample": 44.0}}
+    redis_metrics.redis_client.pipeline.return_value.get.assert_not_called()
+    redis_metrics.redis_client.srem.assert_not_called()
+
+
+def test_prune_expired_series(redis_metrics):
+    """Series whose chunks all expired are removed from the series set and the tag index."""
+    redis_metrics.key_schema.build_series_index_key.return_value = "moniflow:series"
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
+    redis_metrics.redis_client.smembers.return_value = {"a", "b"}
+    redis_metrics.redis_client.hgetall.return_value = {"a": "60", "b": "60"}
+    redis_metrics.chunk_seconds = 60
+    pipeline = redis_metrics.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [2, 0]  # chunks still existing per series
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571230), patch.object(redis_metrics.series_index, "remove_series") as remove_series:
+        assert redis_metrics.prune_expired_series() == 1
+
+    pipeline.exists.assert_any_call("b:chunk:1740571080", "b:chunk:1740571140", "b:chunk:1740571200")
+    redis_metrics.redis_client.srem.assert_called_once_with("moniflow:series", "b")
+    remove_series.assert_called_once_with(["b"])
+
+
+def test_compact_chunks_compresses_sealed_chunks(redis_metrics):
+    """Sealed raw chunks are compressed, already compacted ones are skipped."""
+    redis_metrics.key_schema.build_metric_chunk_key.side_effect = lambda key, start: f"{key}:chunk:{start}"
+    raw = ChunkCodec.pack(1740570600, [(1740570600, 1.0), (1740570610, 1.0)])
+    redis_metrics.redis_client.execute_command.return_value = [raw, ChunkCodec.compress(1740570000, raw)]
+    redis_metrics.redis_client.pipeline.return_value.execute.return_value = [1]
+
+    with patch("dao.redis.metrics.time.time", return_value=1740571230):
+        assert redis_metrics.compact_chunks(["series"]) == 1
+
+    redis_metrics._compact_chunk.assert_called_once_with(
+        keys=["series:chunk:1740570600"],
+        args=[ChunkCodec.compress(1740570600, raw), len(raw)],
+        client=redis_metrics.redis_client.pipeline.return_value,
+    )
+
+
+@pytest.fixture
+def fake_metrics():
+    """A RedisMetrics instance whose Lua scripts run on fakeredis."""
+    return RedisMetrics(fakeredis.FakeRedis(decode_responses=True))
+
+
+def store_in_sealed_chunk(metrics, values, offset=0):
+    """Store `values` a second apart from `offset` in the last sealed chunk; returns its start, series key and chunk key."""
+    chunk_start = ChunkCodec.chunk_start(int(time.time()), metrics.chunk_seconds) - metrics.chunk_seconds
+    metrics.store_metrics_in_cache(
+        [
+            {"measurement": "cpu_usage", "tags": {"host": "server-1"}, "fields": {"usage": value}, "timestamp": f"{chunk_start + offset + i}s"}
+            for i, value in enumerate(values)
+        ]
+    )
+    series_key = metrics.key_schema.build_redis_metric_key("cpu_usage", {"host": "server-1"}, "usage")
+    return chunk_start, series_key, metrics.key_schema.build_metric_chunk_key(series_key, chunk_start)
+
+
+def test_merge_script_accumulates_chunk_summaries(fake_metrics):
+    """Summaries merged by the Lua script across batches equal the summary of all samples."""
+    values = [10.0, 55.5, 90.0, 42.0]
+    chunk_start, series_key, _ = store_in_sealed_chunk(fake_metrics, values[:2])
+    store_in_sealed_chunk(fake_metrics, values[2:], offset=2)  # A later batch for the same chunk
+    summary_key = fake_metrics.key_schema.build_metric_summary_key(series_key, chunk_start)
+
+    stored = ChunkSummary.from_json(fake_metrics.redis_client.get(summary_key))
+
+    expected = ChunkSummary.from_samples([(chunk_start + i, value) for i, value in enumerate(values)])
+    assert (stored.count, stored.sum, stored.min, stored.max) == (expected.count, expected.sum, expected.min, expected.max)
+    assert (stored.first_ts, stored.first, stored.last_ts, stored.last) == (expected.first_ts, expected.first, expected.last_ts, expected.last)
+    assert stored.buckets == expected.buckets
+    assert fake_metrics.redis_client.ttl(summary_key) > 0
+
+
+def test_compact_chunk_script_replaces_unchanged_chunks_only(fake_metrics):
+    """A sealed chunk is compressed in place keeping its TTL, unless a sample was appended since it was read."""
+    chunk_start, series_key, chunk_key = store_in_sealed_chunk(fake_metrics, [10.0, 20.0, 30.0])
+    raw = fake_metrics.redis_client.execute_command("GET", chunk_key, **{NEVER_DECODE: []})
+
+    assert fake_metrics.compact_chunks([series_key]) == 1
+    compacted = fake_metrics.redis_client.execute_command("GET", chunk_key, **{NEVER_DECODE: []})
+    assert ChunkCodec.is_compressed(compacted) and len(compacted) != len(raw)
+    assert sorted(ChunkCodec.unpack(chunk_start, compacted)) == sorted(ChunkCodec.unpack(chunk_start, raw))
+    assert fake_metrics.redis_client.ttl(chunk_key) > 0
+
+    # A chunk read before a late append is not overwritten
+    stale = ChunkCodec.compress(chunk_start, compacted)
+    fake_metrics.redis_client.append(chunk_key, ChunkCodec.pack(chunk_start, [(chunk_start + 5, 40.0)]))
+    assert fake_metrics._compact_chunk(keys=[chunk_key], args=[stale, len(compacted)]) == 0
+    assert len(ChunkCodec.unpack(chunk_start, fake_metrics.redis_client.execute_command("GET", chunk_key, **{NEVER_DECODE: []}))) == 4
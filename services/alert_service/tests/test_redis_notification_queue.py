@@ -0,0 +1,49 @@
+import json
+import redis
+from unittest.mock import MagicMock
+from dao.redis.notification_queue import RedisNotificationQueue
+
+
+def test_build_notifications_one_per_recipient():
+    """Every recipient of every channel gets its own notification; channels without recipients use their default."""
+    notifications = RedisNotificationQueue.build_notifications(
+        "r1", "triggered", "CPU high", ["telegram", "email"], {"email": ["a@example.com", "b@example.com"]}, created_at=100.0
+    )
+
+    assert [(n["channel"], n["recipient"]) for n in notifications] == [
+        ("telegram", None),
+        ("email", "a@example.com"),
+        ("email", "b@example.com"),
+    ]
+    assert all(n["attempt"] == 0 and n["created_at"] == 100.0 for n in notifications)
+    assert len({n["id"] for n in notifications}) == 3
+
+
+def test_queue_notifications_uses_capped_stream():
+    queue = RedisNotificationQueue(MagicMock(spec=redis.Redis))
+    pipeline = MagicMock()
+    notification = RedisNotificationQueue.build_notifications("r1", "recovered", "OK", ["telegram"], {})[0]
+
+    queue.queue_notifications(pipeline, [notification])
+
+    pipeline.xadd.assert_called_once_with(
+        "moniflow:notifications", {"data": json.dumps(notification)}, maxlen=RedisNotificationQueue.MAX_LENGTH, approximate=True
+    )
+
+
+def test_get_stats():
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.return_value.execute.return_value = [
+        3,
+        1,
+        2,
+        {"delivered:telegram": "5", "latency_sum:telegram": "2.5", "latency_bucket:telegram:0.5": "4", "dead:email": "2"},
+    ]
+
+    stats = RedisNotificationQueue(redis_client).get_stats()
+
+    assert (stats["queued"], stats["retrying"], stats["dead"]) == (3, 1, 2)
+    assert stats["channels"]["telegram"]["delivered"] == 5
+    assert stats["channels"]["telegram"]["latency_sum"] == 2.5
+    assert stats["channels"]["telegram"]["latency_buckets"] == {"0.5": 4}
+    assert stats["channels"]["email"]["dead"] == 2
@@ -0,0 +1,105 @@
+import json
+import pytest
+import redis
+from unittest.mock import MagicMock
+from dao.redis.series_index import RedisSeriesIndex
+from models import TagMatcher
+
+WEB_1 = "moniflow:metrics:cpu_usage:env=prod,host=web-1:usage"
+WEB_2 = "moniflow:metrics:cpu_usage:env=prod,host=web-2:usage"
+DB_1 = "moniflow:metrics:cpu_usage:env=prod,host=db-1:usage"
+
+LABELS = {
+    WEB_1: json.dumps({"measurement": "cpu_usage", "tags": {"env": "prod", "host": "web-1"}, "field": "usage"}),
+    WEB_2: json.dumps({"measurement": "cpu_usage", "tags": {"env": "prod", "host": "web-2"}, "field": "usage"}),
+    DB_1: json.dumps({"measurement": "cpu_usage", "tags": {"env": "prod", "host": "db-1"}, "field": "usage"}),
+}
+
+INDEX = {
+    "moniflow:index:cpu_usage:__field__=usage": {WEB_1, WEB_2, DB_1},
+    "moniflow:index:cpu_usage:env=prod": {WEB_1, WEB_2, DB_1},
+    "moniflow:index:cpu_usage:host=web-1": {WEB_1},
+    "moniflow:index:cpu_usage:host=web-2": {WEB_2},
+    "moniflow:index:cpu_usage:host=db-1": {DB_1},
+    "moniflow:tag_values:cpu_usage:host": {"web-1", "web-2", "db-1"},
+}
+
+
+def make_pipeline():
+    """A pipeline answering SMEMBERS from `INDEX`."""
+    pipeline = MagicMock()
+    replies = []
+    pipeline.smembers.side_effect = lambda key: replies.append(INDEX.get(key, set()))
+    pipeline.execute.side_effect = lambda: list(replies)
+    return pipeline
+
+
+@pytest.fixture
+def series_index():
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.pipeline.side_effect = lambda **kwargs: make_pipeline()
+    redis_client.hmget.side_effect = lambda key, fields: [LABELS.get(field) for field in fields]
+    return RedisSeriesIndex(redis_client)
+
+
+def test_queue_index_series_indexes_once(series_index):
+    """New series are added to the tag, field and value sets; indexed series are skipped."""
+    pipeline = MagicMock()
+    series = {WEB_1: ("cpu_usage", {"env": "prod", "host": "web-1"}, "usage")}
+
+    queued = series_index.queue_index_series(pipeline, series)
+
+    assert queued == [WEB_1]
+    pipeline.sadd.assert_any_call("moniflow:index:cpu_usage:__field__=usage", WEB_1)
+    pipeline.sadd.assert_any_call("moniflow:index:cpu_usage:host=web-1", WEB_1)
+    pipeline.sadd.assert_any_call("moniflow:tag_values:cpu_usage:host", "web-1")
+    pipeline.hset.assert_called_once_with("moniflow:series_labels", mapping={WEB_1: LABELS[WEB_1]})
+
+    series_index.mark_indexed(queued)
+    assert series_index.queue_index_series(MagicMock(), series) == []
+
+
+@pytest.mark.parametrize(
+    "matchers, expected",
+    [
+        ([TagMatcher(tag="host", value="web-1")], [WEB_1]),
+        ([TagMatcher(tag="host", op="wildcard", value="web-*")], [WEB_1, WEB_2]),
+        ([TagMatcher(tag="host", op="regex", value="(web|db)-1")], [DB_1, WEB_1]),
+        ([TagMatcher(tag="host", op="not_equals", value="db-1")], [WEB_1, WEB_2]),
+        ([TagMatcher(tag="host", op="not_regex", value="web-.*")], [DB_1]),
+        ([TagMatcher(tag="host", op="wildcard", value="cache-*")], []),
+    ],
+)
+def test_resolve(series_index, matchers, expected):
+    """Matchers are resolved through the index sets, never by scanning keys."""
+    resolved = series_index.resolve("cpu_usage", "usage", {"env": "prod"}, matchers)
+
+    assert sorted(resolved) == expected
+    for series_key in expected:
+        assert resolved[series_key] == json.loads(LABELS[series_key])["tags"]
+    series_index.redis_client.keys.assert_not_called()
+    series_index.redis_client.scan_iter.assert_not_called()
+
+
+def test_resolve_is_cached(series_index):
+    matchers = [TagMatcher(tag="host", op="wildcard", value="web-*")]
+    series_index.resolve("cpu_usage", "usage", {}, matchers)
+    calls = series_index.redis_client.pipeline.call_count
+
+    series_index.resolve("cpu_usage", "usage", {}, matchers)
+
+    assert series_index.redis_client.pipeline.call_count == calls
+
+
+def test_remove_series(series_index):
+    """Removed series leave every index set, and tag values left without series are dropped."""
+    removal, sizes, cleanup = MagicMock(), MagicMock(), MagicMock()
+    series_index.redis_client.pipeline.side_effect = [removal, sizes, cleanup]
+    sizes.execute.return_value = [2, 0]  # env=prod still has series, host=db-1 has none
+
+    series_index.remove_series([DB_1])
+
+    removal.srem.assert_any_call("moniflow:index:cpu_usage:host=db-1", DB_1)
+    removal.srem.assert_any_call("moniflow:index:cpu_usage:__field__=usage", DB_1)
+    removal.hdel.assert_called_once_with("moniflow:series_labels", DB_1)
+    cleanup.srem.assert_called_once_with("moniflow:tag_values:cpu_usage:host", "db-1")
@@ -0,0 +1,40 @@
+import json
+import pytest
+import redis
+from unittest.mock import MagicMock
+from dao.redis.shard_ownership import RedisShardOwnership
+
+
+@pytest.fixture
+def ownership():
+    return RedisShardOwnership(MagicMock(spec=redis.Redis))
+
+
+def test_acquire_uses_an_expiring_nx_lease(ownership):
+    ownership.redis_client.set.return_value = True
+
+    assert ownership.acquire(3, "worker-1", 60) is True
+    ownership.redis_client.set.assert_called_once_with("moniflow:shard_owner:3", "worker-1", nx=True, ex=60)
+
+
+def test_acquire_fails_when_owned(ownership):
+    ownership.redis_client.set.return_value = None
+
+    assert ownership.acquire(3, "worker-2", 60) is False
+
+
+def test_release_only_deletes_own_lease(ownership):
+    release = ownership.redis_client.register_script.return_value
+    release.return_value = 0
+
+    assert ownership.release(3, "worker-1") is False
+    release.assert_called_once_with(keys=["moniflow:shard_owner:3"], args=["worker-1"])
+
+
+def test_record_and_get_runs(ownership):
+    stats = {"shard": 2, "duration": 0.25, "evaluated": 10}
+    ownership.record_run(2, stats)
+    ownership.redis_client.hset.assert_called_once_with("moniflow:shard_stats", "2", json.dumps(stats))
+
+    ownership.redis_client.hgetall.return_value = {"2": json.dumps(stats)}
+    assert ownership.get_runs() == {2: stats}
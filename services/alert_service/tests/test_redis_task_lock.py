@@ -0,0 +1,68 @@
+import pytest
+import redis
+from unittest.mock import MagicMock
+from dao.redis.task_lock import RedisTaskLock
+
+
+@pytest.fixture
+def task_lock():
+    redis_client = MagicMock(spec=redis.Redis)
+    redis_client.register_script.side_effect = [MagicMock(), MagicMock(), MagicMock()]  # acquire, release, renew
+    return RedisTaskLock(redis_client)
+
+
+def test_acquire_returns_fencing_token_and_lag(task_lock):
+    task_lock._acquire.return_value = [7, "12.5"]
+
+    assert task_lock.acquire("alert_service.fetch_alert_rules", 180, 1000.0, 60) == (7, 12.5)
+    task_lock._acquire.assert_called_once_with(
+        keys=["moniflow:task_lock:alert_service.fetch_alert_rules", "moniflow:task_fence:alert_service.fetch_alert_rules", "moniflow:task_schedule"],
+        args=["alert_service.fetch_alert_rules", 180000, 0, 1000.0, 60],
+    )
+
+
+def test_acquire_held_lock(task_lock):
+    """A held lock yields no token; with `merge` the script records a rerun request."""
+    task_lock._acquire.return_value = [0, "0"]
+
+    assert task_lock.acquire("t", 15, 1000.0, 5, merge=True) == (None, 0.0)
+    assert task_lock._acquire.call_args[1]["args"][2] == 1
+
+
+def test_is_current_compares_tokens(task_lock):
+    task_lock.redis_client.get.return_value = "8"
+
+    assert task_lock.is_current("t", 8) is True
+    assert task_lock.is_current("t", 7) is False
+    task_lock.redis_client.get.assert_called_with("moniflow:task_lock:t")
+
+
+def test_release_reports_merged_rerun(task_lock):
+    task_lock._release.return_value = 2
+
+    assert task_lock.release("t", 8, 1.23456) == 2
+    task_lock._release.assert_called_once_with(keys=["moniflow:task_lock:t", "moniflow:task_schedule"], args=[8, "t", 1.235])
+
+
+def test_renew_extends_only_a_held_lease(task_lock):
+    task_lock._renew.side_effect = [1, 0]
+
+    assert task_lock.renew("alert_service.rule_scheduler", 8, 15) is True
+    assert task_lock.renew("alert_service.rule_scheduler", 7, 15) is False
+    task_lock._renew.assert_called_with(keys=["moniflow:task_lock:alert_service.rule_scheduler"], args=[7, 15000])
+
+
+def test_get_stats_groups_fields_by_task(task_lock):
+    task_lock.redis_client.hgetall.return_value = {
+        "alert_service.fetch_alert_rules:started": "1000.5",
+        "alert_service.fetch_alert_rules:lag": "61.5",
+        "alert_service.fetch_alert_rules:runs": "3",
+        "alert_service.fetch_alert_rules:skipped": "2",
+        "alert_service.fetch_alert_rules:rerun": "1",
+        "alert_service.flush_alert_groups:token": "9",
+    }
+
+    assert task_lock.get_stats() == {
+        "alert_service.fetch_alert_rules": {"started": 1000.5, "lag": 61.5, "runs": 3, "skipped": 2, "merged": 0},
+        "alert_service.flush_alert_groups": {"token": 9, "runs": 0, "skipped": 0, "merged": 0},
+    }
@@ -34,12 +34,49 @@ METRIC_FLUSH_INTERVAL = int(os.getenv("METRIC_FLUSH_INTERVAL", 5))
 client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
 write_api = client.write_api(write_options=SYNCHRONOUS)
 
+# Shutdown drain configuration
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 8))
+SHUTDOWN_DRAIN_BATCH_SIZE = int(os.getenv("SHUTDOWN_DRAIN_BATCH_SIZE", 5000))
+
 # Queues for logs and metrics
 log_queue = queue.Queue()
 metric_queue = queue.Queue()
 
-# Stop flag for graceful shutdown
-stop_thread = False
+# Stop flag for graceful shutdown, set under `writes_lock` so no entry is queued after the drain
+stop_event = threading.Event()
+writes_lock = threading.Lock()
+
+# Writer threads, started by `start_writers` from the application lifespan
+log_thread = None
+metric_thread = None
+
+
+class WritesClosedError(RuntimeError):
+    """Raised when a write is attempted after shutdown has started."""
+
+
+def log_entry_to_point(log_entry: dict) -> Point:
+    """Convert a queued log entry into an InfluxDB point."""
+    point = (
+        Point("logs")
+        .tag("level", log_entry["level"])
+        .field("message", log_entry["message"])
+    )
+    for key, value in log_entry["tags"].items():
+        point = point.tag(key, value)
+
+    return point.time(log_entry["timestamp"])
+
+
+def metric_entry_to_point(metric_entry: dict) -> Point:
+    """Convert a queued metric entry into an InfluxDB point."""
+    point = Point(metric_entry["measurement"])
+    for key, value in metric_entry["fields"].items():
+        point = point.field(key, value)
+    for key, value in metric_entry["tags"].items():
+        point = point.tag(key, value)
+
+    return point.time(metric_entry["timestamp"])
 
 
 # Log Processing
@@ -47,22 +84,13 @@ def process_logs():
     """Background thread to batch process log writes with time-based flushing."""
     last_flush_time = time.time()
 
-    while not stop_thread:
+    while not stop_event.is_set():
         batch = []
         try:
             for _ in range(LOG_BATCH_SIZE):
                 log_entry = log_queue.get(timeout=1)
                 if log_entry:
-                    point = (
-                        Point("logs")
-                        .tag("level", log_entry["level"])
-                        .field("message", log_entry["message"])
-                    )
-                    for key, value in log_entry["tags"].items():
-                        point = point.tag(key, value)
-
-                    point = point.time(log_entry["timestamp"])
-                    batch.append(point)
+                    batch.append(log_entry_to_point(log_entry))
         except queue.Empty:
             pass  # No new logs, continue waiting
 
@@ -75,29 +103,19 @@ def process_logs():
                 except Exception as e:
                     logger.error(f"Error writing logs to InfluxDB: {e}")
 
-# Start log processing thread
-log_thread = threading.Thread(target=process_logs, daemon=True)
-log_thread.start()
-
 
 # Metric Processing
 def process_metrics():
     """Background thread to batch process metric writes with time-based flushing."""
     last_flush_time = time.time()
 
-    while not stop_thread:
+    while not stop_event.is_set():
         batch = []
         try:
             for _ in range(METRIC_BATCH_SIZE):
                 metric_entry = metric_queue.get(timeout=1)
                 if metric_entry:
-                    point = Point(metric_entry["measurement"])
-                    for key, value in metric_entry["fields"].items():
-                        point = point.field(key, value)
-                    for key, value in metric_entry["tags"].items():
-                        point = point.tag(key, value)
-                    point = point.time(metric_entry["timestamp"])
-                    batch.append(point)
+                    batch.append(metric_entry_to_point(metric_entry))
         except queue.Empty:
             pass  # No new metrics, continue waiting
 
@@ -110,9 +128,92 @@ def process_metrics():
                 except Exception as e:
                     logger.error(f"Error writing metrics to InfluxDB: {e}")
 
-# Start metric processing thread
-metric_thread = threading.Thread(target=process_metrics, daemon=True)
-metric_thread.start()
+
+def start_writers():
+    """
+    Start the background writer threads.
+    Called from the application lifespan instead of at import time.
+    """
+    global log_thread, metric_thread
+
+    stop_event.clear()
+    if log_thread is None or not log_thread.is_alive():
+        log_thread = threading.Thread(target=process_logs, name="influx-log-writer", daemon=True)
+        log_thread.start()
+    if metric_thread is None or not metric_thread.is_alive():
+        metric_thread = threading.Thread(target=process_metrics, name="influx-metric-writer", daemon=True)
+        metric_thread.start()
+    logger.info("InfluxDB writer threads started")
+
+
+def drain_queue(entries: queue.Queue, to_point, deadline: float) -> Dict[str, int]:
+    """
+    Flush everything left in a queue in large batches until it is empty or the deadline passes.
+
+    Returns:
+        dict: Number of entries flushed and lost.
+    """
+    flushed = 0
+    lost = 0
+
+    while time.monotonic() < deadline:
+        batch = []
+        try:
+            while len(batch) < SHUTDOWN_DRAIN_BATCH_SIZE:
+                batch.append(to_point(entries.get_nowait()))
+        except queue.Empty:
+            pass
+
+        if not batch:
+            break
+
+        try:
+            write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=batch)
+            flushed += len(batch)
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} entries to InfluxDB during shutdown: {e}")
+            lost += len(batch)
+
+    # Whatever is still queued after the deadline is dropped
+    lost += entries.qsize()
+    return {"flushed": flushed, "lost": lost}
+
+
+def shutdown_writers(timeout: float = SHUTDOWN_DRAIN_TIMEOUT) -> Dict[str, Dict[str, int]]:
+    """
+    Stop the writer threads, drain both queues under a deadline and close the InfluxDB client.
+
+    `write_metric` and `write_log` reject new entries once this has been called.
+
+    Returns:
+        dict: Flushed/lost counts for logs and metrics.
+    """
+    deadline = time.monotonic() + timeout
+    # Writes check the flag and queue under the lock, so every accepted entry is queued before the drain
+    with writes_lock:
+        stop_event.set()
+
+    # Let the writers finish the batch they are currently writing
+    for thread in (log_thread, metric_thread):
+        if thread is not None:
+            thread.join(timeout=max(deadline - time.monotonic(), 0))
+
+    report = {
+        "metrics": drain_queue(metric_queue, metric_entry_to_point, deadline),
+        "logs": drain_queue(log_queue, log_entry_to_point, deadline),
+    }
+
+    try:
+        write_api.close()
+        client.close()
+    except Exception as e:
+        logger.error(f"Error closing InfluxDB client: {e}")
+
+    logger.info(
+        f"InfluxDB writers stopped. Metrics flushed: {report['metrics']['flushed']}, lost: {report['metrics']['lost']}. "
+        f"Logs flushed: {report['logs']['flushed']}, lost: {report['logs']['lost']}."
+    )
+    return report
 
 
 # Metric Collection
@@ -136,7 +237,10 @@ def write_metric(measurement: str, fields: dict, tags: dict = None, timestamp: s
         "tags": tags,
         "timestamp": timestamp
     }
-    metric_queue.put(metric_entry)
+    with writes_lock:
+        if stop_event.is_set():
+            raise WritesClosedError("Collector is shutting down, metric not accepted.")
+        metric_queue.put(metric_entry)
 
 
 # Log Collection
@@ -151,7 +255,10 @@ def write_log(message: str, level: str, tags: dict, timestamp: str = None):
         tags = {} 
 
     log_entry = {"message": message, "level": level, "tags": tags, "timestamp": timestamp}
-    log_queue.put(log_entry)
+    with writes_lock:
+        if stop_event.is_set():
+            raise WritesClosedError("Collector is shutting down, log not accepted.")
+        log_queue.put(log_entry)
 
 
 # Flux for logs
@@ -1,11 +1,29 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from routers import metrics, logs
+from database import start_writers, shutdown_writers
 
-app = FastAPI(title="MoniFlow Metrics Collector")
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the InfluxDB writer threads and drain their queues on shutdown."""
+    start_writers()
+
+    yield
+
+    report = await run_in_threadpool(shutdown_writers)
+    logger.info(f"Collector shutdown flush report: {report}")
+
+
+app = FastAPI(title="MoniFlow Metrics Collector", lifespan=lifespan)
 
 app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 app.include_router(logs.router, prefix="/logs", tags=["logs"])
 
 @app.get("/")
 async def root():
-    return {"message": "Metrics Collector Service Running"}
\ No newline at end of file
+    return {"message": "Metrics Collector Service Running"}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query
-from database import group_logs_by_service, group_logs_by_service_and_level, write_log, get_flux_query_for_logs, execute_flux_query
+from database import WritesClosedError, group_logs_by_service, group_logs_by_service_and_level, write_log, get_flux_query_for_logs, execute_flux_query
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 from enum import Enum
@@ -39,6 +39,8 @@ async def collect_logs(log_entry: LogEntry):
     try:
         write_log(log_entry.message, log_entry.level, log_entry.tags, timestamp)
         return {"status": "success", "log": log_entry.model_dump()}
+    except WritesClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
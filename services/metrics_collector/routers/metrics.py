@@ -1,6 +1,6 @@
 import logging
-from fastapi import APIRouter, Query
-from database import write_metric
+from fastapi import APIRouter, HTTPException, Query
+from database import WritesClosedError, write_metric
 from typing import Optional
 from database import (
     get_flux_query_for_metrics, 
@@ -36,7 +36,10 @@ async def collect_metrics(data: dict):
     if not fields:
         return {"status": "error", "message": "At least one field is required."}
 
-    write_metric(measurement, fields, tags)
+    try:
+        write_metric(measurement, fields, tags)
+    except WritesClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return {"status": "success", "message": f"Metric '{measurement}' stored."}
 
 
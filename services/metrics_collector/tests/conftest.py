@@ -0,0 +1,16 @@
+import pytest
+from unittest.mock import patch
+
+import database
+
+
+@pytest.fixture(autouse=True)
+def influx():
+    """Replace the InfluxDB client and reset the writer state around every test."""
+    database.stop_event.clear()
+    with patch("database.write_api") as write_api, patch("database.client"):
+        yield write_api
+    database.stop_event.clear()
+    for entries in (database.metric_queue, database.log_queue):
+        while not entries.empty():
+            entries.get_nowait()
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import database
+from main import app
+
+LOG = {"message": "Service restarted", "level": "INFO", "tags": {"service": "user_management"}, "timestamp": "2025-02-13T12:30:00.000Z"}
+
+
+def test_queued_logs_are_flushed_on_shutdown(influx):
+    for _ in range(2):
+        database.write_log("Service restarted", "INFO", {"service": "user_management"}, "2025-02-13T12:30:00Z")
+
+    report = database.shutdown_writers(timeout=5)
+
+    assert report["logs"] == {"flushed": 2, "lost": 0}
+    assert sum(len(call.kwargs["record"]) for call in influx.write.call_args_list) == 2
+
+
+def test_logs_after_shutdown_are_rejected(influx):
+    database.shutdown_writers(timeout=1)
+
+    response = TestClient(app).post("/logs/", json=LOG)
+
+    assert response.status_code == 503
+    assert database.log_queue.empty()
@@ -0,0 +1,71 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+from main import app
+
+METRIC = {"measurement": "cpu_usage", "tags": {"host": "server-1"}, "fields": {"usage": 75.3}}
+
+
+def written_points(write_api) -> list:
+    return [point for call in write_api.write.call_args_list for point in call.kwargs["record"]]
+
+
+def test_queued_metrics_are_flushed_on_shutdown(influx):
+    """Metrics still queued when the collector stops are written in the shutdown drain."""
+    for host in range(3):
+        database.write_metric("cpu_usage", {"usage": 50}, {"host": f"server-{host}"}, "2025-02-26T12:00:00Z")
+
+    report = database.shutdown_writers(timeout=5)
+
+    assert report["metrics"] == {"flushed": 3, "lost": 0}
+    assert database.metric_queue.empty()
+    assert len(written_points(influx)) == 3
+    influx.close.assert_called_once()
+
+
+def test_shutdown_reports_metrics_it_could_not_write(influx):
+    influx.write.side_effect = ConnectionError("influxdb unavailable")
+    database.write_metric("cpu_usage", {"usage": 50.0}, {"host": "server-1"})
+
+    assert database.shutdown_writers(timeout=5)["metrics"] == {"flushed": 0, "lost": 1}
+
+
+def test_lifespan_drains_metrics_on_shutdown(influx):
+    """Metrics accepted while the app runs are written by the time the lifespan ends."""
+    with TestClient(app) as client:
+        for _ in range(5):
+            assert client.post("/metrics/metrics", json=METRIC).status_code == 200
+
+    assert len(written_points(influx)) == 5
+    assert database.metric_queue.empty()
+
+
+def test_metrics_after_shutdown_are_rejected(influx):
+    """Once shutdown started, metrics get a 503 instead of being queued and lost."""
+    database.shutdown_writers(timeout=1)
+
+    with pytest.raises(database.WritesClosedError):
+        database.write_metric("cpu_usage", {"usage": 50.0}, {"host": "server-1"})
+
+    response = TestClient(app).post("/metrics/metrics", json=METRIC)
+    assert response.status_code == 503
+    assert "shutting down" in response.json()["detail"]
+    assert database.metric_queue.empty()
+
+
+def test_write_racing_shutdown_is_drained(influx):
+    """A write that passed the shutdown check before the drain started is still written, not silently dropped."""
+    reports = []
+    shutdown = threading.Thread(target=lambda: reports.append(database.shutdown_writers(timeout=5)))
+    with database.writes_lock:  # A write holds the lock between its check and its put
+        shutdown.start()
+        shutdown.join(timeout=0.2)
+        assert shutdown.is_alive() and not database.stop_event.is_set()
+        database.metric_queue.put({**METRIC, "timestamp": "2025-02-26T12:00:00Z"})
+    shutdown.join(timeout=5)
+
+    assert reports[0]["metrics"] == {"flushed": 1, "lost": 0}
+    with pytest.raises(database.WritesClosedError):
+        database.write_metric("cpu_usage", {"usage": 50.0}, {"host": "server-1"})